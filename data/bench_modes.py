@@ -0,0 +1,44 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# ===== ĐO THỜI GIAN: HEADLESS VS CÓ VẼ BIỂU ĐỒ =====
+# Cold start = thời gian process Python import xong locfeature (kèm / không kèm thư viện vẽ).
+# End-to-end = thời gian chạy locfeature.py đầy đủ (headless mặc định vs --plot).
+# Biểu đồ dùng backend Agg để plt.show() không chặn trên server.
+
+
+def _run(cmd, repeat):
+    env = dict(os.environ, MPLBACKEND='Agg')
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='So sánh cold start và end-to-end của locfeature.py')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần lặp cold start (lấy min)')
+    parser.add_argument('--kde-engine', default='binned', help='KDE engine cho phép đo end-to-end')
+    args = parser.parse_args(argv)
+
+    python = sys.executable
+    rows = [
+        ('cold start headless', _run([python, '-c', 'import locfeature'], args.repeat)),
+        ('cold start + plotting', _run([python, '-c', 'import locfeature, matplotlib.pyplot, seaborn'],
+                                       args.repeat)),
+        ('end-to-end headless', _run([python, 'locfeature.py', '--kde-engine', args.kde_engine], 1)),
+        ('end-to-end --plot', _run([python, 'locfeature.py', '--kde-engine', args.kde_engine, '--plot'], 1)),
+    ]
+
+    print(f"{'mode':<24}{'seconds':>10}")
+    for name, seconds in rows:
+        print(f"{name:<24}{seconds:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# ===== ĐỊNH DẠNG CỘT NHỊ PHÂN GIỮA CÁC BƯỚC PIPELINE =====
+# Mỗi bảng là một thư mục <tên>.cols/ gồm một file .npy cho mỗi cột (giữ nguyên dtype,
+# ví dụ uint32 cho dữ liệu đã lượng tử hóa) và schema.json mô tả thứ tự cột / dtype.
+# Cột categorical lưu mã + category / ordered trong schema; cột object lưu chuỗi + vị trí NaN.
+# Đọc bằng np.load(mmap_mode='r') nên không phải parse text và không copy dữ liệu.
+# CSV vẫn dùng được: read_table đọc CSV nếu chưa có bản .cols, write_table có thể xuất kèm CSV.
+
+FORMAT_VERSION = 1
+TABLE_SUFFIX = '.cols'
+SCHEMA_FILE = 'schema.json'
+
+
+def _stem(path):
+    for suffix in (TABLE_SUFFIX, '.csv'):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def write_table(df, path, csv=False, metadata=None):
+    """
+    Ghi DataFrame thành <stem>.cols/ (và <stem>.csv nếu csv=True).
+    metadata: dict tùy ý lưu trong schema.json (ví dụ cột nhãn).
+    """
+    stem = _stem(path)
+    table_dir = stem + TABLE_SUFFIX
+    os.makedirs(table_dir, exist_ok=True)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = df[name]
+        info = {'name': str(name)}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # lưu mã (-1 = NaN), danh sách category / ordered nằm trong schema
+            values = column.cat.codes.to_numpy()
+            info['categories'] = column.cat.categories.tolist()
+            info['ordered'] = bool(column.cat.ordered)
+        elif column.dtype == object:
+            nulls = column.isna().to_numpy()
+            values = column.astype(str).to_numpy().astype(str)
+            info['nulls'] = np.flatnonzero(nulls).tolist()   # vị trí NaN / None (không thành 'nan')
+        else:
+            values = column.to_numpy()
+        file_name = f'{i:03d}.npy'
+        np.save(os.path.join(table_dir, file_name), np.ascontiguousarray(values))
+        columns.append({**info, 'dtype': values.dtype.str, 'file': file_name})
+
+    schema = {'version': FORMAT_VERSION, 'rows': len(df), 'columns': columns,
+              'metadata': metadata or {}}
+    with open(os.path.join(table_dir, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2, ensure_ascii=False)
+
+    if csv:
+        df.to_csv(stem + '.csv', index=False)
+    return table_dir
+
+
+def read_schema(path):
+    with open(os.path.join(_stem(path) + TABLE_SUFFIX, SCHEMA_FILE), encoding='utf-8') as f:
+        schema = json.load(f)
+    if schema.get('version') != FORMAT_VERSION:
+        raise ValueError(f"❌ Unsupported table version {schema.get('version')} in {path}")
+    return schema
+
+
+def _restore(column, values):
+    """Khôi phục cột categorical / object (có NaN) từ mảng đã lưu"""
+    if 'categories' in column:
+        return pd.Categorical.from_codes(values, categories=column['categories'], ordered=column['ordered'])
+    if column.get('nulls'):
+        values = values.astype(object)
+        values[column['nulls']] = np.nan
+    return values
+
+
+def read_columns(path, columns=None, mmap=True):
+    """
+    Dict {tên cột: ndarray}; với mmap=True các mảng số là memmap chỉ đọc (zero-copy).
+    Cột categorical trả về pd.Categorical, cột object có NaN được copy để gán lại NaN.
+    """
+    table_dir = _stem(path) + TABLE_SUFFIX
+    schema = read_schema(path)
+    wanted = schema['columns'] if columns is None else [
+        next(c for c in schema['columns'] if c['name'] == name) for name in columns]
+    return {c['name']: _restore(c, np.load(os.path.join(table_dir, c['file']), mmap_mode='r' if mmap else None))
+            for c in wanted}
+
+
+def read_table(path, columns=None, mmap=True):
+    """
+    Đọc bảng: ưu tiên <stem>.cols/ (memory-map, không copy), nếu không có thì đọc <stem>.csv.
+    path có thể là 'x', 'x.cols' hoặc 'x.csv'.
+    """
+    stem = _stem(path)
+    if os.path.isdir(stem + TABLE_SUFFIX):
+        return pd.DataFrame(read_columns(stem, columns=columns, mmap=mmap), copy=False)
+    csv_path = path if path.endswith('.csv') else stem + '.csv'
+    df = pd.read_csv(csv_path, usecols=columns)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+
+def iter_table(path, batch_size, columns=None):
+    """
+    Đọc bảng theo từng khối batch_size dòng: .cols cắt lát trên memmap (không copy),
+    CSV đọc bằng chunksize (không nạp cả file).
+    """
+    stem = _stem(path)
+    if os.path.isdir(stem + TABLE_SUFFIX):
+        table = read_table(stem, columns=columns)
+        for start in range(0, len(table), batch_size):
+            yield table.iloc[start:start + batch_size]
+        return
+    csv_path = path if path.endswith('.csv') else stem + '.csv'
+    yield from pd.read_csv(csv_path, usecols=columns, chunksize=batch_size)
+
+
+def export_csv(path, csv_path=None):
+    """Xuất bảng .cols ra CSV"""
+    csv_path = csv_path or _stem(path) + '.csv'
+    read_table(path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Chuyển đổi giữa CSV và bảng cột nhị phân (.cols)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_cols = sub.add_parser('convert', help='CSV -> .cols')
+    to_cols.add_argument('csv')
+    to_csv = sub.add_parser('export', help='.cols -> CSV')
+    to_csv.add_argument('table')
+    to_csv.add_argument('output', nargs='?')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        print("✅", write_table(read_table(args.csv), args.csv))
+    else:
+        print("✅", export_csv(args.table, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from kde_engine import KDE_ENGINES, make_kde, _bilinear
+
+# ===== BẢNG TRA MẬT ĐỘ HOME RANGE (RASTER) =====
+# Raster hóa xác suất home range đã chuẩn hóa (như calculate_kde_probability) lên lưới
+# lat/long, lượng tử hóa về số nguyên không dấu `bits` bit. Chấm điểm một fix chỉ là
+# tra bảng (ô gần nhất) hoặc nội suy song tuyến 4 ô, không cần duyệt các điểm training;
+# bảng cũng xuất được thành mảng C cho phần cứng.
+
+LUT_VERSION = 1
+
+
+class DensityLUT:
+    """
+    Bảng tra xác suất chuẩn hóa trên lưới đều.
+    table: mảng uint (nx, ny), nút [i, j] tại (lat0 + i * step, long0 + j * step);
+    giá trị thực = table / (2**bits - 1). Ngoài lưới = 0.
+    """
+
+    def __init__(self, table, origin, step, bits):
+        self.table = table
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.step = float(step)
+        self.bits = bits
+        self.scale = 1.0 / (2 ** bits - 1)
+
+    @property
+    def shape(self):
+        return self.table.shape
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def lookup(self, coords, interpolate=True):
+        """Xác suất chuẩn hóa tại coords [lat, long]; interpolate=False -> ô gần nhất"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        pos = (coords - self.origin) / self.step
+        if interpolate:
+            return _bilinear(self.table, pos) * self.scale
+        idx = np.rint(pos).astype(int)
+        nx, ny = self.table.shape
+        inside = (idx[:, 0] >= 0) & (idx[:, 0] < nx) & (idx[:, 1] >= 0) & (idx[:, 1] < ny)
+        values = self.table[np.clip(idx[:, 0], 0, nx - 1), np.clip(idx[:, 1], 0, ny - 1)]
+        return np.where(inside, values * self.scale, 0.0)
+
+    def save(self, path):
+        """Lưu bảng ra .npz (mảng uint + origin / step / bits)"""
+        meta = {'version': LUT_VERSION, 'origin': self.origin.tolist(), 'step': self.step, 'bits': self.bits}
+        np.savez(path, table=self.table, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != LUT_VERSION:
+                raise ValueError(f"❌ Unsupported density LUT version {meta.get('version')} in {path}")
+            return cls(data['table'], meta['origin'], meta['step'], meta['bits'])
+
+    def write_c_header(self, path, name='home_range_lut'):
+        """Xuất bảng thành mảng C const (tra ô gần nhất / song tuyến trên phần cứng)"""
+        ctype = {8: 'unsigned char', 16: 'unsigned short'}.get(self.bits, 'unsigned int')
+        nx, ny = self.table.shape
+        guard = f'{name.upper()}_H'
+        lines = [f'#ifndef {guard}', f'#define {guard}', '',
+                 f'// origin lat={self.origin[0]!r}, long={self.origin[1]!r}, step={self.step!r} deg',
+                 f'// value = {name}[i][j] / {2 ** self.bits - 1} (xac suat home range chuan hoa)',
+                 f'#define {name.upper()}_NX {nx}', f'#define {name.upper()}_NY {ny}',
+                 f'#define {name.upper()}_BITS {self.bits}', '',
+                 f'const {ctype} {name}[{nx}][{ny}] = {{']
+        for row in self.table:
+            lines.append('    {' + ','.join(str(int(v)) for v in row) + '},')
+        lines += ['};', '', '#endif', '']
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines))
+
+
+def grid_bounds(coords, pad, bbox=None):
+    """bbox (lat_min, lat_max, long_min, long_max); mặc định = vùng dữ liệu nới thêm pad"""
+    if bbox is not None:
+        return np.array([bbox[0], bbox[2]]), np.array([bbox[1], bbox[3]])
+    return coords.min(axis=0) - pad, coords.max(axis=0) + pad
+
+
+def build_lut(df, bandwidth=0.01, resolution=0.001, bbox=None, bits=8, engine='exact', **kde_options):
+    """
+    Raster hóa KDE home range của calculate_kde_probability (fit trên các điểm
+    point_is_outside == 0, chuẩn hóa min-max trên mọi fix của df).
+    resolution: kích thước ô (độ); bbox: vùng lưới, mặc định = dữ liệu + 3 * bandwidth.
+    """
+    coords = df[['location-lat', 'location-long']].values
+    normal_coords = coords[df['point_is_outside'] == 0]
+    if len(normal_coords) < 10:
+        normal_coords = coords
+
+    kde = make_kde(engine, bandwidth=bandwidth, **kde_options)
+    kde.fit(normal_coords)
+    prob = np.exp(kde.score_samples(coords))
+    p_min, p_max = prob.min(), prob.max()
+
+    lo, hi = grid_bounds(coords, 3 * bandwidth, bbox)
+    shape = np.floor((hi - lo) / resolution).astype(int) + 1
+    lat = lo[0] + np.arange(shape[0]) * resolution
+    lon = lo[1] + np.arange(shape[1]) * resolution
+    nodes = np.column_stack([np.repeat(lat, shape[1]), np.tile(lon, shape[0])])
+
+    values = (np.exp(kde.score_samples(nodes)) - p_min) / (p_max - p_min)
+    levels = 2 ** bits - 1
+    dtype = np.uint8 if bits <= 8 else np.uint16 if bits <= 16 else np.uint32
+    table = np.rint(np.clip(values, 0.0, 1.0) * levels).astype(dtype).reshape(shape)
+    return DensityLUT(table, lo, resolution, bits)
+
+
+def lut_report(lut, df, exact_prob):
+    """Sai số tra bảng so với KDE exact (theo fix và theo đặc trưng 2h) và bộ nhớ của bảng"""
+    from locfeature import RAW_WINDOW_STATS, KDE_LOW_PROB
+    from window_agg import aggregate_windows
+
+    coords = df[['location-lat', 'location-long']].values
+    specs = [spec for spec in RAW_WINDOW_STATS if spec[0] in ('kde_prob_min', 'kde_low_prob_ratio')]
+    exact_feat = aggregate_windows(pd.DataFrame({'kde_probability': exact_prob,
+                                                 'kde_low_prob': (exact_prob < KDE_LOW_PROB).astype(float)}),
+                                   df['timestamp'], specs)
+
+    rows = []
+    for mode, interpolate in [('nearest', False), ('bilinear', True)]:
+        t0 = time.perf_counter()
+        prob = lut.lookup(coords, interpolate=interpolate)
+        seconds = time.perf_counter() - t0
+        feat = aggregate_windows(pd.DataFrame({'kde_probability': prob,
+                                               'kde_low_prob': (prob < KDE_LOW_PROB).astype(float)}),
+                                 df['timestamp'], specs)
+        err = np.abs(prob - exact_prob)
+        rows.append({
+            'mode': mode,
+            'max_abs_error': err.max(),
+            'mean_abs_error': err.mean(),
+            'low_prob_flips': int(((prob < KDE_LOW_PROB) != (exact_prob < KDE_LOW_PROB)).sum()),
+            'kde_prob_min_max_error': np.nanmax(np.abs(feat['kde_prob_min'] - exact_feat['kde_prob_min'])),
+            'kde_low_prob_ratio_mean_error': np.nanmean(np.abs(feat['kde_low_prob_ratio']
+                                                               - exact_feat['kde_low_prob_ratio'])),
+            'windows_changed': int((np.abs(feat['kde_low_prob_ratio'] - exact_feat['kde_low_prob_ratio']) > 0).sum()),
+            'table_bytes': lut.nbytes,
+            'lookups_per_second': len(coords) / seconds if seconds > 0 else np.inf,
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    from locfeature import load_collar, compute_kinematics, kde_point_is_outside, calculate_kde_probability
+
+    parser = argparse.ArgumentParser(description='Xuất bảng tra mật độ home range (raster lượng tử hóa)')
+    parser.add_argument('--output', default='home_range_lut.npz')
+    parser.add_argument('--header', default=None, help='Xuất thêm mảng C (.h)')
+    parser.add_argument('--resolution', type=float, default=0.001, help='Kích thước ô lưới (độ)')
+    parser.add_argument('--bbox', type=float, nargs=4, default=None,
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LONG_MIN', 'LONG_MAX'))
+    parser.add_argument('--bits', type=int, default=8, help='Số bit lượng tử hóa mỗi ô')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='exact',
+                        help='KDE dùng để tính giá trị các ô lưới')
+    args = parser.parse_args(argv)
+
+    df = compute_kinematics(load_collar())
+    df['point_is_outside'], _ = kde_point_is_outside(df)
+    exact_prob = calculate_kde_probability(df)
+
+    t0 = time.perf_counter()
+    lut = build_lut(df, resolution=args.resolution, bbox=args.bbox, bits=args.bits, engine=args.kde_engine)
+    print(f"✅ Raster {lut.shape[0]}x{lut.shape[1]} ô, {args.bits} bit, {lut.nbytes / 1024:.1f} KiB "
+          f"({time.perf_counter() - t0:.1f}s)")
+    lut.save(args.output)
+    print(f"💾 Đã lưu {args.output}")
+    if args.header:
+        lut.write_c_header(args.header)
+        print(f"💾 Đã xuất {args.header}")
+
+    print("\n📊 Sai số tra bảng so với KDE exact:")
+    print(lut_report(lut, df, exact_prob).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import itertools
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold
+
+# ===== TÌM SIÊU THAM SỐ NHANH CHO PIPELINE SMOTE -> UNDERSAMPLER -> RF =====
+# GridSearchCV fit lại SMOTE + RandomUnderSampler cho mỗi (ứng viên, fold), dù kết quả
+# resample chỉ phụ thuộc fold. Ở đây:
+# 1) resample mỗi fold một lần và dùng lại cho mọi ứng viên;
+# 2) với mỗi (max_depth, min_samples_leaf, fold) chỉ trồng một forest, tăng dần
+#    n_estimators bằng warm_start: cây thêm vào có cùng seed như khi fit lại từ đầu,
+#    nên điểm từng ứng viên trùng với GridSearchCV;
+# 3) successive halving: n_estimators là tài nguyên, mỗi vòng chỉ giữ 1/factor ứng viên
+#    (depth, leaf) tốt nhất và trồng thêm cây cho chúng.
+# Kết quả có cùng best_params_ / best_score_ / cv_results_ / best_estimator_ như GridSearchCV.
+
+SEARCH_STRATEGIES = ('grid', 'halving')
+
+
+def resample_folds(pipeline, X, y, cv=5):
+    """
+    [(X_res, y_res, X_val, y_val)] cho từng fold: các bước resample của pipeline
+    (mọi bước trừ bước cuối) fit trên phần train của fold, phần validation giữ nguyên.
+    """
+    cv = StratifiedKFold(n_splits=cv) if isinstance(cv, int) else cv
+    X, y = pd.DataFrame(X), pd.Series(y)
+    folds = []
+    for train_idx, val_idx in cv.split(X, y):
+        X_res, y_res = X.iloc[train_idx], y.iloc[train_idx]
+        for _, sampler in pipeline.steps[:-1]:
+            X_res, y_res = clone(sampler).fit_resample(X_res, y_res)
+        folds.append((X_res, y_res, X.iloc[val_idx], y.iloc[val_idx]))
+    return folds
+
+
+def _grow(rf, levels, fold, scorer, keep):
+    """
+    Tăng dần n_estimators của một forest warm_start trên một fold: điểm và thời gian fit mỗi mức.
+    keep=False: không trả forest về (tránh giữ mọi forest trong bộ nhớ).
+    """
+    X_res, y_res, X_val, y_val = fold
+    scores, fit_times = [], []
+    for n in levels:
+        t0 = time.perf_counter()
+        # forest luôn trồng tiếp trên cùng dữ liệu fold nên class_weight='balanced' vẫn đúng
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='class_weight presets', category=UserWarning)
+            rf.set_params(n_estimators=n).fit(X_res, y_res)
+        fit_times.append(time.perf_counter() - t0)
+        scores.append(scorer(rf, X_val, y_val))
+    return (rf if keep else None), scores, fit_times
+
+
+class FastSearchCV:
+    """
+    Thay cho GridSearchCV(pipeline, param_grid) với pipeline imblearn kết thúc bằng
+    RandomForestClassifier tên `step` (tham số dạng 'rf__...').
+    strategy='grid': đánh giá đủ lưới; 'halving': successive halving theo n_estimators.
+    """
+
+    def __init__(self, estimator, param_grid, cv=5, scoring='f1_macro', strategy='grid', factor=3,
+                 n_jobs=-1, refit=True, step='rf', verbose=1):
+        if strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f"❌ Unknown search strategy: {strategy} (chọn trong {SEARCH_STRATEGIES})")
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.scoring = scoring
+        self.strategy = strategy
+        self.factor = factor
+        self.n_jobs = n_jobs
+        self.refit = refit
+        self.step = step
+        self.verbose = verbose
+
+    def _split_grid(self):
+        """Các mức n_estimators (tăng dần) và các tổ hợp tham số còn lại theo thứ tự của ParameterGrid"""
+        n_key = self.step + '__n_estimators'
+        levels = sorted(self.param_grid.get(n_key, [self.estimator.get_params()[n_key]]))
+        other = sorted(k for k in self.param_grid if k != n_key)
+        combos = [dict(zip(other, values)) for values in itertools.product(*(self.param_grid[k] for k in other))]
+        return levels, combos
+
+    def _grow_all(self, forests, levels, keep=False):
+        """
+        Trồng thêm cây cho mọi forest {(combo, fold): rf} tới từng mức trong levels (song song);
+        keep=True: cập nhật forests bằng forest đã trồng để vòng sau trồng tiếp.
+        """
+        keys = list(forests)
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_grow)(forests[k], levels, self.folds_[k[1]], self.scorer_, keep) for k in keys)
+        scores = {}
+        for (i, f), (rf, split_scores, fit_times) in zip(keys, results):
+            if keep:
+                forests[(i, f)] = rf
+            for n, score, fit_time in zip(levels, split_scores, fit_times):
+                entry = scores.setdefault((i, n), ({}, {}))
+                entry[0][f], entry[1][f] = score, fit_time
+        return scores
+
+    def fit(self, X, y):
+        t0 = time.perf_counter()
+        self.scorer_ = get_scorer(self.scoring)
+        self.folds_ = resample_folds(self.estimator, X, y, self.cv)
+        self.resample_seconds_ = time.perf_counter() - t0
+        levels, combos = self._split_grid()
+
+        forest = self.estimator.steps[-1][1]
+        prefix = self.step + '__'
+
+        def new_forest(i):
+            params = {k[len(prefix):]: v for k, v in combos[i].items()}
+            return clone(forest).set_params(warm_start=True, oob_score=False, n_jobs=1, **params)
+
+        n_folds = len(self.folds_)
+        if self.strategy == 'grid':
+            forests = {(i, f): new_forest(i) for i in range(len(combos)) for f in range(n_folds)}
+            evaluated = self._grow_all(forests, levels)
+            final = set(evaluated)
+        else:
+            # forest của ứng viên còn sống được giữ lại giữa các vòng và chỉ trồng thêm cây
+            evaluated, forests, alive = {}, {}, list(range(len(combos)))
+            for n in levels:
+                for i in alive:
+                    for f in range(n_folds):
+                        forests.setdefault((i, f), new_forest(i))
+                alive_forests = {k: rf for k, rf in forests.items() if k[0] in alive}
+                round_scores = self._grow_all(alive_forests, [n], keep=True)
+                evaluated.update(round_scores)
+                final = set(round_scores)
+                if self.verbose:
+                    print(f"   halving: {len(alive)} ứng viên với n_estimators={n}")
+                n_keep = max(1, int(np.ceil(len(alive) / self.factor)))
+                alive = sorted(alive, key=lambda i: -np.mean(list(round_scores[(i, n)][0].values())))[:n_keep]
+                forests = {k: rf for k, rf in alive_forests.items() if k[0] in alive}
+
+        # thứ tự của GridSearchCV: các tổ hợp theo ParameterGrid, n_estimators thay đổi nhanh nhất
+        keys = sorted(evaluated)
+        params = [{**combos[i], prefix + 'n_estimators': n} for i, n in keys]
+        split_scores = np.array([[evaluated[k][0][f] for f in range(n_folds)] for k in keys])
+        fit_times = np.array([[evaluated[k][1][f] for f in range(n_folds)] for k in keys])
+        mean = np.average(split_scores, axis=1)
+        self.cv_results_ = {
+            'params': params,
+            'mean_fit_time': fit_times.mean(axis=1),
+            'mean_test_score': mean,
+            'std_test_score': split_scores.std(axis=1),
+            'rank_test_score': pd.Series(mean).rank(method='min', ascending=False).astype(int).to_numpy(),
+        }
+        for f in range(n_folds):
+            self.cv_results_[f'split{f}_test_score'] = split_scores[:, f]
+        for name in self.param_grid:
+            self.cv_results_[f'param_{name}'] = np.array([p[name] for p in params], dtype=object)
+
+        # như GridSearchCV: ứng viên đầu tiên có điểm cao nhất (halving: chỉ xét vòng cuối)
+        candidates = [idx for idx, k in enumerate(keys) if k in final]
+        self.best_index_ = max(candidates, key=lambda idx: (mean[idx], -idx))
+        self.best_params_ = params[self.best_index_]
+        self.best_score_ = float(mean[self.best_index_])
+        self.search_seconds_ = time.perf_counter() - t0
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+
+def main(argv=None):
+    from sklearn.model_selection import GridSearchCV, train_test_split
+    from imblearn.pipeline import Pipeline as ImbPipeline
+    from imblearn.over_sampling import SMOTE
+    from imblearn.under_sampling import RandomUnderSampler
+    from columnar import read_table
+
+    parser = argparse.ArgumentParser(description='So sánh thời gian GridSearchCV với tìm kiếm nhanh (cache fold + warm_start)')
+    parser.add_argument('--table', default='elephant_6features_cleaned')
+    parser.add_argument('--strategies', nargs='+', default=['gridsearchcv', 'grid', 'halving'],
+                        choices=['gridsearchcv', *SEARCH_STRATEGIES])
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    df = read_table(args.table)
+    X, y = df.drop(columns=['is_outside']), df['is_outside']
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+
+    pipeline = ImbPipeline([
+        ('smote', SMOTE(sampling_strategy=0.5, random_state=42)),
+        ('under', RandomUnderSampler(sampling_strategy=0.8, random_state=42)),
+        ('rf', RandomForestClassifier(criterion='gini', class_weight='balanced', oob_score=True,
+                                      random_state=42, n_jobs=-1)),
+    ])
+    param_grid = {
+        'rf__n_estimators': [200, 300, 400],
+        'rf__max_depth': [8, 10, 12],
+        'rf__min_samples_leaf': [1, 2, 5],
+    }
+
+    rows = []
+    for strategy in args.strategies:
+        print(f"⏳ {strategy}...")
+        t0 = time.perf_counter()
+        if strategy == 'gridsearchcv':
+            search = GridSearchCV(pipeline, param_grid, cv=5, scoring='f1_macro', n_jobs=args.jobs, refit=False)
+        else:
+            search = FastSearchCV(pipeline, param_grid, cv=5, scoring='f1_macro', strategy=strategy,
+                                  n_jobs=args.jobs, refit=False)
+        search.fit(X_train, y_train)
+        rows.append({'strategy': strategy, 'seconds': time.perf_counter() - t0,
+                     'candidates': len(search.cv_results_['params']),
+                     'best_score': search.best_score_, 'best_params': search.best_params_})
+
+    report = pd.DataFrame(rows)
+    report['speedup'] = report['seconds'].iloc[0] / report['seconds']
+    print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from columnar import read_table
+from kde_engine import KDE_ENGINES
+from locfeature import (INPUT_FILE, FEATURE_COLUMNS, SELECTED_FEATURES, load_collar, extract_features,
+                        required_nodes)
+
+# ===== CHỌN FEATURE THEO CHI PHÍ TÍNH TOÁN =====
+# Chi phí của một tập feature = tổng thời gian các node FEATURE_GRAPH cần chạy cho tập đó
+# (node dùng chung như kinematics / KDE chỉ tính một lần), quy ra micro giây trên mỗi fix.
+# Độ chính xác = F1 (lớp is_outside) của random forest cấu hình FPGA, CV phân tầng.
+# Tìm kiếm tham lam: mỗi bước thêm feature cho F1 cao nhất mà vẫn trong ngân sách
+# (chi phí và / hoặc số feature), ghi lại mọi tập đã thử để lập bảng Pareto chi phí / F1.
+
+LABEL = 'is_outside'
+CANDIDATES = [f for f in FEATURE_COLUMNS if f != LABEL]
+
+# Cấu hình forest giống model/training_quantizied.py (mô hình chạy trên FPGA)
+RF_PARAMS = {'n_estimators': 80, 'max_depth': 6, 'class_weight': 'balanced', 'random_state': 42}
+
+
+def measure_node_costs(path=INPUT_FILE, kde_engine='exact', repeat=1):
+    """Thời gian từng node (micro giây / fix, min qua `repeat` lần chạy) khi tính toàn bộ feature"""
+    raw = load_collar(path)
+    best = {}
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            feat_df, df = extract_features(raw.copy(), kde_engine=kde_engine)
+        for name, seconds in feat_df.attrs['node_seconds'].items():
+            best[name] = min(best.get(name, np.inf), seconds)
+    return {name: seconds / len(df) * 1e6 for name, seconds in best.items()}
+
+
+def subset_cost(features, node_costs):
+    """Chi phí (micro giây / fix) của tập feature: tổng các node cần chạy (không tính nhãn)"""
+    return sum(node_costs[name] for name in required_nodes(list(features)))
+
+
+def load_training_table(path='elephant_features_kde_enhanced'):
+    """Bảng feature 2h, bỏ các cửa sổ rỗng như featureselection.py"""
+    df = read_table(path).replace([np.inf, -np.inf], np.nan).fillna(0)
+    garbage = (df['dist_to_centroid_mean'] < 0.1) & (df['mean_speed'] == 0)
+    return df[~garbage].reset_index(drop=True)
+
+
+def _forest(n_jobs):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_jobs=n_jobs, **RF_PARAMS)
+
+
+def cv_f1(X, y, features, folds=3, n_jobs=-1):
+    """F1 trung bình (lớp 1) qua StratifiedKFold"""
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    return float(cross_val_score(_forest(n_jobs), X[list(features)], y, cv=cv, scoring='f1').mean())
+
+
+def feature_importances(X, y, n_repeats=5, n_jobs=-1):
+    """
+    Impurity importance và permutation importance (giảm F1 trên tập test 20%),
+    permutation chạy song song theo feature (n_jobs process).
+    """
+    from sklearn.inspection import permutation_importance
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    rf = _forest(n_jobs).fit(X_train, y_train)
+    perm = permutation_importance(rf, X_test, y_test, scoring='f1', n_repeats=n_repeats,
+                                  random_state=42, n_jobs=n_jobs)
+    return pd.DataFrame({'feature': X.columns, 'impurity_importance': rf.feature_importances_,
+                         'permutation_importance': perm.importances_mean,
+                         'permutation_std': perm.importances_std})
+
+
+def greedy_search(X, y, candidates, node_costs, max_cost=None, max_features=None, folds=3, n_jobs=-1):
+    """
+    Thêm dần feature: mỗi bước thử mọi ứng viên còn trong ngân sách, giữ tập có F1 cao nhất.
+    Trả về (tập tốt nhất trong ngân sách, DataFrame mọi tập đã đánh giá).
+    """
+    evaluated = {}
+
+    def evaluate(subset):
+        key = tuple(sorted(subset))
+        if key not in evaluated:
+            evaluated[key] = {'features': list(subset), 'n_features': len(subset),
+                              'cost_us_per_fix': subset_cost(subset, node_costs),
+                              'f1': cv_f1(X, y, subset, folds=folds, n_jobs=n_jobs)}
+        return evaluated[key]
+
+    selected, best = [], None
+    while max_features is None or len(selected) < max_features:
+        step = []
+        for feature in candidates:
+            if feature in selected:
+                continue
+            subset = selected + [feature]
+            if max_cost is not None and subset_cost(subset, node_costs) > max_cost:
+                continue
+            step.append(evaluate(subset))
+        if not step:
+            break
+        winner = max(step, key=lambda r: (r['f1'], -r['cost_us_per_fix']))
+        if best is not None and winner['f1'] <= best['f1']:
+            break
+        selected, best = winner['features'], winner
+        print(f"   + {selected[-1]:<26} F1={best['f1']:.4f}  cost={best['cost_us_per_fix']:.1f} µs/fix")
+
+    return best, pd.DataFrame(evaluated.values())
+
+
+def pareto_front(table):
+    """Các tập không bị tập khác vừa rẻ hơn (hoặc bằng) vừa có F1 cao hơn (hoặc bằng) áp đảo"""
+    table = table.sort_values(['cost_us_per_fix', 'f1'], ascending=[True, False])
+    front, best_f1 = [], -np.inf
+    for idx, row in table.iterrows():
+        if row['f1'] > best_f1:
+            front.append(idx)
+            best_f1 = row['f1']
+    return table.loc[front].reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Chọn feature tối đa F1 (is_outside) trong ngân sách chi phí tính')
+    parser.add_argument('--table', default='elephant_features_kde_enhanced', help='Bảng feature 2h (.cols / .csv)')
+    parser.add_argument('--input', default=INPUT_FILE, help='File Movebank dùng để đo chi phí các node')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='exact')
+    parser.add_argument('--max-cost', type=float, default=None, help='Ngân sách chi phí (micro giây / fix)')
+    parser.add_argument('--max-features', type=int, default=6, help='Số feature tối đa')
+    parser.add_argument('--candidates', type=int, default=12,
+                        help='Chỉ tìm trong N feature (vừa ngân sách) có permutation importance cao nhất')
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=-1, help='Số process (permutation importance / forest)')
+    parser.add_argument('--output', default='feature_cost_pareto.csv')
+    args = parser.parse_args(argv)
+
+    print("⏳ Đo chi phí các node trích xuất...")
+    node_costs = measure_node_costs(args.input, kde_engine=args.kde_engine)
+    for name, cost in sorted(node_costs.items(), key=lambda kv: -kv[1]):
+        print(f"   {name:<18}{cost:>10.1f} µs/fix")
+
+    df = load_training_table(args.table)
+    X, y = df[CANDIDATES], df[LABEL]
+    print(f"\n⏳ Importance trên {len(df)} cửa sổ ({y.sum()} outside)...")
+    ranking = feature_importances(X, y, n_jobs=args.jobs)
+    ranking['standalone_cost_us_per_fix'] = [subset_cost([f], node_costs) for f in ranking['feature']]
+    ranking = ranking.sort_values('permutation_importance', ascending=False).reset_index(drop=True)
+    print(ranking.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+
+    affordable = ranking if args.max_cost is None else ranking[ranking['standalone_cost_us_per_fix'] <= args.max_cost]
+    candidates = list(affordable['feature'][:args.candidates])
+    print(f"\n⏳ Tìm tập feature (tối đa {args.max_features} feature"
+          + (f", ≤ {args.max_cost} µs/fix" if args.max_cost is not None else "") + ")...")
+    best, evaluated = greedy_search(X, y, candidates, node_costs, max_cost=args.max_cost,
+                                    max_features=args.max_features, folds=args.folds, n_jobs=args.jobs)
+
+    reference = {'features': SELECTED_FEATURES, 'n_features': len(SELECTED_FEATURES),
+                 'cost_us_per_fix': subset_cost(SELECTED_FEATURES, node_costs),
+                 'f1': cv_f1(X, y, SELECTED_FEATURES, folds=args.folds, n_jobs=args.jobs)}
+    evaluated = pd.concat([evaluated, pd.DataFrame([reference])], ignore_index=True)
+
+    front = pareto_front(evaluated)
+    front['features'] = front['features'].map(', '.join)
+    front.to_csv(args.output, index=False)
+    print(f"\n📊 Pareto chi phí / F1 (đã lưu {args.output}):")
+    print(front.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+
+    print(f"\nSELECTED_FEATURES hiện tại: F1={reference['f1']:.4f}, cost={reference['cost_us_per_fix']:.1f} µs/fix")
+    if best is None:
+        print("⚠️ Không có feature nào vừa ngân sách")
+        return
+    print(f"✅ Tập được chọn: F1={best['f1']:.4f}, cost={best['cost_us_per_fix']:.1f} µs/fix")
+    print("SELECTED_FEATURES = [")
+    for feature in best['features']:
+        print(f"    '{feature}',")
+    print("]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import time
+
+# ===== ĐỒ THỊ PHỤ THUỘC CỦA CÁC BƯỚC TÍNH ĐẶC TRƯNG =====
+# Mỗi node là một bước tính (fit KDE, turning angle, lưới 1h, ...) khai báo các cột
+# nó tạo ra và các node nó cần. Khi yêu cầu một danh sách cột, chỉ các node cần
+# thiết (và các node phía trước chúng) được chạy, theo thứ tự phụ thuộc.
+
+
+class FeatureGraph:
+    """
+    Đồ thị node: node(name, provides, requires) đăng ký hàm func(ctx);
+    run(columns, ctx) chạy các node cần cho columns và trả về danh sách node đã chạy.
+    requires có thể là hàm requires(ctx) khi phụ thuộc thay đổi theo cấu hình
+    (ví dụ tra bảng mật độ thay cho fit KDE).
+    """
+
+    def __init__(self):
+        self.nodes = {}       # tên node -> (các node cần, func)
+        self.providers = {}   # tên cột -> tên node tạo ra cột đó
+
+    def node(self, name, provides, requires=()):
+        def register(func):
+            self.nodes[name] = (requires if callable(requires) else tuple(requires), func)
+            for column in provides:
+                self.providers[column] = name
+            return func
+        return register
+
+    def plan(self, columns, ctx=None):
+        """Thứ tự các node cần chạy để có đủ columns (node phụ thuộc chạy trước)"""
+        order, done = [], set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in path:
+                raise ValueError(f"❌ Vòng phụ thuộc tại node '{name}'")
+            requires = self.nodes[name][0]
+            for dep in (requires(ctx) if callable(requires) else requires):
+                visit(dep, path + (name,))
+            done.add(name)
+            order.append(name)
+
+        for column in columns:
+            if column not in self.providers:
+                raise KeyError(f"❌ Không có node nào tạo cột '{column}'")
+            visit(self.providers[column], ())
+        return order
+
+    def run(self, columns, ctx, timings=None):
+        """Chạy các node cần cho columns; timings (dict) nhận thời gian chạy từng node (giây)"""
+        order = self.plan(columns, ctx)
+        for name in order:
+            t0 = time.perf_counter()
+            self.nodes[name][1](ctx)
+            if timings is not None:
+                timings[name] = time.perf_counter() - t0
+        return order
+
+    def skipped(self, executed):
+        return [name for name in self.nodes if name not in executed]
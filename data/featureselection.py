@@ -1,14 +1,17 @@
-import pandas as pd
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
+from columnar import read_table, write_table
+from locfeature import SELECTED_FEATURES
+
+# --csv: xuất thêm bản CSV bên cạnh bảng cột nhị phân
+EXPORT_CSV = '--csv' in sys.argv[1:]
 
 # =========================
 # 1. ĐỌC VÀ CHUẨN BỊ DỮ LIỆU
 # =========================
 print("⏳ Đang tải dữ liệu...")
-df = pd.read_csv('elephant_features_kde_enhanced.csv')
+df = read_table('elephant_features_kde_enhanced')
 
 # Loại bỏ timestamp và thay thế vô cực
 if 'timestamp' in df.columns:
@@ -18,14 +21,8 @@ df = df.replace([np.inf, -np.inf], np.nan).fillna(0)
 # =========================
 # 2. FILTER SELECTED FEATURES (FPGA)
 # =========================
-SELECTED_FEATURES = [
-    "kde_low_prob_ratio",
-    "kde_prob_min",
-    "dist_to_centroid_mean",
-    "turning_angle_max",
-    "mean_speed",
-    "turning_entropy"
-]
+# Danh sách 6 feature nằm ở locfeature.SELECTED_FEATURES
+# (locfeature.py --features selected chỉ tính đúng các feature này)
 
 print("\n🔍 Filtering selected 6 features for FPGA...")
 
@@ -84,9 +81,10 @@ df = df_clean
 # =========================
 print("\nDataset shape final:", df.shape)
 
-output_filename = "elephant_6features_cleaned.csv"
-df.to_csv(output_filename, index=False)
-print(f"🎉 Đã lưu file sạch: {output_filename}")
+output_filename = "elephant_6features_cleaned"
+df = df.reset_index(drop=True)
+write_table(df, output_filename, csv=EXPORT_CSV)
+print(f"🎉 Đã lưu file sạch: {output_filename}.cols" + (" (+ .csv)" if EXPORT_CSV else ""))
 
 # Hiển thị 5 dòng đầu để kiểm tra
 print("\n5 dòng dữ liệu đầu tiên:")
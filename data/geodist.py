@@ -0,0 +1,152 @@
+import numpy as np
+
+# ===== KHOẢNG CÁCH ĐỊA LÝ VECTOR HÓA =====
+# Thay cho vòng lặp geopy.distance.geodesic từng điểm: nhận cả mảng tọa độ
+# (độ) và trả về mảng khoảng cách (mét) trong một lần gọi.
+
+# Ellipsoid WGS-84 (giống geopy)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+# Bán kính trung bình cho haversine
+EARTH_RADIUS_M = 6371008.8
+
+METHODS = ('haversine', 'vincenty')
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS_M):
+    """Khoảng cách mặt cầu (haversine), nhanh nhưng sai số ~0.5%"""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * radius * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty(lat1, lon1, lat2, lon2, tol=1e-12, max_iter=200):
+    """
+    Khoảng cách trên ellipsoid WGS-84 theo công thức nghịch Vincenty.
+    tol: ngưỡng hội tụ của lambda (radian). Các cặp không hội tụ
+    (gần đối cực) được tính lại bằng thuật toán Karney của geopy.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *[np.asarray(v, dtype=np.float64) for v in (lat1, lon1, lat2, lon2)])
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (v.ravel() for v in (lat1, lon1, lat2, lon2))
+
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(L.shape, dtype=bool)
+    sin_sigma = np.zeros_like(L)
+    cos_sigma = np.ones_like(L)
+    sigma = np.zeros_like(L)
+    cos_sq_alpha = np.ones_like(L)
+    cos_2sigma_m = np.zeros_like(L)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        sin_lam, cos_lam = np.sin(lam[idx]), np.cos(lam[idx])
+        s_sig = np.hypot(cosU2[idx] * sin_lam,
+                         cosU1[idx] * sinU2[idx] - sinU1[idx] * cosU2[idx] * cos_lam)
+        c_sig = sinU1[idx] * sinU2[idx] + cosU1[idx] * cosU2[idx] * cos_lam
+        sig = np.arctan2(s_sig, c_sig)
+
+        # Hai điểm trùng nhau -> khoảng cách 0
+        same = s_sig == 0
+        safe_s_sig = np.where(same, 1.0, s_sig)
+        sin_alpha = np.where(same, 0.0, cosU1[idx] * cosU2[idx] * sin_lam / safe_s_sig)
+        c_sq_alpha = 1 - sin_alpha ** 2
+        # Đường xích đạo: cos^2(alpha) = 0
+        c_2sig_m = np.where(c_sq_alpha != 0,
+                            c_sig - 2 * sinU1[idx] * sinU2[idx] / np.where(c_sq_alpha != 0, c_sq_alpha, 1.0),
+                            0.0)
+        C = f / 16 * c_sq_alpha * (4 + f * (4 - 3 * c_sq_alpha))
+        lam_new = L[idx] + (1 - C) * f * sin_alpha * (
+            sig + C * s_sig * (c_2sig_m + C * c_sig * (-1 + 2 * c_2sig_m ** 2)))
+
+        sin_sigma[idx] = s_sig
+        cos_sigma[idx] = c_sig
+        sigma[idx] = sig
+        cos_sq_alpha[idx] = c_sq_alpha
+        cos_2sigma_m[idx] = c_2sig_m
+
+        done = (np.abs(lam_new - lam[idx]) <= tol) | same
+        lam[idx] = lam_new
+        active[idx[done]] = False
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    dist = WGS84_B * A * (sigma - delta_sigma)
+
+    # Không hội tụ (điểm gần đối cực) -> dùng Karney qua geopy
+    if active.any():
+        from geopy.distance import geodesic
+        for i in np.flatnonzero(active):
+            dist[i] = geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).meters
+
+    return dist.reshape(shape)
+
+
+def distance(lat1, lon1, lat2, lon2, method='vincenty', tol=1e-12):
+    """Chọn phương pháp tính khoảng cách: 'haversine' hoặc 'vincenty'"""
+    if method == 'haversine':
+        return haversine(lat1, lon1, lat2, lon2)
+    if method == 'vincenty':
+        return vincenty(lat1, lon1, lat2, lon2, tol=tol)
+    raise ValueError(f"❌ Unknown distance method: {method} (chọn trong {METHODS})")
+
+
+def step_distances(coords, method='vincenty', tol=1e-12):
+    """Khoảng cách giữa các điểm liên tiếp, điểm đầu = 0 (coords: [lat, long])"""
+    coords = np.asarray(coords, dtype=np.float64)
+    dist = np.zeros(len(coords))
+    if len(coords) > 1:
+        dist[1:] = distance(coords[:-1, 0], coords[:-1, 1],
+                            coords[1:, 0], coords[1:, 1], method=method, tol=tol)
+    return dist
+
+
+def distances_to_point(coords, point, method='vincenty', tol=1e-12):
+    """Khoảng cách từ mọi điểm tới một điểm cố định (ví dụ centroid)"""
+    coords = np.asarray(coords, dtype=np.float64)
+    return distance(coords[:, 0], coords[:, 1], point[0], point[1], method=method, tol=tol)
+
+
+def max_deviation_from_geopy(coords, method='vincenty', tol=1e-12):
+    """So sánh step_distances với geopy.geodesic, trả về sai lệch lớn nhất (mét)"""
+    from geopy.distance import geodesic
+
+    coords = np.asarray(coords, dtype=np.float64)
+    ref = [0.0] + [geodesic(coords[i - 1], coords[i]).meters for i in range(1, len(coords))]
+    fast = step_distances(coords, method=method, tol=tol)
+    return float(np.max(np.abs(fast - np.array(ref))))
+
+
+if __name__ == '__main__':
+    import time
+    import pandas as pd
+
+    df = pd.read_csv('Elephant Research - Ivory Coast - Collar 1630.csv',
+                     usecols=['timestamp', 'location-lat', 'location-long'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    coords = df.sort_values('timestamp')[['location-lat', 'location-long']].values
+
+    for method in METHODS:
+        t0 = time.perf_counter()
+        step_distances(coords, method=method)
+        elapsed = time.perf_counter() - t0
+        dev = max_deviation_from_geopy(coords, method=method)
+        print(f"{method:>10}: {elapsed * 1000:.1f} ms, max deviation vs geopy = {dev:.6f} m")
@@ -0,0 +1,260 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from kde_engine import make_kde, IncrementalBinnedKDE
+
+# ===== HOME RANGE ĐÃ FIT (DÙNG ĐỂ CHẤM ĐIỂM TỪNG FIX MỚI) =====
+# Gom các KDE của locfeature (point_is_outside, kde_probability, day/night) cùng
+# hằng số chuẩn hóa min-max và centroid, để chấm điểm fix mới mà không cần
+# toàn bộ lịch sử (dùng cho streaming).
+# engine='incremental': các KDE là lưới IncrementalBinnedKDE, update() hấp thụ fix mới
+# (kèm half_life để giảm dần trọng số dữ liệu cũ), save()/load() lưu mô hình ra .npz
+# để lần chạy sau chỉ cập nhật thay vì fit lại trên toàn bộ dữ liệu lịch sử.
+
+MODEL_VERSION = 1
+PERIODS = [(1, 'day'), (0, 'night')]
+
+
+def _npz_path(path):
+    return path if str(path).endswith('.npz') else f'{path}.npz'
+
+
+class HomeRange:
+    """
+    Mô hình home range: KDE outside (toàn bộ điểm), KDE home range (điểm inside),
+    KDE ngày / đêm, cùng min/max xác suất trên tập fit và centroid.
+    """
+
+    def __init__(self, bandwidth=0.01, outside_bandwidth=0.01, outside_threshold=0.15,
+                 engine='exact', half_life=None, **kde_options):
+        self.bandwidth = bandwidth
+        self.outside_bandwidth = outside_bandwidth
+        self.outside_threshold = outside_threshold
+        self.engine = engine
+        self.half_life = half_life    # chỉ cho engine 'incremental', ví dụ '90D' (None = không decay)
+        self.kde_options = kde_options
+
+    def _fit_one(self, train_coords, all_coords, bandwidth):
+        kde = make_kde(self.engine, bandwidth=bandwidth, **self.kde_options)
+        kde.fit(train_coords)
+        prob = np.exp(kde.score_samples(all_coords))
+        return {'kde': kde, 'min': prob.min(), 'max': prob.max()}
+
+    # ----- engine incremental -----
+    def _new_incremental(self, bandwidth):
+        return {'kde': IncrementalBinnedKDE(bandwidth=bandwidth, **self.kde_options), 'min': 0.0, 'max': 0.0}
+
+    @staticmethod
+    def _absorb(fitted, coords, decay, nodes=None):
+        fitted['kde'].partial_fit(coords, decay=decay)
+        fitted['min'], fitted['max'] = fitted['kde'].prob_range(nodes)
+
+    def _reset_incremental(self):
+        self.outside_ = self._new_incremental(self.outside_bandwidth)
+        self.home_ = self._new_incremental(self.bandwidth)
+        self.periods_ = {name: None for _, name in PERIODS}
+        self.n_fixes_ = 0
+        self.coord_sum_ = np.zeros(2)
+        self.last_timestamp_ = None
+
+    def update(self, df):
+        """
+        Hấp thụ các fix mới (engine 'incremental'): cập nhật KDE outside, gán nhãn outside
+        cho fix mới theo mô hình đã cập nhật, rồi cập nhật KDE home range / ngày / đêm
+        bằng các fix inside. Không cần dữ liệu các lần trước; fix không mới hơn
+        last_timestamp_ bị bỏ qua.
+        """
+        if self.engine != 'incremental':
+            raise ValueError("❌ update() chỉ dùng với engine='incremental'")
+        if not hasattr(self, 'outside_'):
+            self._reset_incremental()
+        # Chỉ hấp thụ fix mới hơn lần cập nhật trước (chạy lại trên file export cộng dồn không bị đếm trùng)
+        if self.last_timestamp_ is not None:
+            df = df[df['timestamp'] > self.last_timestamp_]
+        if len(df) == 0:
+            return self
+
+        coords = df[['location-lat', 'location-long']].values
+        last = pd.Timestamp(df['timestamp'].max())
+        decay = 1.0
+        if self.half_life is not None and self.last_timestamp_ is not None and last > self.last_timestamp_:
+            decay = 0.5 ** ((last - self.last_timestamp_) / pd.Timedelta(self.half_life))
+
+        self._absorb(self.outside_, coords, decay)
+        point_is_outside = self._normalized(self.outside_, coords) < self.outside_threshold
+
+        normal_coords = coords[~point_is_outside]
+        if self.home_['kde'].weight_ + len(normal_coords) < 10:
+            normal_coords = coords
+        # Như batch: KDE home range / ngày / đêm chuẩn hóa trên mọi fix (nút lưới của KDE outside)
+        nodes = self.outside_['kde'].occupied_nodes()
+        self._absorb(self.home_, normal_coords, decay, nodes)
+
+        is_day = self.is_day(df['timestamp'])
+        for period, period_name in PERIODS:
+            in_period = is_day == period
+            period_normal = coords[in_period & ~point_is_outside]
+            if self.periods_[period_name] is None:
+                if len(period_normal) == 0:
+                    continue
+                self.periods_[period_name] = self._new_incremental(0.01)
+            self._absorb(self.periods_[period_name], period_normal, decay, nodes)
+
+        # Centroid: trung bình cộng dồn trên mọi fix (không decay, như batch)
+        self.n_fixes_ += len(coords)
+        self.coord_sum_ += coords.sum(axis=0)
+        self.centroid_ = tuple(self.coord_sum_ / self.n_fixes_)
+        self.last_timestamp_ = last
+        return self
+
+    def fit(self, df):
+        """df: dữ liệu sau compute_kinematics (timestamp, location-lat, location-long)"""
+        if self.engine == 'incremental':
+            self._reset_incremental()
+            return self.update(df)
+
+        coords = df[['location-lat', 'location-long']].values
+
+        self.outside_ = self._fit_one(coords, coords, self.outside_bandwidth)
+        point_is_outside = self._normalized(self.outside_, coords) < self.outside_threshold
+
+        normal_coords = coords[~point_is_outside]
+        if len(normal_coords) < 10:
+            normal_coords = coords
+        self.home_ = self._fit_one(normal_coords, coords, self.bandwidth)
+
+        is_day = self.is_day(df['timestamp'])
+        self.periods_ = {}
+        for period, period_name in [(1, 'day'), (0, 'night')]:
+            in_period = is_day == period
+            if in_period.sum() < 10:
+                self.periods_[period_name] = None
+                continue
+            coords_period = coords[in_period]
+            period_normal = coords_period[~point_is_outside[in_period]]
+            if len(period_normal) < 5:
+                period_normal = coords_period
+            self.periods_[period_name] = self._fit_one(period_normal, coords, 0.01)
+
+        self.centroid_ = (df['location-lat'].mean(), df['location-long'].mean())
+        return self
+
+    @staticmethod
+    def is_day(timestamps):
+        hour = np.asarray(pd.DatetimeIndex(timestamps).hour)
+        return ((hour >= 6) & (hour < 18)).astype(int)
+
+    @staticmethod
+    def _normalized(fitted, coords):
+        prob = np.exp(fitted['kde'].score_samples(coords))
+        if fitted['max'] == fitted['min']:
+            return np.zeros(len(coords))
+        return (prob - fitted['min']) / (fitted['max'] - fitted['min'])
+
+    def score(self, timestamps, coords):
+        """Các cột KDE của locfeature cho các fix mới (timestamps, coords [lat, long])"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        outside_prob = self._normalized(self.outside_, coords)
+        result = {
+            'point_is_outside': (outside_prob < self.outside_threshold).astype(int),
+            'kde_probability_base': outside_prob,
+            'kde_probability': self._normalized(self.home_, coords),
+        }
+        for period_name, fitted in self.periods_.items():
+            result[f'kde_prob_{period_name}'] = (np.zeros(len(coords)) if fitted is None
+                                                 else self._normalized(fitted, coords))
+        result['kde_prob_adaptive'] = np.where(self.is_day(timestamps) == 1,
+                                               result['kde_prob_day'], result['kde_prob_night'])
+        return result
+
+    # ----- lưu / nạp (engine 'incremental') -----
+    def save(self, path):
+        """Lưu mô hình incremental ra file .npz (lưới trọng số + lưới mật độ + tham số)"""
+        path = _npz_path(path)
+        if self.engine != 'incremental':
+            raise ValueError("❌ save() chỉ dùng với engine='incremental'")
+        meta = {'version': MODEL_VERSION, 'bandwidth': self.bandwidth,
+                'outside_bandwidth': self.outside_bandwidth, 'outside_threshold': self.outside_threshold,
+                'half_life': self.half_life, 'kde_options': self.kde_options,
+                'n_fixes': self.n_fixes_, 'coord_sum': self.coord_sum_.tolist(),
+                'last_timestamp': None if self.last_timestamp_ is None else self.last_timestamp_.isoformat(),
+                'models': {}}
+        arrays = {}
+        models = {'outside': self.outside_, 'home': self.home_}
+        models.update({name: fitted for name, fitted in self.periods_.items() if fitted is not None})
+        for name, fitted in models.items():
+            meta['models'][name] = {'bandwidth': fitted['kde'].bandwidth, 'min': fitted['min'],
+                                    'max': fitted['max']}
+            for key, value in fitted['kde'].get_state().items():
+                arrays[f'{name}_{key}'] = np.asarray(value)
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Nạp mô hình đã lưu bằng save() (không cần fit lại)"""
+        path = _npz_path(path)
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != MODEL_VERSION:
+                raise ValueError(f"❌ Unsupported home range model version {meta.get('version')} in {path}")
+            model = cls(bandwidth=meta['bandwidth'], outside_bandwidth=meta['outside_bandwidth'],
+                        outside_threshold=meta['outside_threshold'], engine='incremental',
+                        half_life=meta['half_life'], **meta['kde_options'])
+            fitted = {}
+            for name, info in meta['models'].items():
+                kde = IncrementalBinnedKDE(bandwidth=info['bandwidth'], **model.kde_options)
+                kde.set_state({key: data[f'{name}_{key}'] for key in ('counts', 'index', 'weight', 'density')})
+                fitted[name] = {'kde': kde, 'min': info['min'], 'max': info['max']}
+
+        model.outside_ = fitted['outside']
+        model.home_ = fitted['home']
+        model.periods_ = {name: fitted.get(name) for _, name in PERIODS}
+        model.n_fixes_ = meta['n_fixes']
+        model.coord_sum_ = np.array(meta['coord_sum'])
+        model.centroid_ = tuple(model.coord_sum_ / model.n_fixes_) if model.n_fixes_ else (np.nan, np.nan)
+        model.last_timestamp_ = None if meta['last_timestamp'] is None else pd.Timestamp(meta['last_timestamp'])
+        return model
+
+
+def load_or_create(path, **params):
+    """Nạp mô hình incremental nếu file tồn tại, nếu không tạo mô hình rỗng"""
+    try:
+        return HomeRange.load(path)
+    except FileNotFoundError:
+        return HomeRange(engine='incremental', **params)
+
+
+def main(argv=None):
+    from locfeature import load_collar, compute_kinematics
+
+    parser = argparse.ArgumentParser(description='Cập nhật mô hình home range incremental bằng fix mới')
+    parser.add_argument('model', help='File mô hình .npz (tạo mới nếu chưa có)')
+    parser.add_argument('inputs', nargs='+', help='Các file CSV Movebank chứa fix mới')
+    parser.add_argument('--half-life', default=None, help="Chu kỳ bán rã trọng số, ví dụ '90D'")
+    parser.add_argument('--grid-step', type=float, default=0.25, help='Ô lưới (bội số bandwidth)')
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    model = load_or_create(args.model, half_life=args.half_life, grid_step=args.grid_step)
+    print(f"⏱️ Nạp mô hình: {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"({getattr(model, 'n_fixes_', 0)} fix đã hấp thụ)")
+
+    for path in args.inputs:
+        df = compute_kinematics(load_collar(path))
+        t0 = time.perf_counter()
+        before = model.n_fixes_ if hasattr(model, 'n_fixes_') else 0
+        model.update(df)
+        print(f"✅ {path}: +{model.n_fixes_ - before} fix mới trong {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    t0 = time.perf_counter()
+    model.save(args.model)
+    print(f"💾 Đã lưu {args.model} ({(time.perf_counter() - t0) * 1000:.1f} ms, "
+          f"tổng {model.n_fixes_} fix, đến {model.last_timestamp_})")
+
+
+if __name__ == '__main__':
+    main()
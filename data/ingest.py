@@ -0,0 +1,203 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from geodist import step_distances
+from kde_engine import KDE_ENGINES
+
+# ===== ĐỌC FILE MOVEBANK LỚN: CHỈ CỘT CẦN, DTYPE GỌN, THEO TỪNG KHỐI =====
+# File export của cả study có hàng triệu dòng với nhiều cột chuỗi lặp lại (comments,
+# sensor-type, study-name, ...). Ở đây chỉ đọc timestamp / tọa độ (và cột định danh
+# dạng category), parse timestamp ngay khi đọc, và xử lý theo khối có thứ tự thời gian.
+# Trạng thái (fix trước, tốc độ trước, cửa sổ đang mở) được mang qua ranh giới khối
+# nên kết quả khớp với xử lý toàn bộ file một lần.
+
+TIMESTAMP_FORMAT = 'ISO8601'   # '2018-08-31 10:01:06.000' (có hoặc không phần mili giây)
+COORD_COLUMNS = ['location-lat', 'location-long']
+BASE_COLUMNS = ['timestamp'] + COORD_COLUMNS
+ID_COLUMNS = ['individual-local-identifier', 'tag-local-identifier']
+
+
+def movebank_dtypes(columns, coord_dtype=np.float64):
+    """dtype cho các cột được đọc: tọa độ float, cột định danh category"""
+    dtypes = {}
+    for col in columns:
+        if col in COORD_COLUMNS:
+            dtypes[col] = coord_dtype
+        elif col in ID_COLUMNS:
+            dtypes[col] = 'category'
+    return dtypes
+
+
+def read_movebank(path, columns=BASE_COLUMNS, chunksize=None, coord_dtype=np.float64):
+    """
+    Đọc file Movebank chỉ với các cột `columns`, dtype gọn và timestamp đã parse.
+    chunksize=None -> DataFrame; ngược lại -> iterator các khối DataFrame.
+    coord_dtype=np.float32 giảm một nửa bộ nhớ tọa độ (sai số ~1 m, không dùng cho
+    đặc trưng cần khớp chính xác).
+    """
+    reader = pd.read_csv(path, usecols=list(columns), dtype=movebank_dtypes(columns, coord_dtype),
+                         chunksize=chunksize)
+    # to_datetime với format cố định nhanh hơn parse_dates của read_csv
+    if chunksize is None:
+        return _parse_timestamp(reader)
+    return map(_parse_timestamp, reader)
+
+
+def _parse_timestamp(frame):
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], format=TIMESTAMP_FORMAT)
+    return frame
+
+
+def iter_time_ordered(path, chunksize=100_000, columns=BASE_COLUMNS, coord_dtype=np.float64):
+    """
+    Các khối theo thứ tự thời gian. File phải được sắp theo timestamp (như export của
+    một collar); nếu một khối bắt đầu trước khi khối trước kết thúc thì báo lỗi
+    (dùng read_movebank rồi sort_values cho file chưa sắp xếp).
+    """
+    last = None
+    for chunk in read_movebank(path, columns=columns, chunksize=chunksize, coord_dtype=coord_dtype):
+        chunk = chunk.sort_values('timestamp', kind='stable')
+        if last is not None and len(chunk) and chunk['timestamp'].iloc[0] < last:
+            raise ValueError(f"❌ {path} không được sắp theo timestamp (khối bắt đầu {chunk['timestamp'].iloc[0]} "
+                             f"< {last}); đọc cả file bằng read_movebank rồi sort_values")
+        if len(chunk):
+            last = chunk['timestamp'].iloc[-1]
+        yield chunk
+
+
+class ChunkedKinematics:
+    """
+    compute_kinematics theo từng khối: giữ fix thô cuối (cho time_diff / dist / speed)
+    và tốc độ của fix hợp lệ cuối (cho raw_accel) giữa các khối.
+    Ghép các khối kết quả = compute_kinematics trên toàn bộ dữ liệu.
+    """
+
+    def __init__(self, max_speed=None, method='vincenty'):
+        if max_speed is None:
+            from locfeature import MAX_SPEED_THRESHOLD
+            max_speed = MAX_SPEED_THRESHOLD
+        self.max_speed = max_speed
+        self.method = method
+        self._prev = None          # dòng thô cuối (DataFrame 1 dòng)
+        self._prev_speed = None    # speed của dòng hợp lệ cuối
+        self.rows_in = 0
+        self.rows_kept = 0
+
+    def process(self, chunk):
+        self.rows_in += len(chunk)
+        carried = self._prev is not None
+        df = pd.concat([self._prev, chunk]) if carried else chunk.copy()
+        if len(chunk):
+            self._prev = chunk.iloc[[-1]]
+
+        df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 3600
+        coords = df[COORD_COLUMNS].values.astype(np.float64)
+        df['dist'] = step_distances(coords, method=self.method)
+        df['speed_meters_per_hour'] = (df['dist'] / df['time_diff']).fillna(0)
+        if carried:
+            df = df.iloc[1:]
+        df = df[df['time_diff'] > 0]
+        df = df[df['speed_meters_per_hour'] < self.max_speed].copy()
+
+        df['speed'] = df['speed_meters_per_hour']
+        prev_speed = df['speed'].shift(1)
+        if self._prev_speed is not None and len(df):
+            prev_speed.iloc[0] = self._prev_speed
+        df['raw_accel'] = (df['speed'] - prev_speed) / df['time_diff']
+        df['raw_accel'] = df['raw_accel'].replace([np.inf, -np.inf], 0).fillna(0)
+        if len(df):
+            self._prev_speed = df['speed'].iloc[-1]
+        self.rows_kept += len(df)
+        return df
+
+
+def extract_features_chunked(path, chunksize=100_000, kde_engine='exact', home_range=None):
+    """
+    Bảng đặc trưng 2h từ file lớn, hai lượt đọc theo khối:
+    1) kinematics theo khối, chỉ giữ timestamp / tọa độ các fix hợp lệ để fit HomeRange
+       (bỏ qua nếu truyền home_range đã fit / nạp);
+    2) đẩy từng khối qua StreamingFeatureExtractor (trạng thái cửa sổ mang qua khối).
+    """
+    from home_range import HomeRange
+    from streaming import StreamingFeatureExtractor
+
+    if home_range is None:
+        kinematics = ChunkedKinematics()
+        kept = [k[BASE_COLUMNS] for k in map(kinematics.process, iter_time_ordered(path, chunksize))]
+        home_range = HomeRange(engine=kde_engine).fit(pd.concat(kept, ignore_index=True))
+        del kept
+
+    extractor = StreamingFeatureExtractor(home_range)
+    rows = []
+    for chunk in iter_time_ordered(path, chunksize):
+        rows.extend(extractor.push_batch(chunk))
+    rows.extend(extractor.flush())
+    return StreamingFeatureExtractor.to_frame(rows)
+
+
+def _measure(func):
+    """(kết quả, peak bộ nhớ tracemalloc MiB, giây)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, peak, seconds
+
+
+def _frame_mib(df):
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+def main(argv=None):
+    from locfeature import INPUT_FILE, compute_kinematics
+
+    parser = argparse.ArgumentParser(description='So sánh bộ nhớ đọc file Movebank: mặc định vs cột gọn vs theo khối')
+    parser.add_argument('path', nargs='?', default=INPUT_FILE)
+    parser.add_argument('--chunksize', type=int, default=2000)
+    parser.add_argument('--features', action='store_true',
+                        help='Đo thêm trích xuất đặc trưng theo khối (extract_features_chunked)')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='binned')
+    args = parser.parse_args(argv)
+
+    def naive():
+        df = pd.read_csv(args.path)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
+
+    def chunked_kinematics():
+        kinematics = ChunkedKinematics()
+        kept = [k[BASE_COLUMNS] for k in map(kinematics.process, iter_time_ordered(args.path, args.chunksize))]
+        return pd.concat(kept, ignore_index=True)
+
+    rows = []
+    full, peak, seconds = _measure(naive)
+    rows.append(('read_csv tất cả cột', peak, _frame_mib(full), seconds))
+    compact, peak, seconds = _measure(lambda: read_movebank(args.path))
+    rows.append(('read_movebank (3 cột)', peak, _frame_mib(compact), seconds))
+    kept, peak, seconds = _measure(chunked_kinematics)
+    rows.append((f'kinematics theo khối {args.chunksize}', peak, _frame_mib(kept), seconds))
+    if args.features:
+        feat, peak, seconds = _measure(lambda: extract_features_chunked(args.path, args.chunksize,
+                                                                        kde_engine=args.kde_engine))
+        rows.append((f'đặc trưng theo khối {args.chunksize}', peak, _frame_mib(feat), seconds))
+
+    print(f"{'chế độ':<32}{'peak MiB':>10}{'frame MiB':>11}{'giây':>8}")
+    for name, peak, size, seconds in rows:
+        print(f"{name:<32}{peak:>10.1f}{size:>11.2f}{seconds:>8.2f}")
+
+    # Kiểm tra: kinematics theo khối = compute_kinematics trên toàn bộ file
+    reference = compute_kinematics(full.sort_values('timestamp'))
+    same = (len(reference) == len(kept)
+            and (reference['timestamp'].values == kept['timestamp'].values).all()
+            and np.array_equal(reference[COORD_COLUMNS].values, kept[COORD_COLUMNS].values))
+    print(f"\n✅ Kinematics theo khối khớp xử lý toàn bộ: {same}")
+
+
+if __name__ == '__main__':
+    main()
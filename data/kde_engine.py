@@ -0,0 +1,262 @@
+import time
+
+import numpy as np
+
+# ===== KDE ENGINE CÓ THỂ THAY THẾ =====
+# 'exact'  : sklearn KernelDensity, score_samples chính xác (như cũ)
+# 'tree'   : sklearn KernelDensity trên KD-tree với sai số atol/rtol
+# 'binned' : gộp điểm vào lưới + tích chập Gaussian bằng FFT, tra cứu nội suy song tuyến
+
+KDE_ENGINES = ('exact', 'tree', 'binned')
+
+
+def _fftconvolve_same(image, kernel):
+    """Tích chập 2D bằng numpy FFT, cắt về kích thước image (như fftconvolve mode='same')"""
+    shape = [n + k - 1 for n, k in zip(image.shape, kernel.shape)]
+    full = np.fft.irfftn(np.fft.rfftn(image, shape) * np.fft.rfftn(kernel, shape), shape)
+    start = [(k - 1) // 2 for k in kernel.shape]
+    return full[start[0]:start[0] + image.shape[0], start[1]:start[1] + image.shape[1]]
+
+
+def _linear_bin(counts, pos, weights=None):
+    """Linear binning: chia trọng số mỗi điểm (tọa độ lưới pos) cho 4 nút lưới lân cận"""
+    i0 = np.floor(pos).astype(int)
+    frac = pos - i0
+    for di in (0, 1):
+        wi = frac[:, 0] if di else 1 - frac[:, 0]
+        for dj in (0, 1):
+            wj = frac[:, 1] if dj else 1 - frac[:, 1]
+            w = wi * wj if weights is None else wi * wj * weights
+            np.add.at(counts, (i0[:, 0] + di, i0[:, 1] + dj), w)
+
+
+def _gaussian_kernel(h, step, cutoff):
+    """Kernel Gaussian chuẩn hóa trên lưới, cắt ở cutoff * bandwidth"""
+    r = int(np.ceil(cutoff * h / step))
+    offsets = np.arange(-r, r + 1) * step
+    k1 = np.exp(-0.5 * (offsets / h) ** 2)
+    return np.outer(k1, k1) / (2 * np.pi * h ** 2)
+
+
+def _bilinear(grid, pos):
+    """Nội suy song tuyến grid tại tọa độ lưới pos, ngoài lưới = 0"""
+    i0 = np.floor(pos).astype(int)
+    frac = pos - i0
+    nx, ny = grid.shape
+    inside = (i0[:, 0] >= 0) & (i0[:, 0] < nx - 1) & (i0[:, 1] >= 0) & (i0[:, 1] < ny - 1)
+    i = np.clip(i0[:, 0], 0, nx - 2)
+    j = np.clip(i0[:, 1], 0, ny - 2)
+    fx, fy = frac[:, 0], frac[:, 1]
+    out = ((1 - fx) * (1 - fy) * grid[i, j] + fx * (1 - fy) * grid[i + 1, j]
+           + (1 - fx) * fy * grid[i, j + 1] + fx * fy * grid[i + 1, j + 1])
+    return np.where(inside, out, 0.0)
+
+
+class BinnedKDE:
+    """
+    KDE Gaussian xấp xỉ trên lưới: linear binning các điểm huấn luyện,
+    tích chập với kernel Gaussian bằng FFT, rồi nội suy song tuyến tại điểm cần tính.
+    grid_step: kích thước ô lưới tính theo bội số của bandwidth (nhỏ hơn = chính xác hơn).
+    max_cells: số ô tối đa mỗi chiều; vượt quá thì báo lỗi (không tự làm thô lưới).
+    """
+
+    def __init__(self, bandwidth=0.01, grid_step=0.25, cutoff=5.0, max_cells=4096):
+        self.bandwidth = bandwidth
+        self.grid_step = grid_step
+        self.cutoff = cutoff
+        self.max_cells = max_cells
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        h = self.bandwidth
+        pad = self.cutoff * h
+        lo = X.min(axis=0) - pad
+        hi = X.max(axis=0) + pad
+        step = h * self.grid_step
+        shape = np.ceil((hi - lo) / step).astype(int) + 1
+        if shape.max() > self.max_cells:
+            raise ValueError(f"❌ Lưới KDE vượt {self.max_cells} ô mỗi chiều, tăng grid_step")
+
+        counts = np.zeros(shape)
+        _linear_bin(counts, (X - lo) / step)
+
+        density = _fftconvolve_same(counts, _gaussian_kernel(h, step, self.cutoff)) / len(X)
+        self.density_ = np.maximum(density, 0.0)
+        self.origin_ = lo
+        self.step_ = step
+        return self
+
+    def density(self, X):
+        """Mật độ tại X bằng nội suy song tuyến, ngoài lưới = 0"""
+        X = np.asarray(X, dtype=np.float64)
+        return _bilinear(self.density_, (X - self.origin_) / self.step_)
+
+    def score_samples(self, X):
+        """Log mật độ (cùng quy ước với sklearn KernelDensity.score_samples)"""
+        with np.errstate(divide='ignore'):
+            return np.log(self.density(X))
+
+
+class IncrementalBinnedKDE:
+    """
+    KDE Gaussian trên lưới cố định có thể cập nhật dần: lưới trọng số (linear binning)
+    là thống kê đủ, partial_fit cộng thêm điểm mới (và nhân decay cho dữ liệu cũ),
+    lưới tự mở rộng khi điểm mới nằm ngoài. Mật độ = tích chập FFT của lưới trọng số,
+    tính lại khi cần. Nút lưới neo tại bội số của step nên kết quả không phụ thuộc
+    thứ tự các lô dữ liệu.
+    """
+
+    def __init__(self, bandwidth=0.01, grid_step=0.25, cutoff=5.0, max_cells=4096):
+        self.bandwidth = bandwidth
+        self.grid_step = grid_step
+        self.cutoff = cutoff
+        self.max_cells = max_cells
+        self.step_ = bandwidth * grid_step
+        self.counts_ = np.zeros((0, 0))
+        self.index_ = np.zeros(2, dtype=np.int64)   # chỉ số lưới của nút counts_[0, 0]
+        self.weight_ = 0.0
+        self.density_ = None
+
+    @property
+    def origin_(self):
+        return self.index_ * self.step_
+
+    def _grow(self, X):
+        pad = self.cutoff * self.bandwidth
+        lo = np.floor((X.min(axis=0) - pad) / self.step_).astype(np.int64)
+        hi = np.ceil((X.max(axis=0) + pad) / self.step_).astype(np.int64) + 1
+        if self.counts_.size:
+            lo = np.minimum(lo, self.index_)
+            hi = np.maximum(hi, self.index_ + self.counts_.shape)
+        shape = hi - lo
+        if shape.max() > self.max_cells:
+            raise ValueError(f"❌ Lưới KDE vượt {self.max_cells} ô mỗi chiều, tăng grid_step")
+        counts = np.zeros(shape)
+        if self.counts_.size:
+            start = self.index_ - lo
+            counts[start[0]:start[0] + self.counts_.shape[0],
+                   start[1]:start[1] + self.counts_.shape[1]] = self.counts_
+        self.counts_ = counts
+        self.index_ = lo
+
+    def partial_fit(self, X, decay=1.0):
+        """Thêm các điểm X; decay < 1 giảm trọng số dữ liệu cũ trước khi thêm"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+        if decay != 1.0:
+            self.counts_ *= decay
+            self.weight_ *= decay
+            self.density_ = None
+        if len(X) == 0:
+            return self
+        self._grow(X)
+        _linear_bin(self.counts_, X / self.step_ - self.index_)
+        self.weight_ += len(X)
+        self.density_ = None
+        return self
+
+    def fit(self, X):
+        self.counts_ = np.zeros((0, 0))
+        self.weight_ = 0.0
+        return self.partial_fit(X)
+
+    def density_grid(self):
+        """Mật độ tại các nút lưới (tính lại sau mỗi partial_fit)"""
+        if self.density_ is None:
+            if self.weight_ == 0:
+                self.density_ = np.zeros(self.counts_.shape)
+            else:
+                kernel = _gaussian_kernel(self.bandwidth, self.step_, self.cutoff)
+                self.density_ = np.maximum(_fftconvolve_same(self.counts_, kernel) / self.weight_, 0.0)
+        return self.density_
+
+    def density(self, X):
+        """Mật độ tại X bằng nội suy song tuyến, ngoài lưới = 0"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+        if self.counts_.size == 0:
+            return np.zeros(len(X))
+        return _bilinear(self.density_grid(), X / self.step_ - self.index_)
+
+    def score_samples(self, X):
+        """Log mật độ (cùng quy ước với sklearn KernelDensity.score_samples)"""
+        with np.errstate(divide='ignore'):
+            return np.log(self.density(X))
+
+    def occupied_nodes(self):
+        """Tọa độ các nút lưới có trọng số (đại diện cho các điểm đã fit)"""
+        i, j = np.nonzero(self.counts_ > 0)
+        return (np.column_stack([i, j]) + self.index_) * self.step_
+
+    def prob_range(self, X=None):
+        """
+        (min, max) mật độ tại X (mặc định: các nút lưới có dữ liệu) - thay cho min/max
+        trên tập fit khi chuẩn hóa, không cần giữ lại các điểm cũ.
+        """
+        prob = self.density_grid()[self.counts_ > 0] if X is None else self.density(X)
+        if prob.size == 0:
+            return 0.0, 0.0
+        return float(prob.min()), float(prob.max())
+
+    def get_state(self):
+        return {'counts': self.counts_, 'index': self.index_, 'weight': self.weight_,
+                'density': self.density_grid()}
+
+    def set_state(self, state):
+        self.counts_ = np.asarray(state['counts'], dtype=np.float64)
+        self.index_ = np.asarray(state['index'], dtype=np.int64)
+        self.weight_ = float(state['weight'])
+        self.density_ = np.asarray(state['density'], dtype=np.float64)
+        return self
+
+
+def make_kde(engine='exact', bandwidth=0.01, atol=0.0, rtol=1e-4, grid_step=0.25):
+    """Tạo đối tượng KDE có fit() / score_samples() theo engine được chọn"""
+    if engine in ('exact', 'tree'):
+        # Import muộn: engine binned không cần sklearn (cold start nhanh hơn)
+        from sklearn.neighbors import KernelDensity
+    if engine == 'exact':
+        return KernelDensity(kernel='gaussian', bandwidth=bandwidth)
+    if engine == 'tree':
+        return KernelDensity(kernel='gaussian', bandwidth=bandwidth, algorithm='kd_tree',
+                             atol=atol, rtol=rtol)
+    if engine == 'binned':
+        return BinnedKDE(bandwidth=bandwidth, grid_step=grid_step)
+    raise ValueError(f"❌ Unknown KDE engine: {engine} (chọn trong {KDE_ENGINES})")
+
+
+def normalize_prob(log_prob):
+    """exp(log_prob) rồi chuẩn hóa min-max về [0, 1]"""
+    prob = np.exp(log_prob)
+    return (prob - prob.min()) / (prob.max() - prob.min())
+
+
+def kde_normalized_prob(train_coords, query_coords, bandwidth=0.01, engine='exact', **options):
+    """Fit KDE trên train_coords, trả về xác suất chuẩn hóa tại query_coords"""
+    kde = make_kde(engine, bandwidth=bandwidth, **options)
+    kde.fit(train_coords)
+    return normalize_prob(kde.score_samples(query_coords))
+
+
+def benchmark_engine(train_coords, query_coords, bandwidth=0.01, engine='tree', tol=1e-2, **options):
+    """
+    So sánh engine với KDE exact: thời gian, speedup và sai số xác suất chuẩn hóa.
+    tol: sai số tuyệt đối tối đa cho phép trên xác suất chuẩn hóa.
+    """
+    t0 = time.perf_counter()
+    exact = kde_normalized_prob(train_coords, query_coords, bandwidth, engine='exact')
+    t_exact = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    approx = kde_normalized_prob(train_coords, query_coords, bandwidth, engine=engine, **options)
+    t_engine = time.perf_counter() - t0
+
+    err = np.abs(approx - exact)
+    return {
+        'engine': engine,
+        'bandwidth': bandwidth,
+        'exact_seconds': t_exact,
+        'engine_seconds': t_engine,
+        'speedup': t_exact / t_engine if t_engine > 0 else np.inf,
+        'max_abs_error': float(err.max()),
+        'mean_abs_error': float(err.mean()),
+        'within_tol': bool(err.max() <= tol),
+    }
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from kde_engine import normalize_prob
+
+# ===== QUÉT LƯỚI (BANDWIDTH, THRESHOLD) CHO NHÃN POINT_IS_OUTSIDE =====
+# Tập láng giềng (và khoảng cách) được tính MỘT lần với bán kính lớn nhất,
+# mọi bandwidth dùng lại; log-probability của mỗi bandwidth dùng lại cho mọi threshold.
+
+DEFAULT_BANDWIDTHS = [0.005, 0.01, 0.02]
+DEFAULT_THRESHOLDS = [0.05, 0.1, 0.15, 0.2, 0.25]
+
+
+def kde_log_density_multi(train_coords, query_coords, bandwidths, cutoff=6.0, chunk_size=512):
+    """
+    Log mật độ KDE Gaussian tại query_coords cho nhiều bandwidth trong một lượt.
+    Láng giềng xa hơn cutoff * bandwidth bị bỏ qua (sai số tương đối < exp(-cutoff^2 / 2)).
+    Trả về dict {bandwidth: log_density}.
+    """
+    train_coords = np.asarray(train_coords, dtype=np.float64)
+    query_coords = np.asarray(query_coords, dtype=np.float64)
+    bandwidths = sorted(bandwidths)
+    n_train, dim = train_coords.shape
+    radius = cutoff * bandwidths[-1]
+
+    tree = KDTree(train_coords)
+    sums = {bw: np.zeros(len(query_coords)) for bw in bandwidths}
+
+    for start in range(0, len(query_coords), chunk_size):
+        stop = min(start + chunk_size, len(query_coords))
+        ind, dist = tree.query_radius(query_coords[start:stop], r=radius, return_distance=True)
+        lengths = np.array([len(i) for i in ind])
+        rows = np.repeat(np.arange(stop - start), lengths)
+        dist_sq = np.concatenate(dist) ** 2 if lengths.sum() else np.zeros(0)
+
+        for bw in bandwidths:
+            mask = dist_sq <= (cutoff * bw) ** 2
+            weights = np.exp(-0.5 * dist_sq[mask] / bw ** 2)
+            sums[bw][start:stop] = np.bincount(rows[mask], weights=weights, minlength=stop - start)
+
+    log_density = {}
+    with np.errstate(divide='ignore'):
+        for bw in bandwidths:
+            norm = n_train * (2 * np.pi * bw ** 2) ** (dim / 2)
+            log_density[bw] = np.log(sums[bw]) - np.log(norm)
+    return log_density
+
+
+def _count_episodes(flags):
+    """Số đoạn liên tiếp các điểm outside"""
+    flags = np.asarray(flags, dtype=np.int8)
+    if len(flags) == 0:
+        return 0
+    return int(flags[0]) + int(np.count_nonzero(np.diff(flags) == 1))
+
+
+def sweep_kde_labels(coords, bandwidths=DEFAULT_BANDWIDTHS, thresholds=DEFAULT_THRESHOLDS,
+                     timestamps=None, window='2h', cutoff=6.0):
+    """
+    Đánh giá toàn bộ lưới (bandwidth, threshold) của kde_point_is_outside trong một lượt.
+    Nếu có timestamps, thêm thống kê nhãn is_outside theo cửa sổ (mặc định 2h).
+    Trả về DataFrame, mỗi dòng là một cấu hình.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    log_density = kde_log_density_multi(coords, coords, bandwidths, cutoff=cutoff)
+
+    rows = []
+    for bw in sorted(bandwidths):
+        prob_normalized = normalize_prob(log_density[bw])
+        for threshold in sorted(thresholds):
+            point_is_outside = (prob_normalized < threshold).astype(int)
+            row = {
+                'bandwidth': bw,
+                'threshold': threshold,
+                'outside_points': int(point_is_outside.sum()),
+                'outside_rate': float(point_is_outside.mean()),
+                'outside_episodes': _count_episodes(point_is_outside),
+            }
+            if timestamps is not None:
+                window_label = (pd.Series(point_is_outside, index=pd.DatetimeIndex(timestamps))
+                                .resample(window).max().fillna(0) > 0)
+                row['windows'] = len(window_label)
+                row['outside_windows'] = int(window_label.sum())
+                row['window_outside_rate'] = float(window_label.mean())
+            rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    import time
+    from locfeature import load_collar, compute_kinematics
+
+    df = compute_kinematics(load_collar())
+    coords = df[['location-lat', 'location-long']].values
+
+    t0 = time.perf_counter()
+    table = sweep_kde_labels(coords, timestamps=df['timestamp'].values)
+    elapsed = time.perf_counter() - t0
+
+    print(table.to_string(index=False))
+    print(f"\n⏱️ {len(table)} cấu hình trong {elapsed:.2f}s")
+    table.to_csv('kde_sweep.csv', index=False)
+    print("Files saved: kde_sweep.csv")
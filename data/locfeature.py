@@ -1,486 +1,743 @@
+import argparse
+
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
-from sklearn.cluster import DBSCAN
-import scipy.stats as stats
-from sklearn.neighbors import KernelDensity
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Đọc file và tiền xử lý cơ bản
-df = pd.read_csv('Elephant Research - Ivory Coast - Collar 1630.csv')
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values('timestamp')
-
-# Tính time_diff, dist, speed (như cũ)
-df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 3600
-coords = df[['location-lat', 'location-long']].values
-distances = [0] 
-for i in range(1, len(df)):
-    distances.append(geodesic(coords[i-1], coords[i]).meters)
-
-
-df['dist'] = distances
-df['speed_meters_per_hour'] = (df['dist'] / df['time_diff']).fillna(0)
-df = df[df['time_diff'] > 0].copy() # Xóa các dòng trùng giờ hoàn toàn
+from geodist import step_distances, distances_to_point
+from trajectory import compute_bearings, compute_turning_angles, rolling_entropy
+from kde_engine import KDE_ENGINES, kde_normalized_prob, benchmark_engine
+from window_agg import aggregate_windows, window_codes
+from feature_graph import FeatureGraph
+from home_range import load_or_create
+from density_lut import DensityLUT
+from columnar import write_table
+from ingest import read_movebank
+
+INPUT_FILE = 'Elephant Research - Ivory Coast - Collar 1630.csv'
 MAX_SPEED_THRESHOLD = 40000  # 40 km/h (Ngưỡng an toàn)
 
-print(f"Trước khi lọc: {len(df)} dòng")
-df = df[df['speed_meters_per_hour'] < MAX_SPEED_THRESHOLD].copy()
-print(f"Sau khi lọc tốc độ ảo: {len(df)} dòng")
+# Thống kê cửa sổ 2h: (cột đầu ra, cột nguồn, thống kê)
+RAW_WINDOW_STATS = [
+    ('step_mean', 'step_length', 'mean'),
+    ('step_std', 'step_length', 'std'),
+    ('step_max', 'step_length', 'max'),
+    ('step_median', 'step_length', 'median'),
+    ('dist_to_centroid_mean', 'dist_to_centroid', 'mean'),
+    ('kde_prob_mean', 'kde_probability', 'mean'),
+    ('kde_prob_min', 'kde_probability', 'min'),
+    ('kde_prob_max', 'kde_probability', 'max'),
+    ('kde_prob_std', 'kde_probability', 'std'),
+    ('kde_prob_day_mean', 'kde_prob_day', 'mean'),
+    ('kde_prob_night_mean', 'kde_prob_night', 'mean'),
+    ('kde_prob_adaptive_mean', 'kde_prob_adaptive', 'mean'),
+    ('kde_low_prob_ratio', 'kde_low_prob', 'mean'),
+    ('kde_very_low_prob_count', 'kde_very_low_prob', 'sum'),
+    ('turning_angle_mean', 'turning_angle', 'mean'),
+    ('turning_angle_std', 'turning_angle', 'std'),
+    ('turning_angle_max', 'turning_angle', 'max'),
+    ('turning_angle_median', 'turning_angle', 'median'),
+    ('sharp_turns_ratio', 'sharp_turn', 'mean'),
+    ('moderate_turns_ratio', 'moderate_turn', 'mean'),
+    ('mean_speed', 'speed', 'mean'),
+    ('accelerate', 'abs_accel', 'mean'),
+    ('is_outside', 'point_is_outside', 'max'),
+]
+
+# Thống kê 2h trên lưới 1h (df_resampled)
+HOURLY_WINDOW_STATS = [
+    ('speed_roll_var_4h_mean', 'speed_roll_var_4h', 'mean'),
+    ('speed_roll_var_8h_mean', 'speed_roll_var_8h', 'mean'),
+    ('accel_roll_var_4h_mean', 'accel_roll_var_4h', 'mean'),
+    ('accel_roll_var_8h_mean', 'accel_roll_var_8h', 'mean'),
+    ('turning_entropy', 'turning_entropy', 'mean'),
+]
+
+# Thứ tự cột của elephant_features_kde_enhanced.csv
+FEATURE_COLUMNS = [
+    'step_mean', 'step_std', 'step_max', 'step_median', 'dist_to_centroid_mean',
+    'speed_roll_var_4h_mean', 'speed_roll_var_8h_mean', 'accel_roll_var_4h_mean', 'accel_roll_var_8h_mean',
+    'kde_prob_mean', 'kde_prob_min', 'kde_prob_max', 'kde_prob_std',
+    'kde_prob_day_mean', 'kde_prob_night_mean', 'kde_prob_adaptive_mean',
+    'kde_low_prob_ratio', 'kde_very_low_prob_count',
+    'turning_angle_mean', 'turning_angle_std', 'turning_angle_max', 'turning_angle_median',
+    'sharp_turns_ratio', 'moderate_turns_ratio', 'turning_entropy',
+    'mean_speed', 'accelerate', 'is_outside',
+]
+
+# 6 đặc trưng cho mô hình FPGA (featureselection.py) - nhãn là is_outside
+SELECTED_FEATURES = [
+    'kde_low_prob_ratio', 'kde_prob_min', 'dist_to_centroid_mean',
+    'turning_angle_max', 'mean_speed', 'turning_entropy',
+]
+
+# Cột của elephant_raw_with_kde và các cột cần cho biểu đồ
+RAW_EXPORT_COLUMNS = ['timestamp', 'location-lat', 'location-long', 'speed', 'raw_accel',
+                      'point_is_outside', 'kde_probability', 'kde_prob_day', 'kde_prob_night',
+                      'kde_prob_adaptive', 'kde_home_range', 'turning_angle', 'bearing']
+PLOT_COLUMNS = ['kde_probability', 'kde_prob_day', 'kde_prob_night', 'is_day',
+                'point_is_outside', 'turning_angle', 'speed']
+
+
+def load_collar(path=INPUT_FILE):
+    """Đọc file Movebank (chỉ timestamp / tọa độ, xem ingest.py) và sắp theo thời gian"""
+    df = read_movebank(path)
+    df = df.sort_values('timestamp')
+    return df
+
+
+def compute_kinematics(df):
+    """Tính time_diff, dist, speed, lọc tốc độ ảo và tính gia tốc"""
+    df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 3600
+    coords = df[['location-lat', 'location-long']].values
+    # Khoảng cách ellipsoid (Vincenty) vector hóa, điểm đầu = 0
+    df['dist'] = step_distances(coords, method='vincenty')
+    df['speed_meters_per_hour'] = (df['dist'] / df['time_diff']).fillna(0)
+    df = df[df['time_diff'] > 0].copy() # Xóa các dòng trùng giờ hoàn toàn
+
+    print(f"Trước khi lọc: {len(df)} dòng")
+    df = df[df['speed_meters_per_hour'] < MAX_SPEED_THRESHOLD].copy()
+    print(f"Sau khi lọc tốc độ ảo: {len(df)} dòng")
 
-# Gán lại cột speed chính thức để dùng cho các bước sau
-df['speed'] = df['speed_meters_per_hour']
-# Tính gia tốc
-df['raw_accel'] = df['speed'].diff() / df['time_diff']
-df['raw_accel'] = df['raw_accel'].replace([np.inf, -np.inf], 0).fillna(0)
+    # Gán lại cột speed chính thức để dùng cho các bước sau
+    df['speed'] = df['speed_meters_per_hour']
+    # Tính gia tốc
+    df['raw_accel'] = df['speed'].diff() / df['time_diff']
+    df['raw_accel'] = df['raw_accel'].replace([np.inf, -np.inf], 0).fillna(0)
+    return df
 
-# ===== THAY THẾ DBSCAN BẰNG KDE CHO POINT_IS_OUTSIDE =====
-print("⏳ Đang sử dụng KDE để xác định point_is_outside...")
 
-def kde_point_is_outside(df, bandwidth=0.01, threshold=0.15):
+def kde_point_is_outside(df, bandwidth=0.01, threshold=0.15, engine='exact', **kde_options):
     """
     Sử dụng KDE thay vì DBSCAN để xác định point_is_outside
     """
     coords = df[['location-lat', 'location-long']].values
-    
-    # Fit KDE trên toàn bộ dữ liệu
-    print(f"   Fitting KDE với bandwidth={bandwidth}, threshold={threshold}...")
-    kde = KernelDensity(kernel='gaussian', bandwidth=bandwidth)
-    kde.fit(coords)
-    
-    # Tính probability
-    log_prob = kde.score_samples(coords)
-    prob = np.exp(log_prob)
-    prob_normalized = (prob - prob.min()) / (prob.max() - prob.min())
-    
+
+    # Fit KDE trên toàn bộ dữ liệu và tính probability
+    print(f"   Fitting KDE ({engine}) với bandwidth={bandwidth}, threshold={threshold}...")
+    prob_normalized = kde_normalized_prob(coords, coords, bandwidth, engine=engine, **kde_options)
+
     # Xác định point_is_outside dựa trên threshold
     point_is_outside = (prob_normalized < threshold).astype(int)
-    
+
     outside_count = point_is_outside.sum()
     outside_percentage = outside_count / len(df) * 100
-    
+
     print(f"   ✅ KDE Results: {outside_count} points outside ({outside_percentage:.2f}%)")
-    
+
     return point_is_outside, prob_normalized
 
-coords = df[['location-lat', 'location-long']].values
-df['point_is_outside'], df['kde_probability_base'] = kde_point_is_outside(df, bandwidth=0.01, threshold=0.15)
-
-# ===== THÊM TURNING ANGLE VÀO DF GỐC =====
-print("⏳ Đang tính turning angle trên dữ liệu gốc...")
-
-def calculate_bearing(lat1, lon1, lat2, lon2):
-    """Tính bearing giữa 2 điểm"""
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-    dlon = lon2 - lon1
-    y = np.sin(dlon) * np.cos(lat2)
-    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
-    bearing = np.arctan2(y, x)
-    return np.degrees(bearing) % 360
-
-# Tính bearing cho từng điểm
-bearings = [0]  # Điểm đầu không có bearing
-for i in range(1, len(df)):
-    bearing = calculate_bearing(
-        df.iloc[i-1]['location-lat'], df.iloc[i-1]['location-long'],
-        df.iloc[i]['location-lat'], df.iloc[i]['location-long']
-    )
-    bearings.append(bearing)
-
-df['bearing'] = bearings
-
-# Tính turning angle
-turning_angles = [0, 0]  # 2 điểm đầu không có turning angle
-for i in range(2, len(df)):
-    angle_diff = df.iloc[i]['bearing'] - df.iloc[i-1]['bearing']
-    
-    # Chuẩn hóa góc về [-180, 180]
-    if angle_diff > 180:
-        angle_diff -= 360
-    elif angle_diff < -180:
-        angle_diff += 360
-    
-    turning_angles.append(abs(angle_diff))
-
-df['turning_angle'] = turning_angles
-
-print(f"✅ Đã tính turning angle: mean={np.mean(turning_angles):.2f}°, max={max(turning_angles):.2f}°")
-
-# ===== THÊM KDE CHO PROBABILITY HOME RANGE =====
-print("⏳ Đang tính KDE Probability Home Range...")
-
-def calculate_kde_probability(df, bandwidth=0.01):
+
+def calculate_kde_probability(df, bandwidth=0.01, engine='exact', **kde_options):
     """
     Tính xác suất thuộc home range bằng KDE
     """
     coords = df[['location-lat', 'location-long']].values
-    
+
     # Sử dụng điểm bình thường (point_is_outside == 0) để fit KDE
     normal_coords = coords[df['point_is_outside'] == 0]
-    
+
     if len(normal_coords) < 10:
         print("⚠️ Không đủ điểm bình thường để tính KDE, dùng toàn bộ dữ liệu")
         normal_coords = coords
-    
+
     print(f"   Sử dụng {len(normal_coords)} điểm bình thường để fit KDE")
-    
-    # Fit KDE model
-    kde = KernelDensity(kernel='gaussian', bandwidth=bandwidth)
-    kde.fit(normal_coords)
-    
-    # Tính probability cho tất cả điểm
-    log_prob = kde.score_samples(coords)
-    prob = np.exp(log_prob)
-    prob_normalized = (prob - prob.min()) / (prob.max() - prob.min())
-    
-    return prob_normalized
-
-# Tính KDE probability với bandwidth khác nhau
-print("   Đang thử nghiệm các bandwidth...")
-
-# Bandwidth nhỏ = chi tiết hơn, bandwidth lớn = mịn hơn
-bandwidths = [0.005, 0.01, 0.02]
-kde_results = {}
-
-for bw in bandwidths:
-    print(f"   - Bandwidth {bw}...")
-    kde_prob = calculate_kde_probability(df, bandwidth=bw)
-    kde_results[f'kde_prob_bw_{str(bw).replace(".", "")}'] = kde_prob
-
-# Chọn bandwidth tốt nhất (0.01) làm chính
-df['kde_probability'] = kde_results['kde_prob_bw_001']
-
-# Tạo categorical home range dựa trên KDE
-df['kde_home_range'] = pd.cut(df['kde_probability'], 
-                             bins=[0, 0.2, 0.5, 0.8, 1.0],
-                             labels=['Very_Low', 'Low', 'Medium', 'High'])
-
-print(f"   ✅ KDE Home Range Distribution:")
-print(df['kde_home_range'].value_counts())
-
-# ===== NÂNG CAO: KDE THEO THỜI GIAN =====
-print("⏳ Đang tính KDE theo thời gian (Day/Night)...")
-
-def calculate_temporal_kde(df):
+
+    # Fit KDE model và tính probability cho tất cả điểm
+    return kde_normalized_prob(normal_coords, coords, bandwidth, engine=engine, **kde_options)
+
+
+def calculate_temporal_kde(df, engine='exact', **kde_options):
     """Tính KDE riêng cho ngày và đêm"""
-    
+
     # Phân chia ngày/đêm
     df['hour'] = df['timestamp'].dt.hour
     df['is_day'] = ((df['hour'] >= 6) & (df['hour'] < 18)).astype(int)
-    
+
     results = {}
-    
+
     for period, period_name in [(1, 'day'), (0, 'night')]:
         period_data = df[df['is_day'] == period]
-        
+
         if len(period_data) < 10:
             print(f"   ⚠️ Không đủ dữ liệu {period_name}")
             results[f'kde_prob_{period_name}'] = np.zeros(len(df))
             continue
-            
+
         # Fit KDE cho period này
         coords_period = period_data[['location-lat', 'location-long']].values
         normal_coords = coords_period[period_data['point_is_outside'] == 0]
-        
+
         if len(normal_coords) < 5:
             normal_coords = coords_period
-            
-        kde = KernelDensity(kernel='gaussian', bandwidth=0.01)
-        kde.fit(normal_coords)
-        
+
         # Score cho tất cả điểm
         all_coords = df[['location-lat', 'location-long']].values
-        log_prob = kde.score_samples(all_coords)
-        prob = np.exp(log_prob)
-        prob_normalized = (prob - prob.min()) / (prob.max() - prob.min())
-        
+        prob_normalized = kde_normalized_prob(normal_coords, all_coords, 0.01, engine=engine, **kde_options)
+
         results[f'kde_prob_{period_name}'] = prob_normalized
         print(f"   ✅ KDE {period_name}: {len(normal_coords)} điểm training")
-    
+
     return results
 
-# Tính KDE temporal
-temporal_kde = calculate_temporal_kde(df)
-df['kde_prob_day'] = temporal_kde['kde_prob_day']
-df['kde_prob_night'] = temporal_kde['kde_prob_night']
-
-# Tính adaptive probability (dùng KDE phù hợp với thời gian hiện tại)
-df['kde_prob_adaptive'] = np.where(df['is_day'] == 1, 
-                                  df['kde_prob_day'], 
-                                  df['kde_prob_night'])
-
-# ===== FEATURES ENGINEERING VỚI KDE =====
-print("⏳ Đang tạo features từ KDE...")
-
-# Thêm Step Length Statistics (mean, std, max, median)
-df['step_length'] = df['dist']
-resampled = df.set_index('timestamp').resample('2H')
-
-feat_df = pd.DataFrame()
-feat_df['step_mean'] = resampled['step_length'].mean()
-feat_df['step_std'] = resampled['step_length'].std()
-feat_df['step_max'] = resampled['step_length'].max()
-feat_df['step_median'] = resampled['step_length'].median()
-
-# Định nghĩa lại hàm entropy an toàn
-def entropy_safe(x):
-    x = np.array(x)
-    x = x[~np.isnan(x)]
-    if len(x) == 0: 
-        return 0
-    counts, _ = np.histogram(x, bins=36, range=(0, 360))
-    total = counts.sum()
-    if total == 0: 
-        return 0
-    p = counts / total
-    p = p[p > 0]
-    return -np.sum(p * np.log2(p))
-
-# Resample đều 1h để tính turning_angle
-df_resampled = df.set_index('timestamp').resample('1h').mean(numeric_only=True).interpolate(method='linear')
-
-# Tính delta, bearing, turning_angle trên df_resampled
-df_resampled['delta_lat'] = df_resampled['location-lat'].diff().fillna(0)
-df_resampled['delta_long'] = df_resampled['location-long'].diff().fillna(0)
-df_resampled['bearing'] = np.degrees(np.arctan2(df_resampled['delta_long'], df_resampled['delta_lat'])).fillna(0)
-df_resampled['turning_angle'] = df_resampled['bearing'].diff().abs().fillna(0)
-
-# Tính Entropy
-print("⏳ Đang tính Turning Entropy...")
-df_resampled['turning_entropy'] = df_resampled['turning_angle'].rolling(window=10, min_periods=1).apply(entropy_safe, raw=True)
-
-# Distance to Centroid
-print("⏳ Đang tính Distance to Centroid...")
-centroid_lat = df['location-lat'].mean()
-centroid_long = df['location-long'].mean()
-df['dist_to_centroid'] = [geodesic((lat, long), (centroid_lat, centroid_long)).meters 
-                         for lat, long in coords]
-
-# Resample RIÊNG cột này
-dist_centroid_resampled = df.set_index('timestamp')['dist_to_centroid'].resample('2h').mean()
-feat_df['dist_to_centroid_mean'] = dist_centroid_resampled.reindex(feat_df.index).fillna(0)
-
-# Rolling Variance 4h, 8h
-df1h = df.set_index('timestamp').resample('1H').mean(numeric_only=True).interpolate()
-df1h['speed_roll_var_4h'] = df1h['speed'].rolling(4).var().fillna(0)
-df1h['speed_roll_var_8h'] = df1h['speed'].rolling(8).var().fillna(0)
-df1h['accel_roll_var_4h'] = df1h['raw_accel'].rolling(4).var().fillna(0)
-df1h['accel_roll_var_8h'] = df1h['raw_accel'].rolling(8).var().fillna(0)
-
-# Map ngược lại vào feat_df (2h)
-feat_df['speed_roll_var_4h_mean'] = df1h['speed_roll_var_4h'].resample('2h').mean().reindex(feat_df.index).fillna(0)
-feat_df['speed_roll_var_8h_mean'] = df1h['speed_roll_var_8h'].resample('2h').mean().reindex(feat_df.index).fillna(0)
-feat_df['accel_roll_var_4h_mean'] = df1h['accel_roll_var_4h'].resample('2h').mean().reindex(feat_df.index).fillna(0)
-feat_df['accel_roll_var_8h_mean'] = df1h['accel_roll_var_8h'].resample('2h').mean().reindex(feat_df.index).fillna(0)
-
-# ===== THÊM KDE FEATURES VÀO FEAT_DF =====
-print("⏳ Đang thêm KDE features...")
-
-# Resample các KDE features
-kde_resampled = df.set_index('timestamp').resample('2h')
-
-feat_df['kde_prob_mean'] = kde_resampled['kde_probability'].mean().reindex(feat_df.index).fillna(0)
-feat_df['kde_prob_min'] = kde_resampled['kde_probability'].min().reindex(feat_df.index).fillna(0)
-feat_df['kde_prob_max'] = kde_resampled['kde_probability'].max().reindex(feat_df.index).fillna(0)
-feat_df['kde_prob_std'] = kde_resampled['kde_probability'].std().reindex(feat_df.index).fillna(0)
-
-# KDE temporal features
-feat_df['kde_prob_day_mean'] = kde_resampled['kde_prob_day'].mean().reindex(feat_df.index).fillna(0)
-feat_df['kde_prob_night_mean'] = kde_resampled['kde_prob_night'].mean().reindex(feat_df.index).fillna(0)
-feat_df['kde_prob_adaptive_mean'] = kde_resampled['kde_prob_adaptive'].mean().reindex(feat_df.index).fillna(0)
-
-# KDE-based anomaly features
-feat_df['kde_low_prob_ratio'] = (kde_resampled['kde_probability'].apply(lambda x: (x < 0.2).sum() / len(x))
-                                .reindex(feat_df.index).fillna(0))
-
-feat_df['kde_very_low_prob_count'] = (kde_resampled['kde_probability'].apply(lambda x: (x < 0.1).sum())
-                                     .reindex(feat_df.index).fillna(0))
-
-# ===== THÊM TURNING ANGLE FEATURES VÀO FEAT_DF =====
-print("⏳ Đang thêm turning angle features...")
-
-# Turning angle features từ dữ liệu gốc
-turning_resampled = df.set_index('timestamp').resample('2h')
-feat_df['turning_angle_mean'] = turning_resampled['turning_angle'].mean().reindex(feat_df.index).fillna(0)
-feat_df['turning_angle_std'] = turning_resampled['turning_angle'].std().reindex(feat_df.index).fillna(0)
-feat_df['turning_angle_max'] = turning_resampled['turning_angle'].max().reindex(feat_df.index).fillna(0)
-feat_df['turning_angle_median'] = turning_resampled['turning_angle'].median().reindex(feat_df.index).fillna(0)
-
-# Sharp turns features
-feat_df['sharp_turns_ratio'] = (turning_resampled['turning_angle'].apply(lambda x: (x > 90).sum() / len(x) if len(x) > 0 else 0)
-                               .reindex(feat_df.index).fillna(0))
-feat_df['moderate_turns_ratio'] = (turning_resampled['turning_angle'].apply(lambda x: ((x > 30) & (x <= 90)).sum() / len(x) if len(x) > 0 else 0)
-                                  .reindex(feat_df.index).fillna(0))
-
-# Turning entropy từ df_resampled
-if 'turning_entropy' in df_resampled.columns:
-    turning_entropy_2h = df_resampled['turning_entropy'].resample('2h').mean()
-    feat_df['turning_entropy'] = turning_entropy_2h.reindex(feat_df.index).fillna(0)
-else:
-    feat_df['turning_entropy'] = 0
-resampled_final = df.set_index('timestamp').resample('2h')
-
-feat_df['mean_speed'] = resampled_final['speed'].mean().values
-feat_df['accelerate'] = resampled_final['raw_accel'].apply(lambda x: np.mean(np.abs(x))).values
-feat_df['is_outside'] = (resampled_final['point_is_outside'].max() > 0).astype(int).values
-
-# Tính lại giờ từ index của feat_df
-feat_df['hour'] = feat_df.index.hour
-feat_df['is_night'] = ((feat_df['hour'] >= 18) | (feat_df['hour'] <= 6)).astype(int)
 
-# ===== VISUALIZATION KDE =====
-print("⏳ Đang tạo visualization...")
+# Ngưỡng của các cột chỉ báo cho cửa sổ 2h
+KDE_LOW_PROB = 0.2
+KDE_VERY_LOW_PROB = 0.1
+SHARP_TURN_DEG = 90
+MODERATE_TURN_DEG = 30
+
+# Cột chỉ báo: (cột nguồn, công thức) - nguồn duy nhất cho build_window_input và FEATURE_GRAPH
+WINDOW_INDICATORS = {
+    'kde_low_prob': ('kde_probability', lambda p: (p < KDE_LOW_PROB).astype(float)),
+    'kde_very_low_prob': ('kde_probability', lambda p: (p < KDE_VERY_LOW_PROB).astype(int)),
+    'sharp_turn': ('turning_angle', lambda a: (a > SHARP_TURN_DEG).astype(float)),
+    'moderate_turn': ('turning_angle', lambda a: ((a > MODERATE_TURN_DEG) & (a <= SHARP_TURN_DEG)).astype(float)),
+    'abs_accel': ('raw_accel', lambda a: a.abs()),
+}
+
+
+def window_indicators(df, names=None):
+    """Dict {tên cột chỉ báo: Series} tính trên toàn bộ mảng (None = tất cả)"""
+    names = list(WINDOW_INDICATORS) if names is None else names
+    return {name: WINDOW_INDICATORS[name][1](df[WINDOW_INDICATORS[name][0]]) for name in names}
+
+
+def build_window_input(df):
+    """
+    Các cột nguồn cho RAW_WINDOW_STATS. Các cột ngưỡng được tính một lần trên
+    toàn bộ mảng (thay cho lambda trên từng cửa sổ).
+    """
+    window_input = df[['step_length', 'dist_to_centroid', 'kde_probability', 'kde_prob_day',
+                       'kde_prob_night', 'kde_prob_adaptive', 'turning_angle', 'speed',
+                       'point_is_outside']].copy()
+    for name, values in window_indicators(df).items():
+        window_input[name] = values
+    return window_input
+
+
+# ===== ĐỒ THỊ TÍNH ĐẶC TRƯNG =====
+# ctx: 'df' (dữ liệu theo fix), 'hourly' (lưới 1h), 'window' (cột chỉ báo cho cửa sổ 2h),
+# 'kde_engine', 'kde_options', 'outside_bandwidth', 'outside_threshold'.
+FEATURE_GRAPH = FeatureGraph()
+
+
+@FEATURE_GRAPH.node('kinematics', provides=['time_diff', 'dist', 'speed', 'raw_accel'])
+def _kinematics(ctx):
+    ctx['df'] = compute_kinematics(ctx['df'])
+
+
+def _home_range_scores(ctx):
+    """
+    Các cột KDE từ mô hình home range đã lưu (home_range.HomeRange), thay cho fit lại:
+    mô hình hấp thụ các fix của lần chạy này (update) rồi chấm điểm chúng.
+    """
+    if 'home_scores' not in ctx:
+        df = ctx['df']
+        home_range = ctx['home_range']
+        if ctx['update_home_range']:
+            home_range.update(df)
+        print(f"   Dùng mô hình home range đã lưu ({home_range.n_fixes_} fix)")
+        ctx['home_scores'] = home_range.score(df['timestamp'], df[['location-lat', 'location-long']].values)
+    return ctx['home_scores']
+
+
+@FEATURE_GRAPH.node('kde_outside', provides=['point_is_outside', 'kde_probability_base'],
+                    requires=['kinematics'])
+def _kde_outside(ctx):
+    # ===== THAY THẾ DBSCAN BẰNG KDE CHO POINT_IS_OUTSIDE =====
+    print("⏳ Đang sử dụng KDE để xác định point_is_outside...")
+    df = ctx['df']
+    if ctx['home_range'] is not None:
+        scores = _home_range_scores(ctx)
+        df['point_is_outside'] = scores['point_is_outside']
+        df['kde_probability_base'] = scores['kde_probability_base']
+        return
+    df['point_is_outside'], df['kde_probability_base'] = kde_point_is_outside(
+        df, bandwidth=ctx['outside_bandwidth'], threshold=ctx['outside_threshold'],
+        engine=ctx['kde_engine'], **ctx['kde_options'])
+
+
+@FEATURE_GRAPH.node('turning', provides=['bearing', 'turning_angle'], requires=['kinematics'])
+def _turning(ctx):
+    # ===== THÊM TURNING ANGLE VÀO DF GỐC =====
+    print("⏳ Đang tính turning angle trên dữ liệu gốc...")
+    df = ctx['df']
+
+    # Bearing và turning angle tính trên mảng dịch (thay vòng lặp iloc)
+    df['bearing'] = compute_bearings(df['location-lat'].values, df['location-long'].values)
+    turning_angles = compute_turning_angles(df['bearing'].values)
+    df['turning_angle'] = turning_angles
+
+    print(f"✅ Đã tính turning angle: mean={np.mean(turning_angles):.2f}°, max={max(turning_angles):.2f}°")
+
+
+@FEATURE_GRAPH.node('kde_home', provides=['kde_probability', 'kde_home_range'],
+                    requires=lambda ctx: ['kinematics'] if ctx['density_lut'] is not None else ['kde_outside'])
+def _kde_home(ctx):
+    # ===== THÊM KDE CHO PROBABILITY HOME RANGE =====
+    print("⏳ Đang tính KDE Probability Home Range (bandwidth 0.01)...")
+    df = ctx['df']
+    if ctx['density_lut'] is not None:
+        # Tra bảng mật độ đã raster hóa (density_lut.py), không cần point_is_outside / fit KDE
+        df['kde_probability'] = ctx['density_lut'].lookup(df[['location-lat', 'location-long']].values)
+    elif ctx['home_range'] is not None:
+        df['kde_probability'] = _home_range_scores(ctx)['kde_probability']
+    else:
+        df['kde_probability'] = calculate_kde_probability(df, bandwidth=0.01, engine=ctx['kde_engine'],
+                                                          **ctx['kde_options'])
+
+    # Tạo categorical home range dựa trên KDE
+    df['kde_home_range'] = pd.cut(df['kde_probability'],
+                                 bins=[0, 0.2, 0.5, 0.8, 1.0],
+                                 labels=['Very_Low', 'Low', 'Medium', 'High'])
+
+    print(f"   ✅ KDE Home Range Distribution:")
+    print(df['kde_home_range'].value_counts())
+
+
+@FEATURE_GRAPH.node('kde_bandwidths', provides=['kde_prob_bw_0005', 'kde_prob_bw_002'],
+                    requires=['kde_outside'])
+def _kde_bandwidths(ctx):
+    # Bandwidth nhỏ = chi tiết hơn, bandwidth lớn = mịn hơn (chỉ để so sánh với 0.01)
+    print("   Đang thử nghiệm các bandwidth...")
+    df = ctx['df']
+    for bw in [0.005, 0.02]:
+        print(f"   - Bandwidth {bw}...")
+        df[f'kde_prob_bw_{str(bw).replace(".", "")}'] = calculate_kde_probability(
+            df, bandwidth=bw, engine=ctx['kde_engine'], **ctx['kde_options'])
+
+
+@FEATURE_GRAPH.node('kde_temporal', provides=['hour', 'is_day', 'kde_prob_day', 'kde_prob_night',
+                                              'kde_prob_adaptive'], requires=['kde_outside'])
+def _kde_temporal(ctx):
+    # ===== NÂNG CAO: KDE THEO THỜI GIAN =====
+    print("⏳ Đang tính KDE theo thời gian (Day/Night)...")
+    df = ctx['df']
+
+    # Tính KDE temporal
+    if ctx['home_range'] is not None:
+        df['hour'] = df['timestamp'].dt.hour
+        df['is_day'] = ((df['hour'] >= 6) & (df['hour'] < 18)).astype(int)
+        temporal_kde = _home_range_scores(ctx)
+    else:
+        temporal_kde = calculate_temporal_kde(df, engine=ctx['kde_engine'], **ctx['kde_options'])
+    df['kde_prob_day'] = temporal_kde['kde_prob_day']
+    df['kde_prob_night'] = temporal_kde['kde_prob_night']
+
+    # Tính adaptive probability (dùng KDE phù hợp với thời gian hiện tại)
+    df['kde_prob_adaptive'] = np.where(df['is_day'] == 1,
+                                      df['kde_prob_day'],
+                                      df['kde_prob_night'])
+
+
+@FEATURE_GRAPH.node('step_length', provides=['step_length'], requires=['kinematics'])
+def _step_length(ctx):
+    ctx['df']['step_length'] = ctx['df']['dist']
+
+
+@FEATURE_GRAPH.node('dist_to_centroid', provides=['dist_to_centroid'], requires=['kinematics'])
+def _dist_to_centroid(ctx):
+    print("⏳ Đang tính Distance to Centroid...")
+    df = ctx['df']
+    coords = df[['location-lat', 'location-long']].values
+    centroid_lat = df['location-lat'].mean()
+    centroid_long = df['location-long'].mean()
+    df['dist_to_centroid'] = distances_to_point(coords, (centroid_lat, centroid_long), method='vincenty')
+
+
+@FEATURE_GRAPH.node('hourly_grid', provides=[], requires=['kinematics'])
+def _hourly_grid(ctx):
+    # Resample đều 1h (dùng chung cho turning entropy và rolling variance)
+    df_resampled = (ctx['df'].set_index('timestamp')[['location-lat', 'location-long', 'speed', 'raw_accel']]
+                    .resample('1h').mean().interpolate(method='linear'))
+
+    # Tính delta, bearing, turning_angle trên df_resampled
+    df_resampled['delta_lat'] = df_resampled['location-lat'].diff().fillna(0)
+    df_resampled['delta_long'] = df_resampled['location-long'].diff().fillna(0)
+    df_resampled['bearing'] = np.degrees(np.arctan2(df_resampled['delta_long'], df_resampled['delta_lat'])).fillna(0)
+    df_resampled['turning_angle'] = df_resampled['bearing'].diff().abs().fillna(0)
+    ctx['hourly'] = df_resampled
+
+
+@FEATURE_GRAPH.node('turning_entropy', provides=['turning_entropy'], requires=['hourly_grid'])
+def _turning_entropy(ctx):
+    print("⏳ Đang tính Turning Entropy...")
+    hourly = ctx['hourly']
+    # Cửa sổ trượt cập nhật O(1), khớp từng bit với rolling(window=10).apply(entropy_safe) (trajectory.py)
+    hourly['turning_entropy'] = rolling_entropy(hourly['turning_angle'].values, window=10, min_periods=1)
+
+
+@FEATURE_GRAPH.node('rolling_variance', provides=['speed_roll_var_4h', 'speed_roll_var_8h',
+                                                  'accel_roll_var_4h', 'accel_roll_var_8h'],
+                    requires=['hourly_grid'])
+def _rolling_variance(ctx):
+    hourly = ctx['hourly']
+    hourly['speed_roll_var_4h'] = hourly['speed'].rolling(4).var().fillna(0)
+    hourly['speed_roll_var_8h'] = hourly['speed'].rolling(8).var().fillna(0)
+    hourly['accel_roll_var_4h'] = hourly['raw_accel'].rolling(4).var().fillna(0)
+    hourly['accel_roll_var_8h'] = hourly['raw_accel'].rolling(8).var().fillna(0)
+
+
+# Các cột chỉ báo cho cửa sổ 2h (công thức trong WINDOW_INDICATORS, dùng chung với build_window_input)
+@FEATURE_GRAPH.node('kde_low_prob', provides=['kde_low_prob', 'kde_very_low_prob'], requires=['kde_home'])
+def _kde_low_prob(ctx):
+    ctx['window'].update(window_indicators(ctx['df'], ['kde_low_prob', 'kde_very_low_prob']))
+
+
+@FEATURE_GRAPH.node('turn_classes', provides=['sharp_turn', 'moderate_turn'], requires=['turning'])
+def _turn_classes(ctx):
+    ctx['window'].update(window_indicators(ctx['df'], ['sharp_turn', 'moderate_turn']))
+
+
+@FEATURE_GRAPH.node('abs_accel', provides=['abs_accel'], requires=['kinematics'])
+def _abs_accel(ctx):
+    ctx['window'].update(window_indicators(ctx['df'], ['abs_accel']))
+
+
+def resolve_features(features=None):
+    """Danh sách đặc trưng 2h hợp lệ theo thứ tự FEATURE_COLUMNS (None = tất cả)"""
+    if features is None:
+        return list(FEATURE_COLUMNS)
+    unknown = [f for f in features if f not in FEATURE_COLUMNS]
+    if unknown:
+        raise ValueError(f"❌ Unknown features: {unknown}")
+    return [f for f in FEATURE_COLUMNS if f in features]
+
+
+def required_nodes(features=None, columns=(), density_lut=None):
+    """Các node của FEATURE_GRAPH cần chạy (theo thứ tự) để tính features"""
+    features = resolve_features(features)
+    sources = [col for out, col, _ in RAW_WINDOW_STATS + HOURLY_WINDOW_STATS if out in features]
+    return FEATURE_GRAPH.plan(['speed'] + sources + list(columns), {'density_lut': density_lut})
+
+
+def extract_features(df, kde_engine='exact', kde_options=None,
+                     outside_bandwidth=0.01, outside_threshold=0.15,
+                     features=None, columns=(), home_range=None, update_home_range=True,
+                     density_lut=None):
+    """
+    Trích xuất bảng đặc trưng 2h từ dữ liệu GPS đã đọc bằng load_collar().
+    kde_engine: 'exact', 'tree' hoặc 'binned' (xem kde_engine.py).
+    outside_bandwidth / outside_threshold: cấu hình nhãn point_is_outside (chọn bằng kde_sweep.py).
+    features: các cột đặc trưng 2h cần tính (mặc định FEATURE_COLUMNS); chỉ các node của
+              FEATURE_GRAPH cần cho chúng được chạy.
+    columns: các cột theo fix cần có thêm trong df (ví dụ để xuất file raw / vẽ biểu đồ).
+    home_range: HomeRange engine 'incremental' (home_range.py) dùng cho point_is_outside và các
+                cột kde_probability thay cho fit KDE lại; update_home_range=True để mô hình
+                hấp thụ các fix của lần chạy này trước khi chấm điểm.
+    density_lut: DensityLUT (density_lut.py) - kde_probability lấy bằng tra bảng song tuyến.
+    Trả về (feat_df, df) với df là dữ liệu gốc đã thêm các cột đã tính.
+    Danh sách node đã chạy nằm trong feat_df.attrs['feature_nodes'], thời gian từng node
+    (giây) trong feat_df.attrs['node_seconds'].
+    """
+    features = resolve_features(features)
+    raw_specs = [spec for spec in RAW_WINDOW_STATS if spec[0] in features]
+    hourly_specs = [spec for spec in HOURLY_WINDOW_STATS if spec[0] in features]
+
+    ctx = {'df': df, 'window': {}, 'kde_engine': kde_engine, 'kde_options': kde_options or {},
+           'outside_bandwidth': outside_bandwidth, 'outside_threshold': outside_threshold,
+           'home_range': home_range, 'update_home_range': update_home_range, 'density_lut': density_lut}
+    # kinematics luôn chạy: lọc tốc độ ảo quyết định các fix và lưới cửa sổ
+    needed = (['speed'] + [col for _, col, _ in raw_specs + hourly_specs]
+              + [col for col in columns if col not in df.columns])
+    timings = {}
+    executed = FEATURE_GRAPH.run(needed, ctx, timings)
+    df = ctx['df']
+
+    print(f"🧩 Đã chạy {len(executed)}/{len(FEATURE_GRAPH.nodes)} node: {', '.join(executed)}")
+    skipped = FEATURE_GRAPH.skipped(executed)
+    if skipped:
+        print(f"   Bỏ qua: {', '.join(skipped)}")
+
+    # ===== GỘP TẤT CẢ THỐNG KÊ 2H TRONG MỘT LƯỢT =====
+    print("⏳ Đang gộp features theo cửa sổ 2h...")
+
+    _, bins = window_codes(df['timestamp'], freq='2h')
+    parts = [pd.DataFrame(index=bins)]
+    if raw_specs:
+        window_input = pd.DataFrame({col: ctx['window'][col] if col in ctx['window'] else df[col]
+                                     for col in dict.fromkeys(col for _, col, _ in raw_specs)})
+        parts.append(aggregate_windows(window_input, df['timestamp'], raw_specs, freq='2h', bins=bins))
+    if hourly_specs:
+        hourly = ctx['hourly']
+        parts.append(aggregate_windows(hourly, hourly.index, hourly_specs, freq='2h', bins=bins))
+    feat_df = pd.concat(parts, axis=1)[features]
+
+    if 'kde_very_low_prob_count' in feat_df:
+        feat_df['kde_very_low_prob_count'] = feat_df['kde_very_low_prob_count'].fillna(0).astype(int)
+    if 'is_outside' in feat_df:
+        feat_df['is_outside'] = (feat_df['is_outside'] > 0).astype(int)
+
+    # Tính lại giờ từ index của feat_df
+    feat_df['hour'] = feat_df.index.hour
+    feat_df['is_night'] = ((feat_df['hour'] >= 18) | (feat_df['hour'] <= 6)).astype(int)
+
+    feat_df.attrs['feature_nodes'] = executed
+    feat_df.attrs['node_seconds'] = timings
+    return feat_df, df
+
 
-def plot_kde_analysis(df):
+# ===== VISUALIZATION KDE =====
+# matplotlib / seaborn chỉ được import khi bật --plot (chế độ headless mặc định không import)
+def plot_kde_analysis(df, show=False):
     """Vẽ biểu đồ phân tích KDE"""
-    
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-    
+
     # Plot 1: GPS points colored by KDE probability
-    scatter = axes[0,0].scatter(df['location-long'], df['location-lat'], 
-                               c=df['kde_probability'], cmap='viridis', 
+    scatter = axes[0,0].scatter(df['location-long'], df['location-lat'],
+                               c=df['kde_probability'], cmap='viridis',
                                alpha=0.6, s=10)
     axes[0,0].set_title('GPS Points - KDE Probability')
     axes[0,0].set_xlabel('Longitude')
     axes[0,0].set_ylabel('Latitude')
     plt.colorbar(scatter, ax=axes[0,0], label='KDE Probability')
-    
+
     # Plot 2: KDE probability distribution
     axes[0,1].hist(df['kde_probability'], bins=50, alpha=0.7, edgecolor='black')
     axes[0,1].set_title('KDE Probability Distribution')
     axes[0,1].set_xlabel('KDE Probability')
     axes[0,1].set_ylabel('Frequency')
-    axes[0,1].axvline(df['kde_probability'].mean(), color='red', linestyle='--', 
+    axes[0,1].axvline(df['kde_probability'].mean(), color='red', linestyle='--',
                      label=f'Mean: {df["kde_probability"].mean():.3f}')
     axes[0,1].legend()
-    
+
     # Plot 3: Day vs Night KDE comparison
     day_data = df[df['is_day'] == 1]['kde_prob_day']
     night_data = df[df['is_day'] == 0]['kde_prob_night']
-    
+
     axes[1,0].hist(day_data, bins=30, alpha=0.5, label='Day KDE', color='orange')
     axes[1,0].hist(night_data, bins=30, alpha=0.5, label='Night KDE', color='blue')
     axes[1,0].set_title('Day vs Night KDE Probability')
     axes[1,0].set_xlabel('KDE Probability')
     axes[1,0].set_ylabel('Frequency')
     axes[1,0].legend()
-    
+
     # Plot 4: KDE vs DBSCAN comparison
-    kde_low = df['kde_probability'] < 0.2
+    kde_low = df['kde_probability'] < KDE_LOW_PROB
     dbscan_outside = df['point_is_outside'] == 1
-    
+
     comparison_data = pd.DataFrame({
         'KDE_Low': kde_low.astype(int),
         'DBSCAN_Outside': dbscan_outside.astype(int)
     })
-    
-    confusion_kde_dbscan = pd.crosstab(comparison_data['KDE_Low'], 
+
+    confusion_kde_dbscan = pd.crosstab(comparison_data['KDE_Low'],
                                       comparison_data['DBSCAN_Outside'])
-    
+
     sns.heatmap(confusion_kde_dbscan, annot=True, fmt='d', cmap='Blues', ax=axes[1,1])
     axes[1,1].set_title('KDE vs DBSCAN Comparison')
     axes[1,1].set_xlabel('DBSCAN Outside')
     axes[1,1].set_ylabel('KDE Low Probability')
-    
+
     plt.tight_layout()
     plt.savefig('kde_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
-
-# Tạo visualization
-plot_kde_analysis(df)
-
-# ===== XUẤT FILE =====
-# Reset index để đưa timestamp thành cột bình thường trước khi lưu
-feat_df_final = feat_df.fillna(0).reset_index()
-feat_df_final.to_csv('elephant_features_kde_enhanced.csv', index=False)
-
-# Lưu thêm file raw data với KDE và turning angle
-df_with_kde = df[['timestamp', 'location-lat', 'location-long', 'speed', 'raw_accel',
-                  'point_is_outside', 'kde_probability', 'kde_prob_day', 'kde_prob_night',
-                  'kde_prob_adaptive', 'kde_home_range', 'turning_angle', 'bearing']].copy()
-df_with_kde.to_csv('elephant_raw_with_kde.csv', index=False)
-
-print("\n🎉 XONG! KDE Features đã tính xong.")
-print("Số đặc trưng:", len(feat_df_final.columns))
-print("Files saved:")
-print("  - elephant_features_kde_enhanced.csv (features cho ML)")
-print("  - elephant_raw_with_kde.csv (raw data với KDE)")
-print("  - kde_analysis.png (visualization)")
-
-print(f"\n📊 Statistics:")
-print(f"  Total points: {len(df)}")
-print(f"  Points outside (KDE): {df['point_is_outside'].sum()} ({df['point_is_outside'].mean()*100:.2f}%)")
-print(f"  Mean KDE Probability: {df['kde_probability'].mean():.4f}")
-print(f"  Mean turning angle: {df['turning_angle'].mean():.2f}°")
-print(f"  Max turning angle: {df['turning_angle'].max():.2f}°")
-print(f"  Features created: {len(feat_df_final.columns)}")
-print(f"  Low Probability Points (<0.2): {(df['kde_probability'] < 0.2).sum()} ({(df['kde_probability'] < 0.2).mean()*100:.1f}%)")
-print(f"  Very Low Probability Points (<0.1): {(df['kde_probability'] < 0.1).sum()} ({(df['kde_probability'] < 0.1).mean()*100:.1f}%)")
-
-# Vẽ biểu đồ kiểm tra
-plt.figure(figsize=(16, 12))
-
-# Subplot 1: KDE Probability heatmap
-plt.subplot(2, 3, 1)
-scatter = plt.scatter(df['location-long'], df['location-lat'], 
-                     c=df['kde_probability'], cmap='viridis', 
-                     alpha=0.6, s=10)
-plt.title('GPS Points - KDE Probability')
-plt.xlabel('Longitude')
-plt.ylabel('Latitude')
-plt.colorbar(scatter, label='KDE Probability')
-
-# Subplot 2: Inside vs Outside (KDE-based)
-plt.subplot(2, 3, 2)
-inside = df[df['point_is_outside'] == 0]
-outside = df[df['point_is_outside'] == 1]
-plt.scatter(inside['location-long'], inside['location-lat'], 
-           c='blue', s=10, alpha=0.5, label=f'Inside ({len(inside)})')
-plt.scatter(outside['location-long'], outside['location-lat'], 
-           c='red', s=15, alpha=0.8, label=f'Outside ({len(outside)})')
-plt.title('Point Classification (KDE-based)')
-plt.xlabel('Longitude')
-plt.ylabel('Latitude')
-plt.legend()
-
-# Subplot 3: Turning Angle Distribution
-plt.subplot(2, 3, 3)
-plt.hist(df['turning_angle'], bins=50, alpha=0.7, edgecolor='black')
-plt.axvline(df['turning_angle'].mean(), color='red', linestyle='--',
-           label=f'Mean: {df["turning_angle"].mean():.1f}°')
-plt.title('Turning Angle Distribution')
-plt.xlabel('Turning Angle (degrees)')
-plt.ylabel('Frequency')
-plt.legend()
-
-# Subplot 4: Time series của outliers
-plt.subplot(2, 3, 4)
-df_plot = df.set_index('timestamp')
-plt.plot(df_plot.index, df_plot['point_is_outside'], alpha=0.7)
-plt.xlabel('Time')
-plt.ylabel('Is Outside')
-plt.title('Outside Points Over Time')
-
-# Subplot 5: KDE Probability Distribution
-plt.subplot(2, 3, 5)
-plt.hist(df['kde_probability'], bins=50, alpha=0.7, edgecolor='black')
-plt.axvline(df['kde_probability'].mean(), color='red', linestyle='--',
-           label=f'Mean: {df["kde_probability"].mean():.3f}')
-plt.axvline(0.2, color='orange', linestyle='--', label='Threshold: 0.15')
-plt.title('KDE Probability Distribution')
-plt.xlabel('KDE Probability')
-plt.ylabel('Frequency')
-plt.legend()
-
-# Subplot 6: Speed vs Turning Angle
-plt.subplot(2, 3, 6)
-plt.scatter(df['speed'], df['turning_angle'], alpha=0.5, s=5)
-plt.xlabel('Speed (m/h)')
-plt.ylabel('Turning Angle (degrees)')
-plt.title('Speed vs Turning Angle')
-
-plt.tight_layout()
-plt.savefig('kde_turning_analysis.png', dpi=300, bbox_inches='tight')
-print("📊 Biểu đồ đã lưu: kde_turning_analysis.png")
-plt.show()
\ No newline at end of file
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def plot_kde_turning_analysis(df, show=False):
+    """Vẽ biểu đồ kiểm tra KDE và turning angle (lưới 2x3)"""
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(16, 12))
+
+    # Subplot 1: KDE Probability heatmap
+    plt.subplot(2, 3, 1)
+    scatter = plt.scatter(df['location-long'], df['location-lat'],
+                         c=df['kde_probability'], cmap='viridis',
+                         alpha=0.6, s=10)
+    plt.title('GPS Points - KDE Probability')
+    plt.xlabel('Longitude')
+    plt.ylabel('Latitude')
+    plt.colorbar(scatter, label='KDE Probability')
+
+    # Subplot 2: Inside vs Outside (KDE-based)
+    plt.subplot(2, 3, 2)
+    inside = df[df['point_is_outside'] == 0]
+    outside = df[df['point_is_outside'] == 1]
+    plt.scatter(inside['location-long'], inside['location-lat'],
+               c='blue', s=10, alpha=0.5, label=f'Inside ({len(inside)})')
+    plt.scatter(outside['location-long'], outside['location-lat'],
+               c='red', s=15, alpha=0.8, label=f'Outside ({len(outside)})')
+    plt.title('Point Classification (KDE-based)')
+    plt.xlabel('Longitude')
+    plt.ylabel('Latitude')
+    plt.legend()
+
+    # Subplot 3: Turning Angle Distribution
+    plt.subplot(2, 3, 3)
+    plt.hist(df['turning_angle'], bins=50, alpha=0.7, edgecolor='black')
+    plt.axvline(df['turning_angle'].mean(), color='red', linestyle='--',
+               label=f'Mean: {df["turning_angle"].mean():.1f}°')
+    plt.title('Turning Angle Distribution')
+    plt.xlabel('Turning Angle (degrees)')
+    plt.ylabel('Frequency')
+    plt.legend()
+
+    # Subplot 4: Time series của outliers
+    plt.subplot(2, 3, 4)
+    df_plot = df.set_index('timestamp')
+    plt.plot(df_plot.index, df_plot['point_is_outside'], alpha=0.7)
+    plt.xlabel('Time')
+    plt.ylabel('Is Outside')
+    plt.title('Outside Points Over Time')
+
+    # Subplot 5: KDE Probability Distribution
+    plt.subplot(2, 3, 5)
+    plt.hist(df['kde_probability'], bins=50, alpha=0.7, edgecolor='black')
+    plt.axvline(df['kde_probability'].mean(), color='red', linestyle='--',
+               label=f'Mean: {df["kde_probability"].mean():.3f}')
+    plt.axvline(0.2, color='orange', linestyle='--', label='Threshold: 0.15')
+    plt.title('KDE Probability Distribution')
+    plt.xlabel('KDE Probability')
+    plt.ylabel('Frequency')
+    plt.legend()
+
+    # Subplot 6: Speed vs Turning Angle
+    plt.subplot(2, 3, 6)
+    plt.scatter(df['speed'], df['turning_angle'], alpha=0.5, s=5)
+    plt.xlabel('Speed (m/h)')
+    plt.ylabel('Turning Angle (degrees)')
+    plt.title('Speed vs Turning Angle')
+
+    plt.tight_layout()
+    plt.savefig('kde_turning_analysis.png', dpi=300, bbox_inches='tight')
+    print("📊 Biểu đồ đã lưu: kde_turning_analysis.png")
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def report_kde_engine(df, engine, kde_options, tol=1e-2):
+    """In speedup và sai số của KDE engine so với KDE exact (home range bw=0.01)"""
+    coords = df[['location-lat', 'location-long']].values
+    normal_coords = coords[df['point_is_outside'] == 0]
+    report = benchmark_engine(normal_coords, coords, 0.01, engine=engine, tol=tol, **kde_options)
+    print(f"\n⚡ KDE engine '{engine}' vs exact:")
+    print(f"  exact: {report['exact_seconds']:.3f}s, {engine}: {report['engine_seconds']:.3f}s "
+          f"(speedup x{report['speedup']:.1f})")
+    print(f"  Max abs error: {report['max_abs_error']:.2e}, mean abs error: {report['mean_abs_error']:.2e} "
+          f"({'✅ trong' if report['within_tol'] else '⚠️ vượt'} tolerance {tol})")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Trích xuất đặc trưng KDE cho dữ liệu GPS voi')
+    parser.add_argument('--input', default=INPUT_FILE, help='File CSV Movebank đầu vào')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='exact',
+                        help='exact (sklearn), tree (KD-tree atol/rtol) hoặc binned (lưới + FFT)')
+    parser.add_argument('--kde-atol', type=float, default=0.0, help='atol cho engine tree')
+    parser.add_argument('--kde-rtol', type=float, default=1e-4, help='rtol cho engine tree')
+    parser.add_argument('--kde-grid-step', type=float, default=0.25,
+                        help='Kích thước ô lưới (bội số bandwidth) cho engine binned')
+    parser.add_argument('--outside-bandwidth', type=float, default=0.01,
+                        help='Bandwidth KDE cho nhãn point_is_outside')
+    parser.add_argument('--outside-threshold', type=float, default=0.15,
+                        help='Ngưỡng xác suất chuẩn hóa cho nhãn point_is_outside')
+    parser.add_argument('--kde-report', action='store_true',
+                        help='So sánh engine đã chọn với KDE exact (speedup, sai số)')
+    parser.add_argument('--kde-tol', type=float, default=1e-2,
+                        help='Sai số cho phép trên xác suất chuẩn hóa khi báo cáo')
+    parser.add_argument('--features', default=None,
+                        help="Danh sách đặc trưng cần tính, cách nhau bởi dấu phẩy, hoặc 'selected' "
+                             "(6 đặc trưng FPGA + is_outside); mặc định tính tất cả")
+    parser.add_argument('--home-range', default=None,
+                        help='File mô hình home range incremental (.npz): nạp (hoặc tạo mới), cập nhật '
+                             'bằng dữ liệu đầu vào rồi lưu lại; thay cho fit KDE lại từ đầu')
+    parser.add_argument('--half-life', default=None,
+                        help="Chu kỳ bán rã trọng số fix cũ cho --home-range, ví dụ '90D'")
+    parser.add_argument('--density-lut', default=None,
+                        help='Bảng tra mật độ (.npz từ density_lut.py) cho kde_probability thay cho fit KDE')
+    parser.add_argument('--csv', action='store_true',
+                        help='Xuất thêm bản CSV bên cạnh bảng cột nhị phân (.cols)')
+    parser.add_argument('--plot', action='store_true',
+                        help='Vẽ và lưu kde_analysis.png / kde_turning_analysis.png (mặc định headless)')
+    parser.add_argument('--show', action='store_true', help='Hiển thị biểu đồ (plt.show, kèm --plot)')
+    args = parser.parse_args(argv)
+
+    if args.kde_engine == 'tree':
+        kde_options = {'atol': args.kde_atol, 'rtol': args.kde_rtol}
+    elif args.kde_engine == 'binned':
+        kde_options = {'grid_step': args.kde_grid_step}
+    else:
+        kde_options = {}
+
+    if args.features is None:
+        features, columns = None, list(RAW_EXPORT_COLUMNS)
+    else:
+        features = (SELECTED_FEATURES + ['is_outside'] if args.features == 'selected'
+                    else [f.strip() for f in args.features.split(',') if f.strip()])
+        columns = []
+    if args.plot:
+        columns += PLOT_COLUMNS
+    if args.kde_report:
+        columns.append('point_is_outside')
+
+    home_range = None
+    if args.home_range:
+        home_range = load_or_create(args.home_range, outside_bandwidth=args.outside_bandwidth,
+                                    outside_threshold=args.outside_threshold, half_life=args.half_life)
+
+    # Đọc file và trích xuất đặc trưng
+    df = load_collar(args.input)
+    feat_df, df = extract_features(df, kde_engine=args.kde_engine, kde_options=kde_options,
+                                   outside_bandwidth=args.outside_bandwidth,
+                                   outside_threshold=args.outside_threshold,
+                                   features=features, columns=columns, home_range=home_range,
+                                   density_lut=DensityLUT.load(args.density_lut) if args.density_lut else None)
+    if home_range is not None and hasattr(home_range, 'outside_'):
+        home_range.save(args.home_range)
+        print(f"💾 Đã lưu mô hình home range: {args.home_range}")
+
+    # Tạo visualization (chỉ khi bật --plot)
+    if args.plot:
+        print("⏳ Đang tạo visualization...")
+        plot_kde_analysis(df, show=args.show)
+
+    # ===== XUẤT FILE =====
+    # Reset index để đưa timestamp thành cột bình thường trước khi lưu
+    feat_df_final = feat_df.fillna(0).reset_index()
+    write_table(feat_df_final, 'elephant_features_kde_enhanced', csv=args.csv)
+
+    # Lưu thêm file raw data với KDE và turning angle
+    # (khi chỉ tính một phần đặc trưng thì chỉ xuất các cột đã có)
+    df_with_kde = df[[col for col in RAW_EXPORT_COLUMNS if col in df.columns]].copy()
+    write_table(df_with_kde, 'elephant_raw_with_kde', csv=args.csv)
+
+    print("\n🎉 XONG! KDE Features đã tính xong.")
+    print("Số đặc trưng:", len(feat_df_final.columns))
+    print("Files saved:")
+    print("  - elephant_features_kde_enhanced.cols (features cho ML)")
+    print("  - elephant_raw_with_kde.cols (raw data với KDE)")
+    if args.csv:
+        print("  - elephant_features_kde_enhanced.csv / elephant_raw_with_kde.csv (bản CSV)")
+    if args.plot:
+        print("  - kde_analysis.png (visualization)")
+
+    print(f"\n📊 Statistics:")
+    print(f"  Total points: {len(df)}")
+    if 'point_is_outside' in df:
+        print(f"  Points outside (KDE): {df['point_is_outside'].sum()} ({df['point_is_outside'].mean()*100:.2f}%)")
+    if 'kde_probability' in df:
+        print(f"  Mean KDE Probability: {df['kde_probability'].mean():.4f}")
+    if 'turning_angle' in df:
+        print(f"  Mean turning angle: {df['turning_angle'].mean():.2f}°")
+        print(f"  Max turning angle: {df['turning_angle'].max():.2f}°")
+    print(f"  Features created: {len(feat_df_final.columns)}")
+    if 'kde_probability' in df:
+        print(f"  Low Probability Points (<{KDE_LOW_PROB}): {(df['kde_probability'] < KDE_LOW_PROB).sum()} ({(df['kde_probability'] < KDE_LOW_PROB).mean()*100:.1f}%)")
+        print(f"  Very Low Probability Points (<{KDE_VERY_LOW_PROB}): {(df['kde_probability'] < KDE_VERY_LOW_PROB).sum()} ({(df['kde_probability'] < KDE_VERY_LOW_PROB).mean()*100:.1f}%)")
+
+    if args.kde_report and args.kde_engine != 'exact':
+        report_kde_engine(df, args.kde_engine, kde_options, tol=args.kde_tol)
+
+    # Vẽ biểu đồ kiểm tra
+    if args.plot:
+        plot_kde_turning_analysis(df, show=args.show)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from ingest import BASE_COLUMNS, ID_COLUMNS, read_movebank
+from kde_engine import KDE_ENGINES
+from locfeature import extract_features
+
+# ===== XỬ LÝ NHIỀU COLLAR SONG SONG =====
+# Chia file Movebank của cả study (hoặc thư mục nhiều file) theo từng cá thể,
+# trích xuất đặc trưng cho mỗi con trên một process riêng. Mỗi con có KDE
+# home range riêng (extract_features chỉ thấy dữ liệu của con đó).
+
+
+def find_exports(paths):
+    """Danh sách file CSV từ các đường dẫn (file hoặc thư mục)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        else:
+            files.append(path)
+    return files
+
+
+def load_study(paths):
+    """Đọc các file export và trả về dict {individual: DataFrame fix}"""
+    frames = []
+    for path in find_exports(paths):
+        header = pd.read_csv(path, nrows=0).columns
+        id_col = next((c for c in ID_COLUMNS if c in header), None)
+        # Chỉ đọc cột cần, định danh dạng category, timestamp parse khi đọc
+        frame = read_movebank(path, columns=BASE_COLUMNS + ([id_col] if id_col else []))
+        # File không có cột định danh -> dùng tên file làm cá thể
+        frame['individual'] = (frame[id_col].astype(str) if id_col
+                               else os.path.splitext(os.path.basename(path))[0])
+        frames.append(frame.drop(columns=[id_col]) if id_col else frame)
+
+    study = pd.concat(frames, ignore_index=True)
+    return {individual: group.drop(columns=['individual']).sort_values('timestamp')
+            for individual, group in study.groupby('individual', sort=True)}
+
+
+def extract_individual(individual, df, kde_engine='exact', kde_options=None, quiet=True):
+    """Trích xuất đặc trưng cho một cá thể (chạy trong process worker)"""
+    t0 = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log) if quiet else contextlib.nullcontext():
+        feat_df, _ = extract_features(df, kde_engine=kde_engine, kde_options=kde_options)
+    feat_df = feat_df.fillna(0).reset_index()
+    feat_df.insert(0, 'individual', individual)
+    stats = {'individual': individual, 'worker': os.getpid(), 'fixes': len(df),
+             'windows': len(feat_df), 'seconds': time.perf_counter() - t0}
+    return feat_df, stats
+
+
+def extract_study(individuals, workers=None, kde_engine='exact', kde_options=None):
+    """Chạy extract_individual cho mọi cá thể trên process pool, trả về (bảng gộp, thống kê)"""
+    tables, stats = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_individual, individual, df, kde_engine, kde_options): individual
+                   for individual, df in individuals.items()}
+        for future in as_completed(futures):
+            feat_df, stat = future.result()
+            print(f"   ✅ {stat['individual']}: {stat['fixes']} fixes -> {stat['windows']} cửa sổ "
+                  f"({stat['seconds']:.1f}s, worker {stat['worker']})")
+            tables.append(feat_df)
+            stats.append(stat)
+
+    combined = pd.concat(tables, ignore_index=True).sort_values(['individual', 'timestamp'],
+                                                                ignore_index=True)
+    return combined, pd.DataFrame(stats)
+
+
+def worker_throughput(stats, wall_seconds):
+    """Thông lượng theo worker: số cá thể, số fix, thời gian bận và fixes/s"""
+    table = stats.groupby('worker').agg(individuals=('individual', 'count'),
+                                        fixes=('fixes', 'sum'),
+                                        busy_seconds=('seconds', 'sum'))
+    table['fixes_per_second'] = table['fixes'] / table['busy_seconds']
+    table['utilization'] = table['busy_seconds'] / wall_seconds
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Trích xuất đặc trưng cho nhiều collar song song')
+    parser.add_argument('paths', nargs='+', help='File export Movebank hoặc thư mục chứa các file CSV')
+    parser.add_argument('--workers', type=int, default=None, help='Số process (mặc định = số CPU)')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='exact')
+    parser.add_argument('--output', default='elephant_features_all_collars.csv')
+    args = parser.parse_args(argv)
+
+    print("⏳ Đang đọc dữ liệu study...")
+    individuals = load_study(args.paths)
+    print(f"   {len(individuals)} cá thể: {', '.join(map(str, individuals))}")
+
+    t0 = time.perf_counter()
+    combined, stats = extract_study(individuals, workers=args.workers, kde_engine=args.kde_engine)
+    wall = time.perf_counter() - t0
+
+    combined.to_csv(args.output, index=False)
+    print(f"\n🎉 Đã lưu {len(combined)} dòng vào {args.output} ({wall:.1f}s)")
+    print("\n📊 Throughput theo worker:")
+    print(worker_throughput(stats, wall).to_string())
+
+
+if __name__ == '__main__':
+    main()
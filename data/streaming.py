@@ -0,0 +1,286 @@
+import argparse
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from geodist import distance, distances_to_point
+from trajectory import calculate_bearing, wrap_angle, SlidingEntropy
+from locfeature import (MAX_SPEED_THRESHOLD, RAW_WINDOW_STATS, HOURLY_WINDOW_STATS,
+                        FEATURE_COLUMNS, build_window_input)
+
+# ===== TRÍCH XUẤT ĐẶC TRƯNG TRỰC TUYẾN (STREAMING) =====
+# Nhận fix GPS từng cái hoặc từng lô nhỏ, chỉ giữ trạng thái cần thiết (fix trước,
+# giờ đang gộp, cửa sổ entropy / variance, các cửa sổ 2h chưa đóng) và trả về một
+# dòng đặc trưng khi cửa sổ 2h đóng. Kết quả khớp với locfeature.extract_features
+# khi dùng cùng một HomeRange.
+
+HOUR_NS = pd.Timedelta('1h').value
+HOURLY_COLUMNS = ['location-lat', 'location-long', 'speed', 'raw_accel']
+OUTPUT_COLUMNS = ['timestamp'] + FEATURE_COLUMNS + ['hour', 'is_night']
+
+
+def _window_stat(values, stat):
+    """Thống kê một cột trong một cửa sổ, cùng quy ước với groupby (rỗng = NaN)"""
+    if len(values) == 0:
+        return np.nan
+    if stat == 'mean':
+        return math.fsum(values) / len(values)
+    if stat == 'std':
+        return float(np.std(values, ddof=1)) if len(values) > 1 else np.nan
+    if stat == 'sum':
+        return math.fsum(values)
+    return float(getattr(np, stat)(values))
+
+
+class StreamingFeatureExtractor:
+    """
+    Trích xuất đặc trưng 2h trực tuyến.
+    home_range: HomeRange đã fit (home_range.py) dùng cho các cột KDE và centroid.
+    Một cửa sổ [w, w + 2h) được trả về khi giờ có dữ liệu đầu tiên sau w + 1h đã đóng
+    (cần để nội suy lưới 1h như batch); gọi flush() khi kết thúc luồng.
+    """
+
+    def __init__(self, home_range, window='2h', entropy_window=10, max_speed=MAX_SPEED_THRESHOLD,
+                 distance_method='vincenty'):
+        self.home_range = home_range
+        self.window_ns = pd.Timedelta(window).value
+        self.max_speed = max_speed
+        self.distance_method = distance_method
+
+        # Trạng thái fix
+        self._last_raw = None       # (timestamp ns, lat, long) fix trước (kể cả fix bị lọc)
+        self._last_kept = None      # (lat, long, speed, bearing) fix hợp lệ trước
+        self._kept_count = 0
+        self._last_kept_ts = None
+
+        # Trạng thái lưới 1h
+        self._hour = None
+        self._hour_values = [[] for _ in HOURLY_COLUMNS]
+        self._last_hour = None      # (giờ ns, giá trị trung bình) giờ có dữ liệu đã đóng
+        self._prev_hourly = None    # (lat, long, bearing) hàng 1h trước
+        self._entropy = SlidingEntropy(window=entropy_window)
+        self._speed_hist = deque(maxlen=8)
+        self._accel_hist = deque(maxlen=8)
+        self._finalized_hour = None
+
+        # Các cửa sổ 2h chưa đóng
+        self._windows = {}
+        self._next_window = None
+        self._ready = []
+
+        self.late_fixes = 0
+        self.max_pending_windows = 0
+
+    # ----- fix -----
+    def push(self, timestamp, lat, lon):
+        """Thêm một fix, trả về list các dòng đặc trưng vừa hoàn tất"""
+        return self.push_batch(pd.DataFrame({'timestamp': [pd.Timestamp(timestamp)],
+                                             'location-lat': [lat], 'location-long': [lon]}))
+
+    def push_batch(self, fixes):
+        """Thêm một lô fix theo thứ tự thời gian (cột timestamp, location-lat, location-long)"""
+        ts = pd.DatetimeIndex(fixes['timestamp']).asi8
+        lat = np.asarray(fixes['location-lat'], dtype=np.float64)
+        lon = np.asarray(fixes['location-long'], dtype=np.float64)
+
+        # Bỏ fix đến trễ (timestamp nhỏ hơn fix trước)
+        order_ok = np.ones(len(ts), dtype=bool)
+        last_ts = self._last_raw[0] if self._last_raw else None
+        for i, t in enumerate(ts):
+            if last_ts is not None and t < last_ts:
+                order_ok[i] = False
+                self.late_fixes += 1
+            else:
+                last_ts = t
+        ts, lat, lon = ts[order_ok], lat[order_ok], lon[order_ok]
+        if len(ts) == 0:
+            return self._take_ready()
+
+        # time_diff, dist, speed so với fix trước (như compute_kinematics)
+        if self._last_raw is None:
+            self._last_raw = (ts[0], lat[0], lon[0])
+            ts, lat, lon = ts[1:], lat[1:], lon[1:]
+        prev_ts = np.concatenate([[self._last_raw[0]], ts[:-1]])
+        prev_lat = np.concatenate([[self._last_raw[1]], lat[:-1]])
+        prev_lon = np.concatenate([[self._last_raw[2]], lon[:-1]])
+        if len(ts):
+            self._last_raw = (ts[-1], lat[-1], lon[-1])
+
+        time_diff = (ts - prev_ts) / 1e9 / 3600
+        dist = distance(prev_lat, prev_lon, lat, lon, method=self.distance_method)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speed = dist / time_diff
+        keep = (time_diff > 0) & (speed < self.max_speed)
+        ts, lat, lon = ts[keep], lat[keep], lon[keep]
+        time_diff, dist, speed = time_diff[keep], dist[keep], speed[keep]
+        if len(ts) == 0:
+            return self._take_ready()
+
+        # Gia tốc, bearing, turning angle so với fix hợp lệ trước
+        raw_accel = np.zeros(len(ts))
+        bearing = np.zeros(len(ts))
+        turning = np.zeros(len(ts))
+        for i in range(len(ts)):
+            if self._last_kept is not None:
+                p_lat, p_lon, p_speed, p_bearing = self._last_kept
+                accel = (speed[i] - p_speed) / time_diff[i]
+                raw_accel[i] = accel if np.isfinite(accel) else 0
+                bearing[i] = calculate_bearing(p_lat, p_lon, lat[i], lon[i])
+                if self._kept_count >= 2:
+                    turning[i] = abs(wrap_angle(bearing[i] - p_bearing))
+            self._last_kept = (lat[i], lon[i], speed[i], bearing[i])
+            self._kept_count += 1
+
+        # Các cột KDE và distance to centroid từ home range đã fit
+        timestamps = pd.to_datetime(ts)
+        coords = np.column_stack([lat, lon])
+        kept = pd.DataFrame({'timestamp': timestamps, 'location-lat': lat, 'location-long': lon,
+                             'step_length': dist, 'speed': speed, 'raw_accel': raw_accel,
+                             'bearing': bearing, 'turning_angle': turning})
+        for col, values in self.home_range.score(timestamps, coords).items():
+            kept[col] = values
+        kept['dist_to_centroid'] = distances_to_point(coords, self.home_range.centroid_,
+                                                      method=self.distance_method)
+        window_input = build_window_input(kept).to_dict('records')
+
+        for i in range(len(ts)):
+            self._add_fix(ts[i], window_input[i], (lat[i], lon[i], speed[i], raw_accel[i]))
+        return self._take_ready()
+
+    def _add_fix(self, ts, window_row, hourly_values):
+        window = ts - ts % self.window_ns
+        if self._next_window is None:
+            self._next_window = window
+        self._windows.setdefault(window, {'raw': [], 'hourly': []})['raw'].append(window_row)
+        self._last_kept_ts = ts
+
+        hour = ts - ts % HOUR_NS
+        if self._hour is not None and hour != self._hour:
+            self._close_hour()
+        self._hour = hour
+        for values, v in zip(self._hour_values, hourly_values):
+            values.append(v)
+        self.max_pending_windows = max(self.max_pending_windows, len(self._windows))
+
+    # ----- lưới 1h -----
+    def _close_hour(self):
+        """Đóng giờ hiện tại: nội suy các giờ trống trước đó rồi thêm hàng của giờ này"""
+        values = [math.fsum(v) / len(v) for v in self._hour_values]
+        if self._last_hour is not None:
+            last_hour, last_values = self._last_hour
+            n = (self._hour - last_hour) // HOUR_NS
+            for k in range(1, n):
+                interp = [float(np.interp(k, [0, n], [a, b])) for a, b in zip(last_values, values)]
+                self._hourly_row(last_hour + k * HOUR_NS, interp)
+        self._hourly_row(self._hour, values)
+        self._last_hour = (self._hour, values)
+        self._hour_values = [[] for _ in HOURLY_COLUMNS]
+
+    def _hourly_row(self, hour, values):
+        lat, lon, speed, accel = values
+        if self._prev_hourly is None:
+            bearing = float(np.degrees(np.arctan2(0.0, 0.0)))
+            turning = 0.0
+        else:
+            p_lat, p_lon, p_bearing = self._prev_hourly
+            bearing = float(np.degrees(np.arctan2(lon - p_lon, lat - p_lat)))
+            turning = abs(bearing - p_bearing)
+        self._prev_hourly = (lat, lon, bearing)
+
+        self._speed_hist.append(speed)
+        self._accel_hist.append(accel)
+        row = {'turning_entropy': self._entropy.push(turning)}
+        for name, hist in [('speed', self._speed_hist), ('accel', self._accel_hist)]:
+            for size in (4, 8):
+                recent = list(hist)[-size:]
+                row[f'{name}_roll_var_{size}h'] = (float(np.var(recent, ddof=1))
+                                                   if len(recent) == size else 0.0)
+
+        window = hour - hour % self.window_ns
+        self._windows.setdefault(window, {'raw': [], 'hourly': []})['hourly'].append(row)
+        self._finalized_hour = hour
+        self._emit_ready()
+
+    # ----- cửa sổ 2h -----
+    def _emit_ready(self, final=False):
+        if self._next_window is None:
+            return
+        if final:
+            last_window = self._last_kept_ts - self._last_kept_ts % self.window_ns
+            ready = lambda w: w <= last_window
+        else:
+            ready = lambda w: (self._finalized_hour is not None
+                               and w + self.window_ns - HOUR_NS <= self._finalized_hour)
+        while ready(self._next_window):
+            self._ready.append(self._finish_window(self._next_window))
+            self._next_window += self.window_ns
+
+    def _finish_window(self, window):
+        entry = self._windows.pop(window, {'raw': [], 'hourly': []})
+        row = {'timestamp': pd.Timestamp(window)}
+        for out, col, stat in RAW_WINDOW_STATS:
+            row[out] = _window_stat([r[col] for r in entry['raw']], stat)
+        for out, col, stat in HOURLY_WINDOW_STATS:
+            row[out] = _window_stat([r[col] for r in entry['hourly']], stat)
+        row['is_outside'] = int(row['is_outside'] > 0)
+        for key, value in row.items():
+            if key != 'timestamp' and pd.isna(value):
+                row[key] = 0
+        row['kde_very_low_prob_count'] = int(row['kde_very_low_prob_count'])
+        row['hour'] = row['timestamp'].hour
+        row['is_night'] = int(row['hour'] >= 18 or row['hour'] <= 6)
+        return {col: row[col] for col in OUTPUT_COLUMNS}
+
+    def _take_ready(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def flush(self):
+        """Kết thúc luồng: đóng giờ đang gộp và trả về mọi cửa sổ còn lại"""
+        if self._hour is not None and self._hour_values[0]:
+            self._close_hour()
+        self._emit_ready(final=True)
+        return self._take_ready()
+
+    @staticmethod
+    def to_frame(rows):
+        return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+if __name__ == '__main__':
+    import time
+    from kde_engine import KDE_ENGINES
+    from home_range import HomeRange
+    from locfeature import load_collar, compute_kinematics, extract_features
+
+    parser = argparse.ArgumentParser(description='Phát lại file Movebank qua streaming và so sánh với batch')
+    parser.add_argument('--kde-engine', choices=KDE_ENGINES, default='exact')
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    raw = load_collar()
+    batch_feat, _ = extract_features(raw.copy(), kde_engine=args.kde_engine)
+    batch_feat = batch_feat.fillna(0).reset_index()
+
+    home_range = HomeRange(engine=args.kde_engine).fit(compute_kinematics(raw.copy()))
+    extractor = StreamingFeatureExtractor(home_range)
+
+    t0 = time.perf_counter()
+    rows = []
+    for start in range(0, len(raw), args.batch_size):
+        rows.extend(extractor.push_batch(raw.iloc[start:start + args.batch_size]))
+    rows.extend(extractor.flush())
+    elapsed = time.perf_counter() - t0
+    stream_feat = StreamingFeatureExtractor.to_frame(rows)
+
+    print(f"\n⏱️ Streaming {len(raw)} fixes -> {len(stream_feat)} cửa sổ trong {elapsed:.2f}s "
+          f"(tối đa {extractor.max_pending_windows} cửa sổ chờ)")
+    print(f"Batch: {len(batch_feat)} cửa sổ")
+    same_index = len(stream_feat) == len(batch_feat) and (stream_feat['timestamp'] == batch_feat['timestamp']).all()
+    print(f"Cùng lưới cửa sổ: {same_index}")
+    if same_index:
+        for col in OUTPUT_COLUMNS[1:]:
+            diff = np.max(np.abs(stream_feat[col].values.astype(float) - batch_feat[col].values.astype(float)))
+            print(f"  {col:>26}: max abs diff = {diff:.3g}")
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geodist import max_deviation_from_geopy, step_distances
+
+COLLAR_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'Elephant Research - Ivory Coast - Collar 1630.csv')
+
+
+@pytest.fixture(scope='module')
+def coords():
+    df = pd.read_csv(COLLAR_CSV, usecols=['timestamp', 'location-lat', 'location-long'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values('timestamp')[['location-lat', 'location-long']].values
+
+
+def test_vincenty_matches_geopy(coords):
+    assert max_deviation_from_geopy(coords, method='vincenty') <= 1e-3
+
+
+def test_haversine_close_to_geopy(coords):
+    from geopy.distance import geodesic
+
+    ref = np.array([0.0] + [geodesic(coords[i - 1], coords[i]).meters for i in range(1, len(coords))])
+    fast = step_distances(coords, method='haversine')
+    # hình cầu vs ellipsoid: sai số tương đối < 1% (~0.55% với bước bắc - nam gần xích đạo)
+    assert np.all(np.abs(fast - ref) <= 1e-2 * ref + 1e-6)
+
+
+def test_zero_and_single_point():
+    assert step_distances(np.array([[5.0, -4.0], [5.0, -4.0]])).tolist() == [0.0, 0.0]
+    assert step_distances(np.array([[5.0, -4.0]])).tolist() == [0.0]
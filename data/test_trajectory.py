@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from trajectory import SlidingEntropy, check_against_reference, check_entropy_against_rolling
+
+COLLAR_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'Elephant Research - Ivory Coast - Collar 1630.csv')
+
+
+def test_bearings_match_reference_on_collar():
+    df = pd.read_csv(COLLAR_CSV, usecols=['timestamp', 'location-lat', 'location-long'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    assert check_against_reference(df.sort_values('timestamp')) == (0.0, 0.0)
+
+
+def test_bearings_match_reference_with_nan_and_wrap_around():
+    # bearing đi qua ±180 (wrap-around), quay đầu 180 độ, điểm trùng và NaN
+    lat = [0.0, 0.0, -0.001, 0.0, 0.001, 0.001, 0.001, np.nan, 0.002, 0.002, 0.0, 0.001]
+    lon = [0.0, -0.001, -0.001, -0.002, -0.002, -0.001, -0.001, 0.0, 0.0, np.nan, 0.001, 0.0]
+    df = pd.DataFrame({'location-lat': lat, 'location-long': lon})
+    assert check_against_reference(df) == (0.0, 0.0)
+
+
+def test_sliding_entropy_matches_rolling_apply_bit_for_bit():
+    rng = np.random.default_rng(0)
+    for window in (1, 3, 10, 25):
+        values = rng.uniform(-10, 370, 5000)
+        values[rng.random(5000) < 0.1] = np.nan
+        values[rng.random(5000) < 0.05] = 360
+        values[rng.random(5000) < 0.05] = 0
+        assert check_entropy_against_rolling(values, window=window) == 0.0
+        assert check_entropy_against_rolling(values, window=window, min_periods=min(3, window)) == 0.0
+
+
+def test_sliding_entropy_memory_is_bounded():
+    sliding = SlidingEntropy(window=10)
+    for angle in np.random.default_rng(1).uniform(0, 360, 20000):
+        sliding.push(angle)
+    assert len(sliding._cache) <= SlidingEntropy.CACHE_SIZE
+    assert len(sliding.state()) == 10
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# ===== ĐƯỜNG CONG NGƯỠNG: PRECISION / RECALL / F1 CHO MỌI NGƯỠNG =====
+# Sắp xếp điểm một lần (O(n log n)), cộng dồn TP / FP theo thứ tự giảm dần: mỗi giá trị
+# điểm khác nhau là một ngưỡng (dự đoán 1 khi score >= ngưỡng), không cần gọi f1_score
+# cho từng ngưỡng. Với số phiếu rời rạc 0..N_TREES (mỗi cây trả 0/1 như rf_predict trên
+# FPGA) chỉ cần bincount. File đường cong (CSV, cột kind = probability / votes) được
+# training ghi ra và bước xuất C++ đọc lại để chọn VOTE_REQUIRED.
+
+CURVE_COLUMNS = ['kind', 'threshold', 'tp', 'fp', 'fn', 'tn', 'precision', 'recall', 'f1']
+
+
+def _curve_frame(kind, thresholds, tp, fp, n_pos, n_neg):
+    tp = np.asarray(tp, dtype=np.int64)
+    fp = np.asarray(fp, dtype=np.int64)
+    fn, tn = n_pos - tp, n_neg - fp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # như sklearn (zero_division=0): mẫu số 0 -> 0
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(n_pos > 0, tp / max(n_pos, 1), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    return pd.DataFrame({'kind': kind, 'threshold': thresholds, 'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+                         'precision': precision, 'recall': recall, 'f1': f1})
+
+
+def threshold_curve(y_true, scores):
+    """
+    Confusion counts / precision / recall / F1 tại mọi ngưỡng khác nhau (score >= ngưỡng -> 1),
+    ngưỡng giảm dần; dòng đầu ngưỡng +inf (không dự đoán 1 nào).
+    """
+    y = np.asarray(y_true).astype(bool)
+    s = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-s, kind='mergesort')
+    s_sorted, y_sorted = s[order], y[order]
+    tp_cum = np.cumsum(y_sorted)
+    fp_cum = np.cumsum(~y_sorted)
+    last = np.r_[np.flatnonzero(np.diff(s_sorted)), len(s) - 1]   # vị trí cuối của mỗi giá trị
+    n_pos = int(y.sum())
+    return _curve_frame('probability', np.r_[np.inf, s_sorted[last]], np.r_[0, tp_cum[last]],
+                        np.r_[0, fp_cum[last]], n_pos, len(y) - n_pos)
+
+
+def vote_curve(y_true, votes, n_trees):
+    """Đường cong theo số phiếu: dòng k = dự đoán 1 khi votes >= k, k = 0..n_trees + 1"""
+    y = np.asarray(y_true).astype(bool)
+    votes = np.asarray(votes, dtype=np.int64)
+    pos = np.bincount(votes[y], minlength=n_trees + 1)
+    neg = np.bincount(votes[~y], minlength=n_trees + 1)
+    # số mẫu có votes >= k: cộng dồn từ cuối
+    tp = np.r_[np.cumsum(pos[::-1])[::-1], 0]
+    fp = np.r_[np.cumsum(neg[::-1])[::-1], 0]
+    return _curve_frame('votes', np.arange(n_trees + 2), tp, fp, int(y.sum()), int((~y).sum()))
+
+
+def curve_at(curve, thresholds):
+    """Các dòng của đường cong probability tương ứng ngưỡng bất kỳ (score >= t), O(m log n)"""
+    asc = curve['threshold'].to_numpy()[::-1]
+    idx = len(asc) - 1 - np.searchsorted(asc, np.asarray(thresholds, dtype=np.float64), side='left')
+    rows = curve.iloc[idx].reset_index(drop=True)
+    rows['threshold'] = thresholds
+    return rows
+
+
+def best_row(curve):
+    """Dòng có F1 cao nhất (hòa thì lấy dòng đầu tiên, như np.argmax)"""
+    return curve.iloc[int(np.argmax(curve['f1'].to_numpy()))]
+
+
+def forest_votes(rf, X):
+    """Số cây bỏ phiếu lớp 1 (mỗi cây trả lớp đa số của lá, như từng tree_i trong rf_inference.cpp)"""
+    X = np.asarray(X, dtype=np.float32)
+    positive = list(rf.classes_).index(1)
+    return np.sum([est.predict(X) == positive for est in rf.estimators_], axis=0)
+
+
+def probability_to_votes(threshold, n_trees):
+    """Số phiếu tối thiểu để votes / n_trees >= threshold"""
+    return int(np.ceil(threshold * n_trees - 1e-9))
+
+
+def write_curve(path, *curves):
+    pd.concat(curves, ignore_index=True)[CURVE_COLUMNS].to_csv(path, index=False, float_format='%.6g')
+
+
+def read_curve(path, kind=None):
+    curve = pd.read_csv(path)
+    if kind is not None:
+        curve = curve[curve['kind'] == kind].reset_index(drop=True)
+    return curve
@@ -1,7 +1,8 @@
+import os
+import sys
+import time
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
 from importlib import reload
 
@@ -15,10 +16,28 @@ from sklearn.pipeline import Pipeline as SklearnPipeline
 from imblearn.pipeline import Pipeline as ImbPipeline
 from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
+from columnar import read_table
+from fast_search import FastSearchCV
+from threshold_curve import (threshold_curve, vote_curve, curve_at, best_row, forest_votes,
+                             probability_to_votes, write_curve)
+
+# class goi model dung chung voi model/ (model/detector.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+from detector import ElephantAnomalyDetector
+
+# Biểu đồ chỉ được vẽ khi chạy với --plot (mặc định headless, không import matplotlib/seaborn)
+SHOW_PLOTS = '--plot' in sys.argv[1:]
+if SHOW_PLOTS:
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+# Tìm siêu tham số: mặc định GridSearchCV; --fast-search: cache resample theo fold + warm_start
+# (cùng kết quả, nhanh hơn); --halving: successive halving theo n_estimators
+SEARCH_STRATEGY = 'halving' if '--halving' in sys.argv[1:] else 'grid' if '--fast-search' in sys.argv[1:] else None
 
 # 1. Đọc và chuẩn bị dữ liệu
 print("⏳ Đang tải dữ liệu...")
-df = pd.read_csv('elephant_6features_cleaned.csv')
+df = read_table('elephant_6features_cleaned')
 
 # Tách Feature (X) và Target (y)
 X = df.drop(columns=['is_outside'])
@@ -61,18 +80,32 @@ param_grid = {
 }
 
 # 5. Chạy GridSearchCV
-print("\n⏳ Đang chạy GridSearchCV (5-Fold CV)... quá trình này có thể mất vài phút.")
 # scoring='f1_macro' để cân bằng giữa độ chính xác của lớp 0 và lớp 1
-grid_search = GridSearchCV(
-    estimator=pipeline,
-    param_grid=param_grid,
-    cv=5,
-    scoring='f1_macro',
-    n_jobs=-1,
-    verbose=1
-)
+search_start = time.perf_counter()
+if SEARCH_STRATEGY is None:
+    print("\n⏳ Đang chạy GridSearchCV (5-Fold CV)... quá trình này có thể mất vài phút.")
+    grid_search = GridSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        cv=5,
+        scoring='f1_macro',
+        n_jobs=-1,
+        verbose=1
+    )
+else:
+    print(f"\n⏳ Đang chạy FastSearchCV ({SEARCH_STRATEGY}, 5-Fold CV, resample cache + warm_start)...")
+    grid_search = FastSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        cv=5,
+        scoring='f1_macro',
+        strategy=SEARCH_STRATEGY,
+        n_jobs=-1
+    )
 
 grid_search.fit(X_train, y_train)
+print(f"⏱️ Thời gian tìm kiếm: {time.perf_counter() - search_start:.1f}s "
+      f"({len(grid_search.cv_results_['params'])} ứng viên)")
 
 # 6. Kết quả tốt nhất
 best_model = grid_search.best_estimator_
@@ -103,34 +136,30 @@ importances = rf_best.feature_importances_
 feature_names = X.columns
 indices = np.argsort(importances)[::-1]
 
-plt.figure(figsize=(12, 6))
-plt.title("Feature Importance (Random Forest)")
-plt.bar(range(X.shape[1]), importances[indices], align="center")
-plt.xticks(range(X.shape[1]), feature_names[indices], rotation=90)
-plt.tight_layout()
-plt.show()
-
-# Biểu đồ Confusion Matrix
-plt.figure(figsize=(6, 5))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
-plt.title('Confusion Matrix')
-plt.ylabel('Thực tế (True)')
-plt.xlabel('Dự đoán (Predicted)')
-plt.show()
+if SHOW_PLOTS:
+    plt.figure(figsize=(12, 6))
+    plt.title("Feature Importance (Random Forest)")
+    plt.bar(range(X.shape[1]), importances[indices], align="center")
+    plt.xticks(range(X.shape[1]), feature_names[indices], rotation=90)
+    plt.tight_layout()
+    plt.show()
+
+    # Biểu đồ Confusion Matrix
+    plt.figure(figsize=(6, 5))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
+    plt.title('Confusion Matrix')
+    plt.ylabel('Thực tế (True)')
+    plt.xlabel('Dự đoán (Predicted)')
+    plt.show()
 
 #giai thuat tim threshold toi uu cho model de dat f1-score cao nhat
 print("\n" + "="*40)
 print("TÌM THRESHOLD TỐI ƯU...")
 
+# Đường cong F1 cho mọi ngưỡng khác nhau (sắp xếp một lần), rồi tra tại lưới 0.01 -> 0.99
+curve = threshold_curve(y_test, y_prob)
 thresholds = np.arange(0.01, 1.0, 0.01) # Quét từ 0.01 đến 0.99
-f1_scores = []
-
-for t in thresholds:
-    # Nếu xác suất >= t thì gán là 1, ngược lại là 0
-    y_pred_temp = (y_prob >= t).astype(int)
-    # Tính F1 cho lớp 1 (lớp quan trọng)
-    score = f1_score(y_test, y_pred_temp) 
-    f1_scores.append(score)
+f1_scores = curve_at(curve, thresholds)['f1'].to_numpy()
 
 # Lấy ngưỡng có F1 cao nhất
 best_idx = np.argmax(f1_scores)
@@ -139,6 +168,19 @@ best_f1 = f1_scores[best_idx]
 
 print(f"✅ Threshold tốt nhất: {best_threshold:.2f}")
 print(f"✅ F1-Score cao nhất đạt được: {best_f1:.4f}")
+exact_best = best_row(curve)
+print(f"   (ngưỡng tối ưu trên toàn đường cong: {exact_best['threshold']:.4f}, F1={exact_best['f1']:.4f})")
+
+# Đường cong theo số phiếu (mỗi cây 0/1 như trên phần cứng) -> VOTE_REQUIRED tương ứng
+n_trees = len(rf_best.estimators_)
+votes = vote_curve(y_test, forest_votes(rf_best, X_test), n_trees)
+vote_required = probability_to_votes(best_threshold, n_trees)
+best_votes = best_row(votes)
+print(f"✅ Số phiếu tương ứng threshold {best_threshold:.2f}: {vote_required}/{n_trees} "
+      f"(F1={votes['f1'].iloc[vote_required]:.4f}); tốt nhất: {int(best_votes['threshold'])}/{n_trees} "
+      f"(F1={best_votes['f1']:.4f})")
+write_curve('threshold_curve.csv', curve, votes)
+print("💾 Đã lưu đường cong: threshold_curve.csv")
 
 # Áp dụng ngưỡng mới để dự đoán lại
 y_pred_optimized = (y_prob >= best_threshold).astype(int)
@@ -156,31 +198,23 @@ print(cm_opt)
 print("="*40)
 
 # Biểu đồ Confusion Matrix sau khi tối ưu
-plt.figure(figsize=(6, 5))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
-plt.title('Confusion Matrix sau tối ưu Threshold')
-plt.ylabel('Thực tế (True)')
-plt.xlabel('Dự đoán (Predicted)')
-plt.show()
+if SHOW_PLOTS:
+    plt.figure(figsize=(6, 5))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False)
+    plt.title('Confusion Matrix sau tối ưu Threshold')
+    plt.ylabel('Thực tế (True)')
+    plt.xlabel('Dự đoán (Predicted)')
+    plt.show()
 
 #xuat file model 
 reload(joblib)
-#tao class de khi load model o file py khac thi phai copy class vao file do truoc khi load, neu ko se bi loi
-class ElephantAnomalyDetector:
-    def __init__ (self, model, threshold):
-        self.model = model
-        self.threshold = threshold
-
-    def predict(self, X):
-        self.model.predict_proba(X)[:, 1]
-        return (y_prob >= self.threshold).astype(int)
-
-    def predict_proba(self, X):
-        return self.model.predict_proba(X)
-
+# dung chung class voi model/ (model/detector.py): predict theo dung X truyen vao, chon cot theo
+# feature_names va chay tren forest bien dich (cung ket qua voi sklearn). Cac buoc SMOTE /
+# UnderSampler ko tac dong khi predict nen chi luu forest.
 final_model_package = ElephantAnomalyDetector(
-    model = best_model,
-    threshold = best_threshold
+    model = rf_best,
+    threshold = best_threshold,
+    feature_names = list(X.columns)
 ) 
 print('Xuat file model')
 filename = 'model.pkl'
@@ -201,4 +235,5 @@ print(f"F1-Score sau khi load lại: {f1_new:.4f}")
 
 if f1_new == best_f1:
     print("Model load lai y het nhu train")
+else:
     print("Kết quả không khớp.")
@@ -0,0 +1,221 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# ===== BEARING VÀ TURNING ANGLE VECTOR HÓA =====
+# Tính trên mảng dịch (shifted arrays) thay cho vòng lặp df.iloc[i-1] / df.iloc[i].
+
+
+def calculate_bearing(lat1, lon1, lat2, lon2):
+    """Tính bearing giữa 2 điểm"""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    bearing = np.arctan2(y, x)
+    return np.degrees(bearing) % 360
+
+
+def compute_bearings(lat, lon):
+    """Bearing từ điểm i-1 tới điểm i, điểm đầu = 0"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    bearings = np.zeros(len(lat))
+    if len(lat) > 1:
+        bearings[1:] = calculate_bearing(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    return bearings
+
+
+def wrap_angle(angle_diff):
+    """Chuẩn hóa hiệu góc (độ) về [-180, 180] bằng wrap-around modulo 360"""
+    angle_diff = np.asarray(angle_diff, dtype=np.float64)
+    # Chỉ dịch các giá trị nằm ngoài [-180, 180] (bội số 360 gần nhất),
+    # giá trị trong khoảng giữ nguyên từng bit như if/else cũ
+    out_of_range = (angle_diff > 180) | (angle_diff < -180)
+    return np.where(out_of_range, angle_diff - 360 * np.round(angle_diff / 360), angle_diff)
+
+
+def compute_turning_angles(bearings):
+    """|Turning angle| giữa 2 bearing liên tiếp, 2 điểm đầu = 0"""
+    bearings = np.asarray(bearings, dtype=np.float64)
+    turning = np.zeros(len(bearings))
+    if len(bearings) > 2:
+        turning[2:] = np.abs(wrap_angle(bearings[2:] - bearings[1:-1]))
+    return turning
+
+
+def _reference_bearings_and_turning(df):
+    """Cài đặt cũ (vòng lặp iloc) - chỉ dùng để kiểm tra hồi quy"""
+    bearings = [0]
+    for i in range(1, len(df)):
+        bearings.append(calculate_bearing(
+            df.iloc[i-1]['location-lat'], df.iloc[i-1]['location-long'],
+            df.iloc[i]['location-lat'], df.iloc[i]['location-long']
+        ))
+
+    turning_angles = [0, 0]
+    for i in range(2, len(df)):
+        angle_diff = bearings[i] - bearings[i-1]
+        if angle_diff > 180:
+            angle_diff -= 360
+        elif angle_diff < -180:
+            angle_diff += 360
+        turning_angles.append(abs(angle_diff))
+
+    return np.array(bearings, dtype=np.float64), np.array(turning_angles, dtype=np.float64)
+
+
+def check_against_reference(df):
+    """So sánh bản vector hóa với vòng lặp iloc cũ, trả về sai lệch lớn nhất"""
+    ref_bearing, ref_turning = _reference_bearings_and_turning(df)
+    bearing = compute_bearings(df['location-lat'].values, df['location-long'].values)
+    turning = compute_turning_angles(bearing)
+    return _max_deviation(bearing, ref_bearing), _max_deviation(turning, ref_turning)
+
+
+def _max_deviation(out, ref):
+    """Sai lệch lớn nhất; NaN cùng vị trí coi như khớp, khác vị trí = inf"""
+    if not np.array_equal(np.isnan(out), np.isnan(ref)):
+        return np.inf
+    return float(np.max(np.abs(np.nan_to_num(out) - np.nan_to_num(ref)), initial=0.0))
+
+
+# ===== TURNING ENTROPY CỬA SỔ TRƯỢT =====
+def histogram_entropy(counts):
+    """Entropy (log2) từ số đếm bin, đúng biểu thức của entropy_safe (khớp từng bit)"""
+    counts = np.asarray(counts)
+    p = counts / counts.sum()
+    p = p[p > 0]
+    return -np.sum(p * np.log2(p))
+
+
+def entropy_safe(x):
+    """Entropy histogram 36 bin trên [0, 360] của một cửa sổ, bỏ NaN (dùng cho rolling(...).apply)"""
+    x = np.asarray(x, dtype=np.float64)
+    x = x[~np.isnan(x)]
+    if len(x) == 0:
+        return 0
+    counts, _ = np.histogram(x, bins=36, range=(0, 360))
+    if counts.sum() == 0:
+        return 0
+    return histogram_entropy(counts)
+
+
+class SlidingEntropy:
+    """
+    Entropy (log2) của histogram turning angle trên cửa sổ trượt, tương đương
+    rolling(window, min_periods).apply(entropy_safe). Số đếm bin và khóa nguyên của vector
+    số đếm (cơ số window + 1) được cập nhật O(1) khi một góc vào / ra cửa sổ; entropy tính
+    bằng histogram_entropy (khớp từng bit với entropy_safe) và nhớ trong một LRU giới hạn
+    CACHE_SIZE khóa -> trạng thái O(window + bins + CACHE_SIZE), không phụ thuộc độ dài lịch sử.
+    """
+
+    CACHE_SIZE = 4096
+
+    def __init__(self, window=10, bins=36, value_range=(0, 360), min_periods=1):
+        self.window = window
+        self.bins = bins
+        self.min_periods = min_periods
+        self.edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        self._weights = [(window + 1) ** b for b in range(bins)]
+        self._cache = OrderedDict()
+        self.reset()
+
+    def reset(self):
+        self._buffer = deque()
+        self._counts = [0] * self.bins
+        self._total = 0   # số góc nằm trong value_range
+        self._valid = 0   # số góc không phải NaN
+        self._key = 0
+
+    def bin_indices(self, values):
+        """Chỉ số bin giống np.histogram; -1 = ngoài khoảng, -2 = NaN"""
+        values = np.asarray(values, dtype=np.float64)
+        idx = np.searchsorted(self.edges, values, side='right') - 1
+        idx = np.where(values == self.edges[-1], self.bins - 1, idx)
+        idx = np.where((values < self.edges[0]) | (values > self.edges[-1]), -1, idx)
+        return np.where(np.isnan(values), -2, idx)
+
+    def _add(self, b, sign):
+        if b != -2:
+            self._valid += sign
+        if b >= 0:
+            self._counts[b] += sign
+            self._total += sign
+            self._key += sign * self._weights[b]
+
+    def push_bin(self, b):
+        """Thêm một góc (đã đổi sang chỉ số bin), bỏ góc cũ nhất nếu cửa sổ đầy"""
+        self._buffer.append(b)
+        self._add(b, 1)
+        if len(self._buffer) > self.window:
+            self._add(self._buffer.popleft(), -1)
+        return self.value()
+
+    def push(self, angle):
+        return self.push_bin(int(self.bin_indices([angle])[0]))
+
+    def value(self):
+        if self._valid < self.min_periods:
+            return np.nan
+        if self._total == 0:
+            return 0.0
+        entropy = self._cache.get(self._key)
+        if entropy is None:
+            entropy = self._cache[self._key] = histogram_entropy(self._counts)
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(self._key)
+        return entropy
+
+    def state(self):
+        """Trạng thái tối thiểu để tiếp tục ở lần chạy / chunk sau"""
+        return list(self._buffer)
+
+    def restore(self, buffer):
+        self.reset()
+        for b in buffer:
+            self.push_bin(b)
+
+
+def check_entropy_against_rolling(values, window=10, min_periods=1):
+    """So sánh rolling_entropy với rolling(window).apply(entropy_safe), trả về sai lệch lớn nhất"""
+    import pandas as pd
+    ref = pd.Series(values, dtype=np.float64).rolling(window, min_periods=min_periods).apply(
+        entropy_safe, raw=True).to_numpy()
+    return _max_deviation(rolling_entropy(values, window=window, min_periods=min_periods), ref)
+
+
+def rolling_entropy(values, window=10, bins=36, value_range=(0, 360), min_periods=1):
+    """Turning entropy trượt cho cả mảng (thay rolling(window).apply(entropy_safe))"""
+    sliding = SlidingEntropy(window=window, bins=bins, value_range=value_range,
+                             min_periods=min_periods)
+    return np.array([sliding.push_bin(b) for b in sliding.bin_indices(values).tolist()],
+                    dtype=np.float64)
+
+
+if __name__ == '__main__':
+    import time
+    import pandas as pd
+
+    df = pd.read_csv('Elephant Research - Ivory Coast - Collar 1630.csv',
+                     usecols=['timestamp', 'location-lat', 'location-long'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values('timestamp')
+
+    t0 = time.perf_counter()
+    compute_turning_angles(compute_bearings(df['location-lat'].values, df['location-long'].values))
+    elapsed = time.perf_counter() - t0
+    bearing_dev, turning_dev = check_against_reference(df)
+    print(f"Vectorized: {elapsed * 1000:.1f} ms")
+    print(f"Max deviation vs iloc loop: bearing={bearing_dev}, turning_angle={turning_dev}")
+
+    turning = compute_turning_angles(compute_bearings(df['location-lat'].values, df['location-long'].values))
+    t0 = time.perf_counter()
+    rolling_entropy(turning, window=10)
+    elapsed = time.perf_counter() - t0
+    entropy_dev = check_entropy_against_rolling(turning, window=10)
+    if entropy_dev != 0.0:
+        raise AssertionError(f"❌ Sliding entropy lệch rolling.apply(entropy_safe): {entropy_dev}")
+    print(f"Sliding entropy: {elapsed * 1000:.1f} ms, khớp từng bit với rolling.apply(entropy_safe)")
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+# ===== GỘP THỐNG KÊ THEO CỬA SỔ THỜI GIAN TRONG MỘT LƯỢT =====
+# Chỉ số cửa sổ (bin) được tính một lần từ timestamp; mọi thống kê (mean/std/min/max/
+# median/sum) của mọi cột được tính trong cùng một groupby trên chỉ số đó, thay cho
+# nhiều resample('2h') riêng lẻ + lambda + reindex.
+
+
+def window_codes(timestamps, freq='2h'):
+    """
+    Chỉ số cửa sổ cho từng timestamp và lưới cửa sổ đầy đủ (kể cả cửa sổ rỗng),
+    cùng quy ước với df.resample(freq) (cửa sổ [t, t + freq), căn theo nửa đêm).
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    starts = timestamps.floor(freq)
+    bins = pd.date_range(starts.min(), starts.max(), freq=freq, name='timestamp')
+    step = pd.Timedelta(freq).value
+    codes = (starts.asi8 - bins[0].value) // step
+    return codes, bins
+
+
+def aggregate_windows(frame, timestamps, specs, freq='2h', bins=None):
+    """
+    frame: DataFrame các cột nguồn (cùng thứ tự với timestamps).
+    specs: list (tên cột đầu ra, cột nguồn, thống kê) với thống kê là tên hàm groupby
+           ('mean', 'std', 'min', 'max', 'median', 'sum', 'count').
+    Trả về DataFrame theo lưới cửa sổ (bins), cửa sổ rỗng = NaN.
+    """
+    codes, own_bins = window_codes(timestamps, freq)
+    if bins is None:
+        bins = own_bins
+    else:
+        # Dịch chỉ số sang lưới bins được truyền vào
+        codes = codes + (own_bins[0] - bins[0]) // pd.Timedelta(freq)
+
+    grouped = pd.DataFrame(frame).reset_index(drop=True).groupby(codes, sort=True)
+    result = grouped.agg(**{out: (col, stat) for out, col, stat in specs})
+    result = result.reindex(np.arange(len(bins)))
+    result.index = bins
+    return result
@@ -0,0 +1,170 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# forest "bien dich" thanh cac mang NumPy lien tuc (giong cach rf_inference.cpp trai phang cac cay):
+# feature / threshold / children / value cua moi node, moi cay noi tiep nhau, chi so node toan cuc.
+# duyet vector hoa tren ca (dong, cay): moi buoc do sau la vai phep gather + so sanh tren mang
+# (n_dong, n_cay), ko qua lop kiem tra input / thread pool cua sklearn -> nhanh khi cham 1 cua so 2h.
+# nhu sklearn: X ep float32, x <= threshold di nhanh trai, xac suat cong don theo thu tu cay.
+# threshold float64 cua sklearn duoc lam tron XUONG float32: voi x float32,
+# x <= t  <=>  x <= (float32 lon nhat <= t), nen so sanh van dung tung bit ma mang nho bang nua.
+
+CHUNK_ROWS = 512   # so dong moi lan duyet (mang (dong, cay) nam gon trong cache)
+
+
+def _floor_float32(values):
+    """float32 lon nhat <= values"""
+    down = values.astype(np.float32)
+    above = down.astype(np.float64) > values
+    down[above] = np.nextafter(down[above], np.float32(-np.inf))
+    return down
+
+
+class CompiledForest:
+    """
+    children[node] = [phai, trai] (chi so = 2 * node + (x <= threshold)); la: ca hai = chinh no.
+    value: xac suat lop tai moi node (n_node, n_lop); feature_names / decision_threshold de predict
+    giong detector.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes,
+                 feature_names=None, decision_threshold=0.5):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.feature_names = feature_names
+        self.decision_threshold = decision_threshold
+
+    @classmethod
+    def from_sklearn(cls, rf, feature_names=None, threshold=0.5):
+        """gom cac cay cua RandomForestClassifier thanh mang phang"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in rf.estimators_:
+            tree = est.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            roots.append(offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            children.append(np.column_stack([np.where(leaf, nodes, tree.children_right),
+                                             np.where(leaf, nodes, tree.children_left)]) + offset)
+            values.append(tree.value[:, 0, :])
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+        if feature_names is None and hasattr(rf, 'feature_names_in_'):
+            feature_names = list(rf.feature_names_in_)
+        return cls(np.concatenate(features).astype(np.intp), _floor_float32(np.concatenate(thresholds)),
+                   np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+                   np.ascontiguousarray(np.concatenate(values)), np.asarray(roots, dtype=np.intp),
+                   max_depth, np.asarray(rf.classes_), feature_names, threshold)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _matrix(self, X):
+        if hasattr(X, 'columns') and self.feature_names is not None:   # DataFrame (ko can import pandas)
+            # chon cot qua pandas ton ~0.5 ms: bo qua khi cot da dung thu tu
+            if list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def _apply(self, X):
+        n, n_features = X.shape
+        flat, children = X.ravel(), self.children.ravel()
+        base = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        idx = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = flat[base + self.feature[idx]] <= self.threshold[idx]
+            idx = children[2 * idx + go_left]
+        return idx
+
+    def apply(self, X):
+        """node la cua moi (dong, cay), shape (n_dong, n_cay)"""
+        X = self._matrix(X)
+        if len(X) <= CHUNK_ROWS:
+            return self._apply(X)
+        return np.concatenate([self._apply(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)])
+
+    def predict_proba(self, X):
+        leaf_values = self.value[self.apply(X)]          # (n_dong, n_cay, n_lop)
+        # cong don tung cay theo thu tu (cumsum tuan tu) de khop tung bit voi sklearn
+        return np.cumsum(leaf_values, axis=1)[:, -1, :] / self.n_trees
+
+    def predict(self, X):
+        """nhan 0/1 theo nguong da luu (xac suat lop 1 >= decision_threshold)"""
+        prob = self.predict_proba(X)[:, list(self.classes_).index(1)]
+        return (prob >= self.decision_threshold).astype(int)
+
+    def votes(self, X):
+        """so cay bo phieu lop 1 (lop da so cua la, nhu tung tree_i tren FPGA)"""
+        leaf_values = self.value[self.apply(X)]
+        return (leaf_values.argmax(axis=2) == list(self.classes_).index(1)).sum(axis=1)
+
+
+def _best_of(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def benchmark(detector, X, single_rows=200, repeat=3):
+    """do tre 1 dong va thong luong batch: sklearn (qua detector) vs forest bien dich"""
+    import pandas as pd
+    compiled = detector.compile()
+    rows = []
+    sk_prob, sk_batch = _best_of(lambda: detector.model.predict_proba(X[detector.feature_names]), repeat)
+    cf_prob, cf_batch = _best_of(lambda: compiled.predict_proba(X), repeat)
+    singles = [X.iloc[[i]] for i in range(min(single_rows, len(X)))]
+    _, sk_single = _best_of(lambda: [detector.model.predict_proba(r[detector.feature_names]) for r in singles], 1)
+    _, cf_single = _best_of(lambda: [compiled.predict_proba(r) for r in singles], 1)
+    for name, batch, single in [('sklearn', sk_batch, sk_single), ('compiled', cf_batch, cf_single)]:
+        rows.append({'engine': name, 'single_row_us': single / len(singles) * 1e6,
+                     'batch_rows_per_s': len(X) / batch})
+    sk_label = (sk_prob[:, list(compiled.classes_).index(1)] >= detector.threshold).astype(int)
+    identical = np.array_equal(sk_prob, cf_prob) and np.array_equal(sk_label, detector.predict(X))
+    return pd.DataFrame(rows), identical
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+    from columnar import read_table
+    from detector import load_detector
+
+    parser = argparse.ArgumentParser(description='So sanh forest bien dich (mang NumPy) voi sklearn')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--data', default=os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
+    parser.add_argument('--single-rows', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    detector = load_detector(args.model)
+    X = read_table(args.data).drop(columns=['is_outside'], errors='ignore')
+    compiled = detector.compile()
+    print(f"Forest bien dich: {compiled.n_trees} cay, {compiled.n_nodes} node, do sau {compiled.max_depth}")
+    report, identical = benchmark(detector, X, single_rows=args.single_rows)
+    print(report.to_string(index=False, float_format=lambda v: f'{v:,.1f}'))
+    if not identical:
+        raise AssertionError("❌ Ket qua forest bien dich khac sklearn")
+    print(f"✅ Xac suat va nhan giong het sklearn tren {len(X)} mau")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import sys
+
+import joblib
+
+from compiled_forest import CompiledForest
+
+
+# goi model + nguong + thu tu feature, dung chung cho training va cac script doc lai file .pkl
+# (class nam trong module rieng nen joblib.load duoc tu bat ky script nao, ko chi __main__)
+# predict / predict_proba chay tren forest bien dich (mang NumPy, ket qua giong het sklearn)
+class ElephantAnomalyDetector:
+    def __init__(self, model, threshold, feature_names):
+        self.model = model
+        self.threshold = threshold
+        self.feature_names = feature_names
+
+    def compile(self):
+        """forest bien dich (tao 1 lan, ko luu vao file .pkl)"""
+        if getattr(self, '_compiled', None) is None:
+            self._compiled = CompiledForest.from_sklearn(self.model, self.feature_names, self.threshold)
+        return self._compiled
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_compiled', None)
+        return state
+
+    def __setstate__(self, state):
+        # file .pkl cu: model la Pipeline (smote + rf) va chua luu feature_names
+        model = state['model']
+        if hasattr(model, 'steps'):
+            model = model.steps[-1][1]
+        state['model'] = model
+        if state.get('feature_names') is None:
+            state['feature_names'] = list(model.feature_names_in_)
+        self.__dict__.update(state)
+        self._compiled = None
+
+    def predict(self, X):
+        return self.compile().predict(X[self.feature_names])
+
+    def predict_proba(self, X):
+        return self.compile().predict_proba(X[self.feature_names])
+
+
+def load_detector(path='quantization_rf_model.pkl'):
+    """doc file model; file cu luu class trong __main__ cua training_quantizied.py van doc duoc"""
+    main = sys.modules['__main__']
+    if not hasattr(main, 'ElephantAnomalyDetector'):
+        main.ElephantAnomalyDetector = ElephantAnomalyDetector
+    return joblib.load(path)
@@ -0,0 +1,301 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# rut gon forest theo phieu bau (moi cay tra 0/1 nhu tree_i tren FPGA), tren mien input nguyen:
+#   1. bo nhanh ko toi duoc: doc duong di giu khoang [lo, hi] cua tung feature (mien luong tu hoa
+#      ap_uint / ap_int), split co nguong ngoai khoang -> chi giu nhanh di duoc
+#      (nhieu nguong float khac nhau lam tron ve cung 1 nguong nguyen -> 1 nhanh rong)
+#   2. gop cay con cung lop: cay con ma moi la cung lop -> 1 la (if (...) { return 1; } else { return 1; })
+#   3. dung chung phep so sanh: moi cap (feature, nguong) duy nhat trong ca forest chi so 1 lan
+# moi buoc duoc CHUNG MINH giu nguyen lop cua tung cay tren moi input trong mien (duyet tung hop
+# la cua cay truoc, kiem tra cay sau hang so tren hop do) -> so phieu giong het.
+
+
+class VoteTree:
+    """
+    cay nguong nguyen, node 0 la goc: split x[feature] <= threshold -> left, nguoc lai -> right;
+    la: feature = -1, label = lop tra ve.
+    """
+
+    def __init__(self, feature, threshold, left, right, label):
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.int64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.label = np.asarray(label, dtype=np.int64)
+
+    @classmethod
+    def from_sklearn(cls, tree, classes, thresholds):
+        """thresholds(feature, nguong float) -> nguong nguyen (vd hls_export.ThresholdMap)"""
+        leaf = tree.children_left < 0
+        feature = np.where(leaf, -1, tree.feature)
+        threshold = [0 if leaf[i] else thresholds(int(tree.feature[i]), tree.threshold[i])
+                     for i in range(tree.node_count)]
+        label = np.asarray(classes)[tree.value[:, 0, :].argmax(axis=1)]
+        return cls(feature, threshold, tree.children_left, tree.children_right, np.where(leaf, label, -1))
+
+    def is_leaf(self, node):
+        return self.feature[node] < 0
+
+    @property
+    def n_splits(self):
+        return int((self.feature >= 0).sum())
+
+    @property
+    def n_leaves(self):
+        return int((self.feature < 0).sum())
+
+    @property
+    def depth(self):
+        best, stack = 0, [(0, 0)]
+        while stack:
+            node, d = stack.pop()
+            if self.is_leaf(node):
+                best = max(best, d)
+            else:
+                stack += [(self.left[node], d + 1), (self.right[node], d + 1)]
+        return best
+
+    def split_pairs(self):
+        splits = self.feature >= 0
+        return set(zip(self.feature[splits].tolist(), self.threshold[splits].tolist()))
+
+
+class _Builder:
+    """ghi node theo thu tu tien to (goc, trai, phai) -> cung cay vao thi cung mang ra"""
+
+    def __init__(self):
+        self.feature, self.threshold, self.left, self.right, self.label = [], [], [], [], []
+
+    def _add(self, feature, threshold, label):
+        for name, v in (('feature', feature), ('threshold', threshold), ('left', -1), ('right', -1),
+                        ('label', label)):
+            getattr(self, name).append(v)
+        return len(self.feature) - 1
+
+    def leaf(self, label):
+        return self._add(-1, 0, int(label))
+
+    def split(self, feature, threshold, build_left, build_right):
+        node = self._add(int(feature), int(threshold), -1)
+        self.left[node] = build_left()
+        self.right[node] = build_right()
+        return node
+
+    def tree(self):
+        return VoteTree(self.feature, self.threshold, self.left, self.right, self.label)
+
+
+def input_range(n_features, bits=32, signed=False):
+    """khoang gia tri nguyen [lo, hi] cua tung feature dau vao ap_uint<bits> / ap_int<bits>"""
+    lo, hi = (-2 ** (bits - 1), 2 ** (bits - 1) - 1) if signed else (0, 2 ** bits - 1)
+    return [lo] * n_features, [hi] * n_features
+
+
+def prune_unreachable(tree, lo, hi):
+    """bo cac split ma khoang cua feature tren duong di nam han ve 1 phia nguong"""
+    out = _Builder()
+
+    def visit(node, lo, hi):
+        while not tree.is_leaf(node):
+            f, t = tree.feature[node], tree.threshold[node]
+            if hi[f] <= t:
+                node = tree.left[node]
+            elif lo[f] > t:
+                node = tree.right[node]
+            else:
+                break
+        if tree.is_leaf(node):
+            return out.leaf(tree.label[node])
+        f, t = tree.feature[node], tree.threshold[node]
+        return out.split(f, t, lambda: visit(tree.left[node], lo, _with(hi, f, t)),
+                         lambda: visit(tree.right[node], _with(lo, f, t + 1), hi))
+
+    visit(0, list(lo), list(hi))
+    return out.tree()
+
+
+def collapse_same_class(tree):
+    """cay con ma moi la cung lop -> 1 la"""
+    constant = {}
+
+    def label_of(node):
+        # lop chung cua ca cay con (None neu co la khac lop)
+        if tree.is_leaf(node):
+            constant[node] = int(tree.label[node])
+        else:
+            left, right = label_of(tree.left[node]), label_of(tree.right[node])
+            constant[node] = left if left is not None and left == right else None
+        return constant[node]
+
+    label_of(0)
+    out = _Builder()
+
+    def visit(node):
+        if constant[node] is not None:
+            return out.leaf(constant[node])
+        return out.split(tree.feature[node], tree.threshold[node],
+                         lambda: visit(tree.left[node]), lambda: visit(tree.right[node]))
+
+    visit(0)
+    return out.tree()
+
+
+def _with(bound, f, value):
+    bound = list(bound)
+    bound[f] = value
+    return bound
+
+
+def _constant_on(tree, lo, hi, label):
+    """cay tra dung lop label tren moi input nguyen trong hop [lo, hi]"""
+    stack = [(0, lo, hi)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if tree.is_leaf(node):
+            if tree.label[node] != label:
+                return False
+            continue
+        f, t = tree.feature[node], tree.threshold[node]
+        if lo[f] <= t:
+            stack.append((tree.left[node], lo, _with(hi, f, min(hi[f], t))))
+        if hi[f] > t:
+            stack.append((tree.right[node], _with(lo, f, max(lo[f], t + 1)), hi))
+    return True
+
+
+def prove_equivalent(a, b, lo, hi):
+    """True neu 2 cay cho cung lop tren MOI input nguyen trong [lo, hi] (ko phai lay mau)"""
+    stack = [(0, list(lo), list(hi))]
+    while stack:
+        node, lo, hi = stack.pop()
+        if a.is_leaf(node):
+            if not _constant_on(b, lo, hi, a.label[node]):
+                return False
+            continue
+        f, t = a.feature[node], a.threshold[node]
+        if lo[f] <= t:
+            stack.append((a.left[node], lo, _with(hi, f, min(hi[f], t))))
+        if hi[f] > t:
+            stack.append((a.right[node], _with(lo, f, max(lo[f], t + 1)), hi))
+    return True
+
+
+def comparator_table(trees):
+    """cac cap (feature, nguong) duy nhat cua forest, sap xep -> chi so dung chung"""
+    return sorted(set().union(*(t.split_pairs() for t in trees)))
+
+
+def _stats(stage, trees, comparators=None):
+    depths = [t.depth for t in trees]
+    n_splits = sum(t.n_splits for t in trees)
+    return {'buoc': stage, 'split': n_splits, 'la': sum(t.n_leaves for t in trees),
+            'phep so sanh': n_splits if comparators is None else len(comparators),
+            'do sau max': max(depths), 'do sau tb': float(np.mean(depths))}
+
+
+def simplify_forest(trees, lo, hi):
+    """
+    Chay 3 buoc rut gon, chung minh tung buoc (AssertionError neu cay nao doi lop).
+    Tra ve (cay da rut gon, bang comparator, bang so lieu tung buoc).
+    """
+    rows = [_stats('goc', trees)]
+    for stage, rewrite in [('bo nhanh ko toi duoc', lambda t: prune_unreachable(t, lo, hi)),
+                           ('gop cay con cung lop', collapse_same_class)]:
+        rewritten = [rewrite(t) for t in trees]
+        broken = [i for i, (a, b) in enumerate(zip(trees, rewritten)) if not prove_equivalent(a, b, lo, hi)]
+        if broken:
+            raise AssertionError(f"❌ Buoc '{stage}' lam doi lop cua cay {broken}")
+        trees = rewritten
+        rows.append(_stats(stage, trees))
+
+    comparators = comparator_table(trees)
+    index = {pair: k for k, pair in enumerate(comparators)}
+    # dung chung chi doi cach danh so: moi split tro dung cap (feature, nguong) cua no
+    for t in trees:
+        for pair in t.split_pairs():
+            if comparators[index[pair]] != pair:
+                raise AssertionError(f"❌ Comparator {index[pair]} ko khop {pair}")
+    rows.append(_stats('dung chung phep so sanh', trees, comparators))
+    return trees, comparators, rows
+
+
+def to_compiled(trees, classes, feature_names=None, decision_threshold=0.5):
+    """
+    CompiledForest tu cay phieu bau: value la one-hot theo lop cua la, nen predict_proba = ti le phieu,
+    votes() = so phieu. CompiledForest so float32(x) <= float32(T): dung voi moi x nguyen chi khi
+    float32(T + 1) > float32(T) (T la so lon nhat trong nhom lam tron float32 cua no, nhu nguong tu
+    hls_export.integer_threshold). Nguong doi do rong bit (ThresholdMap.rescale) tren 2**24 co the ko
+    thoa -> ValueError.
+    """
+    from compiled_forest import CompiledForest
+
+    for t in trees:
+        split = t.threshold[t.feature >= 0]
+        bad = split[np.float32(split + 1) == np.float32(split)]
+        if len(bad):
+            raise ValueError(f"❌ Nguong {bad[:5].tolist()} ko bieu dien dung bang float32 "
+                             "(float32(T + 1) == float32(T))")
+
+    classes = np.asarray(classes)
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset, max_depth = 0, 0
+    for t in trees:
+        nodes = np.arange(len(t.feature))
+        leaf = t.feature < 0
+        roots.append(offset)
+        features.append(np.where(leaf, 0, t.feature))
+        thresholds.append(np.where(leaf, 0, t.threshold).astype(np.float32))
+        children.append(np.column_stack([np.where(leaf, nodes, t.right), np.where(leaf, nodes, t.left)]) + offset)
+        onehot = np.zeros((len(nodes), len(classes)))
+        onehot[leaf, np.searchsorted(classes, t.label[leaf])] = 1.0
+        values.append(onehot)
+        max_depth = max(max_depth, t.depth)
+        offset += len(nodes)
+    return CompiledForest(np.concatenate(features).astype(np.intp), np.concatenate(thresholds),
+                          np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+                          np.concatenate(values), np.asarray(roots, dtype=np.intp),
+                          max_depth, classes, feature_names, decision_threshold)
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+    import pandas as pd
+    from columnar import read_table
+    from detector import load_detector
+    from model_artifact import SCALES_PATH, read_scales
+    from hls_export import ThresholdMap
+    from threshold_curve import forest_votes
+
+    parser = argparse.ArgumentParser(description='Rut gon forest (phieu bau giong het) cho FPGA va Python')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--scales', default=SCALES_PATH)
+    parser.add_argument('--data', default=os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
+    args = parser.parse_args(argv)
+
+    detector = load_detector(args.model)
+    scales = read_scales(args.scales)
+    names = detector.feature_names
+    thresholds = ThresholdMap(names, scales)
+    trees = [VoteTree.from_sklearn(est.tree_, detector.model.classes_, thresholds)
+             for est in detector.model.estimators_]
+    lo, hi = input_range(len(names), thresholds.bits, thresholds.signed)
+    simplified, comparators, rows = simplify_forest(trees, lo, hi)
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f'{v:.1f}'))
+    print(f"✅ Da chung minh lop cua tung cay ko doi tren moi input ap_{'' if thresholds.signed else 'u'}"
+          f"int<{thresholds.bits}>")
+
+    # doi chieu them tren du lieu: so phieu sklearn vs forest bien dich tu cay da rut gon
+    X = read_table(args.data)[names]
+    compiled = to_compiled(simplified, detector.model.classes_, names, detector.threshold)
+    n_diff = int((compiled.votes(X) != forest_votes(detector.model, X)).sum())
+    if n_diff:
+        raise AssertionError(f"❌ {n_diff} mau co so phieu khac sau khi rut gon")
+    print(f"✅ So phieu giong het sklearn tren {len(X)} mau")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from forest_simplify import VoteTree, input_range, simplify_forest
+
+# sinh rf_inference.h / rf_inference.cpp (Vitis HLS) tu RandomForestClassifier da train:
+# moi cay -> ham tree_i gom cac if long nhau tra ve lop da so cua la (0/1),
+# rf_predict cong phieu cac cay va so voi VOTE_REQUIRED. Cung model + tham so -> cung file (CRLF).
+# nguong nguyen: sklearn so float32(x) <= t, nen voi x nguyen dieu kien tuong duong la x <= T
+# (T = so nguyen lon nhat co float32(T) <= t) -> cay C cho cung nhanh voi sklearn tren moi input.
+# doi do rong bit dau vao (khac luc train) thi nguong duoc doi qua bang scale (xap xi, sai so <= 1 muc).
+# --simplify: rut gon cay + dung chung phep so sanh (forest_simplify.py) truoc khi sinh code.
+
+HEADER_NAME = 'rf_inference.h'
+SOURCE_NAME = 'rf_inference.cpp'
+NEWLINE = '\r\n'
+
+
+def integer_threshold(t):
+    """so nguyen lon nhat x co float32(x) <= t"""
+    k = int(np.floor(t))
+    while float(np.float32(k)) > t:
+        k -= 1
+    while float(np.float32(k + 1)) <= t:
+        k += 1
+    return k
+
+
+def input_type(bits, signed):
+    return f"ap_int<{bits}>" if signed else f"ap_uint<{bits}>"
+
+
+class ThresholdMap:
+    """
+    Doi nguong nguyen tu mien luong tu hoa luc train sang mien dau vao phan cung.
+    scales: bang quantization/quantization_scales.csv (feature, scale, min, max; bits / signed neu co).
+    """
+
+    def __init__(self, feature_names, scales=None, bits=None, signed=None):
+        self.train_bits = int(scales['bits'].iloc[0]) if scales is not None and 'bits' in scales else 32
+        self.train_signed = bool(scales['signed'].iloc[0]) if scales is not None and 'signed' in scales else False
+        self.bits = self.train_bits if bits is None else bits
+        self.signed = self.train_signed if signed is None else signed
+        self.rescale = (self.bits, self.signed) != (self.train_bits, self.train_signed)
+        if self.rescale:
+            if scales is None:
+                raise ValueError("❌ Can bang scale de doi nguong sang do rong bit khac luc train")
+            table = scales.set_index('feature').loc[feature_names]
+            span = (table['scale'] * (2 ** self.train_bits - 1)).to_numpy()
+            self.train_scale = table['scale'].to_numpy()
+            self.target_scale = np.where(span > 0, span / (2 ** self.bits - 1), 1.0)
+
+    @staticmethod
+    def _offset(bits, signed):
+        return 2 ** (bits - 1) if signed else 0
+
+    def __call__(self, feature, threshold):
+        k = integer_threshold(threshold)
+        if not self.rescale:
+            return k
+        # ranh gioi giua muc k va k + 1 (don vi thuc, tinh tu min) -> muc tuong ung o do rong moi
+        boundary = (k + self._offset(self.train_bits, self.train_signed) + 0.5) * self.train_scale[feature]
+        level = int(np.rint(boundary / self.target_scale[feature] - 0.5))
+        level = min(max(level, -1), 2 ** self.bits - 1)
+        return level - self._offset(self.bits, self.signed)
+
+
+def _tree_lines(tree, comparators=None):
+    lines = []
+    index = {pair: k for k, pair in enumerate(comparators or [])}
+
+    def emit(node, depth):
+        pad = '  ' * depth
+        if tree.is_leaf(node):
+            lines.append(f"{pad}return {int(tree.label[node])};")
+            return
+        f, t = int(tree.feature[node]), int(tree.threshold[node])
+        test = f"c[{index[(f, t)]}]" if comparators else f"x[{f}] <= {t}"
+        lines.append(f"{pad}if ({test}) {{")
+        emit(tree.left[node], depth + 1)
+        lines.append(f"{pad}}} else {{")
+        emit(tree.right[node], depth + 1)
+        lines.append(f"{pad}}}")
+
+    emit(0, 1)
+    return lines
+
+
+def generate_source(trees, ctype, comparators=None):
+    """
+    noi dung rf_inference.cpp tu cac VoteTree; comparators (forest_simplify.comparator_table):
+    rf_predict tinh moi phep so sanh 1 lan vao c[], cac tree_i doc c[] thay cho x[]
+    """
+    lines = [f'#include "{HEADER_NAME}"', '']
+    arg = f"{ctype} x[N_FEATURES]"
+    if comparators:
+        lines += [f'#define N_COMPARATORS {len(comparators)}', '']
+        arg = 'bool c[N_COMPARATORS]'
+    for i, tree in enumerate(trees):
+        lines.append(f"int tree_{i}({arg}) {{")
+        lines += _tree_lines(tree, comparators)
+        lines += ['}', '']
+    lines += [f"int rf_predict({ctype} x[N_FEATURES]) {{", '#pragma HLS PIPELINE']
+    if comparators:
+        lines.append('    bool c[N_COMPARATORS];')
+        lines += [f"    c[{k}] = x[{f}] <= {t};" for k, (f, t) in enumerate(comparators)]
+        lines.append('')
+    lines += ['    int votes = 0;', '']
+    call = 'c' if comparators else 'x'
+    lines += [f"    votes += tree_{i}({call});" for i in range(len(trees))]
+    lines += ['', '    return (votes >= VOTE_REQUIRED) ? 1 : 0;', '}']
+    return NEWLINE.join(lines) + NEWLINE
+
+
+def generate_header(n_features, n_trees, vote_required, ctype):
+    """noi dung rf_inference.h"""
+    lines = ['#ifndef RF_INFERENCE_H', '#define RF_INFERENCE_H', '', '#include <ap_int.h>', '',
+             f'#define N_FEATURES {n_features}', f'#define N_TREES {n_trees}',
+             f'#define VOTE_REQUIRED {vote_required}', '',
+             '// input: quantized int features', f'int rf_predict({ctype} x[N_FEATURES]);', '', '#endif']
+    return NEWLINE.join(lines) + NEWLINE
+
+
+def export_hls(rf, feature_names, out_dir='.', scales=None, bits=None, signed=None,
+               threshold=None, vote_required=None, simplify=False):
+    """
+    Ghi rf_inference.h / .cpp vao out_dir.
+    bits / signed: do rong dau vao phan cung (mac dinh = luc luong tu hoa khi train).
+    vote_required: mac dinh = ceil(threshold * N_TREES) (threshold = BEST_THRESHOLD cua model).
+    simplify: rut gon forest (forest_simplify, phieu giong het) va dung chung phep so sanh.
+    """
+    from threshold_curve import probability_to_votes
+
+    n_trees = len(rf.estimators_)
+    if vote_required is None:
+        vote_required = probability_to_votes(threshold if threshold is not None else 0.5, n_trees)
+    thresholds = ThresholdMap(feature_names, scales, bits, signed)
+    ctype = input_type(thresholds.bits, thresholds.signed)
+    trees = [VoteTree.from_sklearn(est.tree_, rf.classes_, thresholds) for est in rf.estimators_]
+    comparators, report = None, None
+    if simplify:
+        lo, hi = input_range(len(feature_names), thresholds.bits, thresholds.signed)
+        trees, comparators, report = simplify_forest(trees, lo, hi)
+
+    paths = (os.path.join(out_dir, HEADER_NAME), os.path.join(out_dir, SOURCE_NAME))
+    contents = (generate_header(len(feature_names), n_trees, vote_required, ctype),
+                generate_source(trees, ctype, comparators))
+    for path, text in zip(paths, contents):
+        with open(path, 'w', newline='') as f:
+            f.write(text)
+    return {'header': paths[0], 'source': paths[1], 'vote_required': vote_required, 'input_type': ctype,
+            'report': report}
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, '..', 'data'))
+    import pandas as pd
+    from detector import load_detector
+    from model_artifact import SCALES_PATH, read_scales
+    from threshold_curve import read_curve, best_row
+
+    parser = argparse.ArgumentParser(description='Sinh rf_inference.h / rf_inference.cpp tu model da train')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--scales', default=SCALES_PATH)
+    parser.add_argument('--bits', type=int, default=None, help='Do rong bit dau vao (mac dinh = luc train)')
+    parser.add_argument('--signed', choices=['yes', 'no'], default=None,
+                        help='ap_int / ap_uint (mac dinh theo bang scale)')
+    parser.add_argument('--vote-required', type=int, default=None,
+                        help='Mac dinh = ceil(BEST_THRESHOLD * N_TREES)')
+    parser.add_argument('--curve', default=None,
+                        help='Lay so phieu co F1 cao nhat tu threshold_curve.csv thay cho BEST_THRESHOLD')
+    parser.add_argument('--simplify', action='store_true',
+                        help='Rut gon forest (phieu giong het) va dung chung phep so sanh')
+    parser.add_argument('--output-dir', default=os.path.join(here, '..'))
+    args = parser.parse_args(argv)
+
+    signed = None if args.signed is None else args.signed == 'yes'
+    detector = load_detector(args.model)
+    scales = read_scales(args.scales)
+    vote_required = args.vote_required
+    if vote_required is None and args.curve:
+        vote_required = int(best_row(read_curve(args.curve, kind='votes'))['threshold'])
+    result = export_hls(detector.model, detector.feature_names, args.output_dir, scales=scales,
+                        bits=args.bits, signed=signed, threshold=detector.threshold,
+                        vote_required=vote_required, simplify=args.simplify)
+    if result['report'] is not None:
+        print(pd.DataFrame(result['report']).to_string(index=False, float_format=lambda v: f'{v:.1f}'))
+    print(f"✅ Da sinh {result['header']} va {result['source']} "
+          f"({result['input_type']}, VOTE_REQUIRED {result['vote_required']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from forest_simplify import _Builder
+
+# mo phong rf_predict (rf_inference.cpp) dung tung bit, ko can trinh bien dich C++ / Vitis HLS:
+# doc thang file .cpp / .h (ca dang x[f] <= T lan dang comparator c[k] cua --simplify), nap input
+# vao ap_int<W> / ap_uint<W> nhu phan cung (bo phan le ve 0, giu W bit thap, bit cao nhat la dau
+# voi ap_int), so sanh x <= T chinh xac tren int64, cong phieu va so voi VOTE_REQUIRED.
+# duyet vector hoa tren ca (dong, cay) nhu compiled_forest.py -> ca file du lieu trong 1 lan goi.
+
+_TREE = re.compile(r'^int tree_(\d+)\(')
+_IF_X = re.compile(r'^if \(x\[(\d+)\] <= (-?\d+)\) \{$')
+_IF_C = re.compile(r'^if \(c\[(\d+)\]\) \{$')
+_RETURN = re.compile(r'^return (-?\d+);$')
+_COMPARATOR = re.compile(r'^c\[(\d+)\] = x\[(\d+)\] <= (-?\d+);$')
+_DEFINE = re.compile(r'^#define (\w+) (\d+)$')
+_PROTOTYPE = re.compile(r'rf_predict\(ap_(u?)int<(\d+)> x')
+
+
+def wrap_input(values, bits, signed):
+    """gia tri nguyen sau khi gan vao ap_int<bits> / ap_uint<bits> (cat bit cao, bu 2 cho ap_int)"""
+    if not 1 <= bits <= 63:
+        raise ValueError(f"❌ Chi mo phong duoc do rong 1..63 bit (nhan {bits})")
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        values = np.trunc(values)          # double -> ap_int: bo phan le ve 0
+    wrapped = values.astype(np.int64) & ((1 << bits) - 1)
+    if signed:
+        wrapped = np.where(wrapped >= 1 << (bits - 1), wrapped - (1 << bits), wrapped)
+    return wrapped
+
+
+def _parse_tree(lines, comparators):
+    out = _Builder()
+
+    def expect(text):
+        line = next(lines)
+        if line != text:
+            raise ValueError(f"❌ Can '{text}', gap '{line}'")
+
+    def node():
+        line = next(lines)
+        m = _RETURN.match(line)
+        if m:
+            return out.leaf(int(m.group(1)))
+        m = _IF_X.match(line)
+        if m:
+            f, t = int(m.group(1)), int(m.group(2))
+        elif _IF_C.match(line):
+            f, t = comparators[int(_IF_C.match(line).group(1))]
+        else:
+            raise ValueError(f"❌ Dong ko hieu duoc: '{line}'")
+
+        def right():
+            expect('} else {')
+            child = node()
+            expect('}')
+            return child
+
+        return out.split(f, t, node, right)
+
+    node()
+    expect('}')
+    return out.tree()
+
+
+def parse_source(text):
+    """cac VoteTree (theo thu tu tree_i) tu noi dung rf_inference.cpp"""
+    lines = [line.strip() for line in text.splitlines()]
+    comparators = {}
+    for line in lines:
+        m = _COMPARATOR.match(line)
+        if m:
+            comparators[int(m.group(1))] = (int(m.group(2)), int(m.group(3)))
+    trees, it = {}, iter(lines)
+    for line in it:
+        m = _TREE.match(line)
+        if m:
+            trees[int(m.group(1))] = _parse_tree(it, comparators)
+    return [trees[i] for i in sorted(trees)]
+
+
+def parse_header(text):
+    """(cac #define, so bit, co dau) tu noi dung rf_inference.h"""
+    defines = {m.group(1): int(m.group(2)) for m in map(_DEFINE.match, text.splitlines()) if m}
+    m = _PROTOTYPE.search(text)
+    if m is None:
+        raise ValueError("❌ Ko tim thay khai bao rf_predict(ap_int<W> / ap_uint<W> x[...])")
+    return defines, int(m.group(2)), m.group(1) != 'u'
+
+
+class RfPredictSim:
+    """rf_predict tren mang NumPy: votes(X) = tong gia tri tra ve cua cac tree_i, predict = votes >= VOTE_REQUIRED"""
+
+    def __init__(self, trees, n_features, vote_required, bits=16, signed=True):
+        self.n_features = n_features
+        self.vote_required = vote_required
+        self.bits = bits
+        self.signed = signed
+        features, thresholds, children, labels, roots = [], [], [], [], []
+        offset, max_depth = 0, 0
+        for t in trees:
+            nodes = np.arange(len(t.feature))
+            leaf = t.feature < 0
+            roots.append(offset)
+            features.append(np.where(leaf, 0, t.feature))
+            thresholds.append(t.threshold)
+            # [phai, trai] nhu CompiledForest; la tro ve chinh no
+            children.append(np.column_stack([np.where(leaf, nodes, t.right), np.where(leaf, nodes, t.left)]) + offset)
+            labels.append(np.where(leaf, t.label, 0))
+            max_depth = max(max_depth, t.depth)
+            offset += len(nodes)
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds).astype(np.int64)
+        self.children = np.ascontiguousarray(np.concatenate(children), dtype=np.intp)
+        self.label = np.concatenate(labels).astype(np.int64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_source(cls, source_path, header_path=None, bits=None, signed=None):
+        """doc rf_inference.cpp (+ .h cung thu muc); bits / signed thay cho kieu khai bao trong header"""
+        if header_path is None:
+            header_path = os.path.join(os.path.dirname(source_path), 'rf_inference.h')
+        with open(header_path) as f:
+            defines, header_bits, header_signed = parse_header(f.read())
+        with open(source_path) as f:
+            trees = parse_source(f.read())
+        if defines.get('N_TREES', len(trees)) != len(trees):
+            raise ValueError(f"❌ N_TREES {defines['N_TREES']} nhung {source_path} co {len(trees)} cay")
+        return cls(trees, defines['N_FEATURES'], defines['VOTE_REQUIRED'],
+                   header_bits if bits is None else bits, header_signed if signed is None else signed)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def input_type(self):
+        return f"ap_{'' if self.signed else 'u'}int<{self.bits}>"
+
+    def inputs(self, X):
+        """ma tran input sau khi nap vao x[N_FEATURES] (theo thu tu cot)"""
+        X = X.to_numpy() if hasattr(X, 'columns') else np.asarray(X)
+        X = X.reshape(1, -1) if X.ndim == 1 else X
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"❌ Can {self.n_features} feature, nhan {X.shape[1]}")
+        return wrap_input(X, self.bits, self.signed)
+
+    def votes(self, X):
+        x = self.inputs(X)
+        n = len(x)
+        flat, children = x.ravel(), self.children.ravel()
+        base = (np.arange(n, dtype=np.intp) * self.n_features)[:, None]
+        idx = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = flat[base + self.feature[idx]] <= self.threshold[idx]
+            idx = children[2 * idx + go_left]
+        return self.label[idx].sum(axis=1)
+
+    def predict(self, X):
+        return (self.votes(X) >= self.vote_required).astype(int)
+
+
+def disagreements(sim, detector, X):
+    """cac mau ma rf_predict mo phong khac nhan cua model sklearn (detector)"""
+    import pandas as pd
+    from threshold_curve import forest_votes
+
+    X = X[detector.feature_names]
+    hw_votes = sim.votes(X)
+    frame = pd.DataFrame({'hw_votes': hw_votes, 'hw_pred': (hw_votes >= sim.vote_required).astype(int),
+                          'sk_pred': detector.predict(X),
+                          'sk_proba': detector.predict_proba(X)[:, list(detector.model.classes_).index(1)]},
+                         index=X.index)
+    if len(detector.model.estimators_) == sim.n_trees:
+        frame.insert(1, 'sk_votes', forest_votes(detector.model, X))
+    frame['wrapped'] = (sim.inputs(X) != X.to_numpy()).sum(axis=1)
+    return frame[frame['hw_pred'] != frame['sk_pred']]
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(here, '..', 'data'))
+    from columnar import read_table
+    from detector import load_detector
+
+    parser = argparse.ArgumentParser(description='Mo phong rf_predict (ap_int) va doi chieu voi model sklearn')
+    parser.add_argument('--source', default=os.path.join(here, '..', 'rf_inference.cpp'))
+    parser.add_argument('--header', default=None, help='Mac dinh rf_inference.h canh file --source')
+    parser.add_argument('--bits', type=int, default=None, help='Do rong input (mac dinh theo header)')
+    parser.add_argument('--signed', choices=['yes', 'no'], default=None, help='ap_int / ap_uint (mac dinh theo header)')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--data', default=os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
+    parser.add_argument('--output', default=None, help='Ghi cac mau khac nhau ra CSV')
+    args = parser.parse_args(argv)
+
+    signed = None if args.signed is None else args.signed == 'yes'
+    sim = RfPredictSim.from_source(args.source, args.header, args.bits, signed)
+    detector = load_detector(args.model)
+    X = read_table(args.data)[detector.feature_names]
+
+    start = time.perf_counter()
+    hw = sim.predict(X)
+    elapsed = time.perf_counter() - start
+    n_wrapped = int((sim.inputs(X) != X.to_numpy()).sum())
+    print(f"rf_predict({sim.input_type}): {sim.n_trees} cay, VOTE_REQUIRED {sim.vote_required}, "
+          f"{len(X)} mau trong {elapsed * 1e3:.1f} ms; {n_wrapped} gia tri input bi cat bit")
+    print(f"Du doan 1: phan cung {int(hw.sum())}, sklearn {int(detector.predict(X).sum())}")
+
+    diff = disagreements(sim, detector, X)
+    if args.output:
+        diff.to_csv(args.output, index_label='row')
+    if len(diff):
+        print(diff.head(20).to_string(float_format=lambda v: f'{v:.4f}'))
+        print(f"❌ {len(diff)}/{len(X)} mau khac model sklearn")
+        if 'sk_votes' in diff:
+            # cung so phieu ma khac nhan: sklearn lay trung binh xac suat la, phan cung dem phieu
+            same_votes = int((diff['hw_votes'] == diff['sk_votes']).sum())
+            print(f"   {same_votes} mau cung so phieu (khac do nguong xac suat vs VOTE_REQUIRED), "
+                  f"{len(diff) - same_votes} mau khac so phieu")
+    else:
+        print(f"✅ rf_predict giong het model sklearn tren {len(X)} mau")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+
+# file model nhi phan co phien ban, doc bang memory-map, ko can sklearn / joblib / class trong __main__:
+#   8 byte magic | uint32 version | uint32 do dai header | header JSON | cac mang (moi mang can 64 byte)
+# header: feature_names (dung thu tu), threshold, classes, max_depth, bang scale luong tu hoa
+# (bits / signed) va vi tri / dtype / shape cua tung mang node (feature, threshold, children, value,
+# roots, scale_min / scale_max / scale_scale). Mang la view tren memmap -> nap gan nhu ko copy.
+
+MAGIC = b'EADMODEL'
+ARTIFACT_VERSION = 1
+ALIGN = 64
+FOREST_ARRAYS = {'feature': '<i8', 'threshold': '<f4', 'children': '<i8', 'value': '<f8', 'roots': '<i8'}
+QUANTIZATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'quantization')
+SCALES_PATH = os.path.join(QUANTIZATION_DIR, 'quantization_scales.csv')
+
+
+def read_scales(path=SCALES_PATH):
+    """bang scale luong tu hoa; thieu file thi bao loi (ko am tham bo qua bang scale)"""
+    import pandas as pd
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Ko tim thay bang scale {path} (chay quantization.py hoac truyen --scales)")
+    return pd.read_csv(path)
+
+
+class ModelArtifact:
+    """forest bien dich + nguong + thu tu feature + bang scale (neu co) doc tu file nhi phan"""
+
+    def __init__(self, forest, scales=None, path=None):
+        self.forest = forest
+        self.scales = scales       # dict: feature, min, max, scale, bits, signed (hoac None)
+        self.path = path
+        self._quantizer = None
+
+    @property
+    def feature_names(self):
+        return self.forest.feature_names
+
+    @property
+    def threshold(self):
+        return self.forest.decision_threshold
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(X)
+
+    def predict(self, X):
+        return self.forest.predict(X)
+
+    def quantizer(self):
+        """Quantizer (quantization/quantizer.py) dung bang scale luu trong file (tao 1 lan)"""
+        if self._quantizer is None:
+            if self.scales is None:
+                raise ValueError(f"❌ {self.path} ko co bang scale luong tu hoa")
+            if QUANTIZATION_DIR not in sys.path:
+                sys.path.insert(0, QUANTIZATION_DIR)
+            from quantizer import Quantizer
+            quantizer = Quantizer(bits=self.scales['bits'], signed=self.scales['signed'])
+            quantizer.features_ = list(self.scales['feature'])
+            quantizer.min_ = np.asarray(self.scales['min'], dtype=np.float64)
+            quantizer.max_ = np.asarray(self.scales['max'], dtype=np.float64)
+            quantizer.scale_ = np.asarray(self.scales['scale'], dtype=np.float64)
+            self._quantizer = quantizer
+        return self._quantizer
+
+    def predict_raw(self, X):
+        """nhan tu feature chua luong tu hoa (luong tu hoa bang scale luc train roi predict)"""
+        return self.predict(self.quantizer().transform(X))
+
+
+def save_artifact(path, forest, scales=None):
+    """
+    Ghi CompiledForest (+ bang scale) ra file nhi phan.
+    scales: DataFrame / dict co cot feature, min, max, scale (va bits, signed) nhu quantization_scales.csv.
+    """
+    arrays = {name: np.ascontiguousarray(getattr(forest, name), dtype=dtype)
+              for name, dtype in FOREST_ARRAYS.items()}
+    header = {'feature_names': list(forest.feature_names), 'threshold': float(forest.decision_threshold),
+              'classes': [int(c) for c in forest.classes_], 'max_depth': int(forest.max_depth),
+              'scales': None, 'arrays': {}}
+    if scales is not None:
+        order = [list(scales['feature']).index(f) for f in forest.feature_names]
+        for col in ('min', 'max', 'scale'):
+            arrays['scale_' + col] = np.asarray(scales[col], dtype='<f8')[order]
+        bits = scales['bits'] if 'bits' in scales else [32]
+        signed = scales['signed'] if 'signed' in scales else [False]
+        header['scales'] = {'bits': int(list(bits)[0]), 'signed': bool(list(signed)[0])}
+
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', ARTIFACT_VERSION, len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(array.tobytes())
+    return path
+
+
+def load_artifact(path, mmap=True):
+    """Doc file nhi phan; mmap=True: cac mang la view chi doc tren memmap (ko copy)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"❌ {path} ko phai file model nhi phan")
+        version, header_len = struct.unpack('<II', f.read(8))
+        if version != ARTIFACT_VERSION:
+            raise ValueError(f"❌ Unsupported model artifact version {version} in {path}")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape']))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    forest = CompiledForest(arrays['feature'], arrays['threshold'], arrays['children'], arrays['value'],
+                            arrays['roots'], header['max_depth'], np.asarray(header['classes']),
+                            header['feature_names'], header['threshold'])
+    scales = None
+    if header['scales'] is not None:
+        scales = {'feature': header['feature_names'], 'min': arrays['scale_min'], 'max': arrays['scale_max'],
+                  'scale': arrays['scale_scale'], **header['scales']}
+    return ModelArtifact(forest, scales, path)
+
+
+# do trong tien trinh moi: thoi gian import + nap, RSS dinh (VmHWM, KiB; ru_maxrss giu gia tri cua
+# tien trinh cha qua fork / exec nen ko dung duoc)
+_PROBE = '''
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {here!r})
+{load}
+seconds = time.perf_counter() - t0
+hwm = next(line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM'))
+print(seconds, hwm, 'sklearn' in sys.modules)
+'''
+_LOADERS = {
+    'pickle': 'from detector import load_detector\nmodel = load_detector({path!r})',
+    'artifact': 'from model_artifact import load_artifact\nmodel = load_artifact({path!r})',
+}
+
+
+def _probe(loader, path, repeat=3):
+    """(giay import + nap nhanh nhat, RSS dinh MiB, co import sklearn ko) trong tien trinh moi"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = _PROBE.format(here=here, load=_LOADERS[loader].format(path=os.path.abspath(path)))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code],
+                             capture_output=True, text=True, check=True).stdout.split()
+        runs.append((float(out[0]), int(out[1]), out[2] == 'True'))
+    seconds = min(r[0] for r in runs)
+    return seconds, runs[0][1] / 1024, runs[0][2]
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+    import pandas as pd
+    from columnar import read_table
+    from detector import load_detector
+
+    parser = argparse.ArgumentParser(description='Xuat model ra file nhi phan (memory-map, ko can sklearn)')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--scales', default=SCALES_PATH)
+    parser.add_argument('--no-scales', action='store_true', help='Ko luu bang scale (predict_raw ko dung duoc)')
+    parser.add_argument('--output', default='quantization_rf_model.bin')
+    parser.add_argument('--data', default=os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
+    args = parser.parse_args(argv)
+
+    detector = load_detector(args.model)
+    scales = None if args.no_scales else read_scales(args.scales)
+    save_artifact(args.output, detector.compile(), scales)
+    print(f"Da luu {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB, "
+          f"{'co' if scales is not None else 'ko co'} bang scale)")
+
+    artifact = load_artifact(args.output)
+    X = read_table(args.data)[detector.feature_names]
+    same = (np.array_equal(artifact.predict_proba(X), detector.model.predict_proba(X))
+            and np.array_equal(artifact.predict(X), detector.predict(X)))
+    if not same:
+        raise AssertionError("❌ Du doan tu file nhi phan khac model pickle")
+
+    rows = []
+    for name, loader, path in [('pickle (joblib + sklearn)', 'pickle', args.model),
+                               ('nhi phan (memmap)', 'artifact', args.output)]:
+        seconds, rss, sklearn_loaded = _probe(loader, path)
+        rows.append({'cach nap': name, 'kich thuoc KiB': os.path.getsize(path) / 1024,
+                     'import + nap ms': seconds * 1e3, 'RSS dinh MiB': rss, 'import sklearn': sklearn_loaded})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f'{v:.1f}'))
+    print(f"✅ Du doan giong het model pickle tren {len(X)} mau")
+
+
+if __name__ == '__main__':
+    main()
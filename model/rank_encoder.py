@@ -0,0 +1,135 @@
+import argparse
+import copy
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ma hoa feature theo nguong split cua forest:
+# moi feature chi duoc so sanh voi mot tap nguong huu han (x <= t) trong cac cay,
+# nen thay gia tri bang chi so bin = so nguong t < x (0..so nguong) la du de ra cung ket qua.
+# so bit can = ceil(log2(so nguong + 1)) thay vi 32 bit cua quantization.py.
+# sklearn ep X ve float32 truoc khi so sanh -> ma hoa cung ep float32 de khop tung du doan.
+
+DEFAULT_TABLES = 'rank_encoder_tables.csv'
+
+
+class RankEncoder:
+    """
+    thresholds: dict feature -> mang nguong split da sap xep (float64, khong trung).
+    transform(X): chi so bin (x <= thresholds[k] <=> bin <= k);
+    encode_model(rf): ban sao forest voi nguong k thay cho thresholds[k], chay tren bin.
+    """
+
+    def __init__(self, feature_names, thresholds):
+        self.feature_names = list(feature_names)
+        self.thresholds = {f: np.asarray(thresholds[f], dtype=np.float64) for f in self.feature_names}
+
+    @classmethod
+    def from_forest(cls, rf, feature_names=None):
+        """lay cac nguong split cua moi feature tu RandomForestClassifier da train"""
+        if feature_names is None:
+            feature_names = list(rf.feature_names_in_)
+        found = [[] for _ in feature_names]
+        for est in rf.estimators_:
+            tree = est.tree_
+            split = tree.feature >= 0   # node la co feature = -2
+            for f, t in zip(tree.feature[split], tree.threshold[split]):
+                found[f].append(t)
+        return cls(feature_names, {name: np.unique(ts) for name, ts in zip(feature_names, found)})
+
+    def n_bins(self, feature):
+        return len(self.thresholds[feature]) + 1
+
+    def bits(self, feature):
+        return max(1, int(np.ceil(np.log2(self.n_bins(feature)))))
+
+    def dtype(self, feature):
+        return np.uint8 if self.bits(feature) <= 8 else np.uint16 if self.bits(feature) <= 16 else np.uint32
+
+    def transform(self, X):
+        """gia tri (cung khong gian voi luc train) -> chi so bin, moi cot dtype nho nhat du chua"""
+        encoded = {}
+        for f in self.feature_names:
+            values = np.asarray(X[f], dtype=np.float32).astype(np.float64)
+            if np.isnan(values).any():
+                raise ValueError(f"❌ Feature '{f}' co NaN, ko ma hoa theo nguong duoc")
+            encoded[f] = np.searchsorted(self.thresholds[f], values, side='left').astype(self.dtype(f))
+        return pd.DataFrame(encoded, index=getattr(X, 'index', None))
+
+    def encode_model(self, rf):
+        """ban sao forest: nguong thresholds[k] cua moi node -> k (so sanh bin <= k)"""
+        encoded = copy.deepcopy(rf)
+        for est in encoded.estimators_:
+            state = est.tree_.__getstate__()
+            nodes = state['nodes']
+            for i, name in enumerate(self.feature_names):
+                mask = nodes['feature'] == i
+                nodes['threshold'][mask] = np.searchsorted(self.thresholds[name], nodes['threshold'][mask])
+            est.tree_.__setstate__(state)
+        return encoded
+
+    def summary(self):
+        return pd.DataFrame({'feature': self.feature_names,
+                             'n_thresholds': [len(self.thresholds[f]) for f in self.feature_names],
+                             'bits': [self.bits(f) for f in self.feature_names]})
+
+    def save(self, path=DEFAULT_TABLES):
+        """
+        bang nguong dang dai: feature, bin, threshold (bin k: thresholds[k-1] < x <= thresholds[k]),
+        theo thu tu feature cua model; feature ko co split nao ghi 1 dong threshold rong.
+        """
+        rows = []
+        for f in self.feature_names:
+            rows += [(f, k, t) for k, t in enumerate(self.thresholds[f])] or [(f, 0, np.nan)]
+        table = pd.DataFrame(rows, columns=['feature', 'bin', 'threshold'])
+        table.to_csv(path, index=False, float_format='%.17g')
+
+    @classmethod
+    def load(cls, path=DEFAULT_TABLES):
+        table = pd.read_csv(path, float_precision='round_trip')
+        feature_names = list(pd.unique(table['feature']))
+        return cls(feature_names, {f: table.loc[table['feature'] == f, 'threshold'].dropna().to_numpy()
+                                   for f in feature_names})
+
+
+def check_equivalence(rf, encoder, X):
+    """
+    so sanh forest goc tren X voi forest ma hoa tren transform(X):
+    tra ve so mau co xac suat khac nhau (0 = cung xac suat nen cung nhan voi moi nguong).
+    """
+    encoded_rf = encoder.encode_model(rf)
+    prob = rf.predict_proba(X[encoder.feature_names])
+    prob_encoded = encoded_rf.predict_proba(encoder.transform(X))
+    return int((prob != prob_encoded).any(axis=1).sum())
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+    from columnar import read_table
+    from detector import load_detector
+
+    parser = argparse.ArgumentParser(description='Ma hoa feature theo nguong split cua forest + kiem tra tuong duong')
+    parser.add_argument('--model', default='quantization_rf_model.pkl')
+    parser.add_argument('--data', default=os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
+    parser.add_argument('--output', default=DEFAULT_TABLES)
+    args = parser.parse_args(argv)
+
+    detector = load_detector(args.model)
+    encoder = RankEncoder.from_forest(detector.model, detector.feature_names)
+    print(encoder.summary().to_string(index=False))
+    encoder.save(args.output)
+    print(f"Da luu bang nguong: {args.output}")
+
+    # kiem tra tren toan bo du lieu (ca train va test)
+    X = read_table(args.data)[detector.feature_names]
+    diff = check_equivalence(detector.model, encoder, X)
+    if diff:
+        raise AssertionError(f"❌ {diff} / {len(X)} mau co xac suat khac sau khi ma hoa")
+    print(f"✅ Du doan giong het tren {len(X)} mau "
+          f"({sum(encoder.bits(f) for f in encoder.feature_names)} bit / mau thay vi {32 * len(encoder.feature_names)})")
+
+
+if __name__ == '__main__':
+    main()
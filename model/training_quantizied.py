@@ -1,7 +1,7 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import joblib
 from importlib import reload
 
@@ -9,8 +9,22 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix, f1_score, roc_auc_score
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from columnar import read_table
+from detector import ElephantAnomalyDetector
+from hls_export import export_hls
+from model_artifact import save_artifact, read_scales
+from rank_encoder import RankEncoder, check_equivalence
+from threshold_curve import threshold_curve, vote_curve, best_row, forest_votes, probability_to_votes, write_curve
+
+# bieu do chi ve khi chay voi --plot (mac dinh headless, ko import matplotlib/seaborn)
+SHOW_PLOTS = '--plot' in sys.argv[1:]
+if SHOW_PLOTS:
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
 print("Training Quantized Model")
-df = pd.read_csv('Quantized_Combined_Features.csv')
+df = read_table(os.path.join('..', 'quantization', 'Quantized_Combined_Features'))
 
 X = df.drop(columns=['is_outside'])
 y = df['is_outside']
@@ -51,33 +65,32 @@ print(classification_report(y_test, y_pred_opt))
 
 print("Confusion Matrix:")
 cm = confusion_matrix(y_test, y_pred_opt)
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
+print(cm)
+if SHOW_PLOTS:
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
 
-plt.xlabel('Predicted')
-plt.ylabel('Actual')
-plt.title('Confusion Matrix')
-plt.show()
+    plt.xlabel('Predicted')
+    plt.ylabel('Actual')
+    plt.title('Confusion Matrix')
+    plt.show()
 
 f1 = f1_score(y_test, y_pred_opt)
 roc_auc = roc_auc_score(y_test, y_pred_opt)
 print(f"F1 Score: {f1:.4f}")
 print(f"ROC AUC Score: {roc_auc:.4f}")
 
+# duong cong nguong xac suat + so phieu (moi cay 0/1 nhu rf_predict tren FPGA), dung lai khi xuat C++
+n_trees = len(rf_clf.estimators_)
+votes = vote_curve(y_test, forest_votes(rf_clf, X_test), n_trees)
+vote_required = probability_to_votes(BEST_THRESHOLD, n_trees)
+best_votes = best_row(votes)
+print(f"VOTE_REQUIRED cho threshold {BEST_THRESHOLD}: {vote_required}/{n_trees} "
+      f"(F1={votes['f1'].iloc[vote_required]:.4f}); tot nhat: {int(best_votes['threshold'])}/{n_trees} "
+      f"(F1={best_votes['f1']:.4f})")
+write_curve('threshold_curve.csv', threshold_curve(y_test, y_prob), votes)
+
 # save model
 reload(joblib)
-class ElephantAnomalyDetector:
-    def __init__(self, model, threshold, feature_names):
-        self.model = model
-        self.threshold = threshold
-        self.feature_names = feature_names
-    def predict(self, X):
-        X = X[self.feature_names]
-        prob = self.model.predict_proba(X)[:, 1]
-        return (prob >= self.threshold).astype(int)
-
-    def predict_proba(self, X):
-        X = X[self.feature_names]
-        return self.model.predict_proba(X)
 final_model_package = ElephantAnomalyDetector(
     model=rf_clf,
     threshold=BEST_THRESHOLD,
@@ -86,4 +99,22 @@ final_model_package = ElephantAnomalyDetector(
 print('Xuat file model')
 filename = 'quantization_rf_model.pkl'
 joblib.dump(final_model_package, filename)
-print('Xuat file model thanh cong')
\ No newline at end of file
+print('Xuat file model thanh cong')
+
+# file nhi phan (memory-map, ko can sklearn) kem bang scale cua buoc luong tu hoa
+scales = read_scales()
+save_artifact('quantization_rf_model.bin', final_model_package.compile(), scales)
+print('Xuat file model nhi phan thanh cong (quantization_rf_model.bin)')
+
+# sinh lai rf_inference.h / .cpp (Vitis HLS) tu chinh forest nay, VOTE_REQUIRED theo BEST_THRESHOLD
+hls = export_hls(rf_clf, list(X.columns), '..', scales=scales, threshold=BEST_THRESHOLD)
+print(f"Xuat {hls['header']} / {hls['source']} thanh cong ({hls['input_type']}, VOTE_REQUIRED {hls['vote_required']})")
+
+# bang ma hoa theo nguong split (so bit toi thieu moi feature), kiem tra tren toan bo du lieu
+encoder = RankEncoder.from_forest(rf_clf, list(X.columns))
+print(encoder.summary().to_string(index=False))
+n_diff = check_equivalence(rf_clf, encoder, X)
+if n_diff:
+    raise AssertionError(f"{n_diff} mau co xac suat khac sau khi ma hoa theo nguong")
+encoder.save('rank_encoder_tables.csv')
+print('Xuat bang nguong thanh cong (du doan giong het tren', len(X), 'mau)')
\ No newline at end of file
@@ -1,62 +1,73 @@
+import argparse
+import os
+import sys
 import pandas as pd
-import numpy as np
 
-# 🔹 Đường dẫn file
-input_path = "elephant_6features_cleaned.csv"
-output_quantized_path1 = "Quantized_Combined_Features.csv"
-output_quantized_path2 = "C:\\Users\\nguye\\Documents\\TKVM\\training\\model\\Quantized_Combined_Features.csv"
-output_scale_table_path = "Quantization_Scales.csv"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+from columnar import read_table, write_table, iter_table
+from quantizer import Quantizer, SUPPORTED_BITS, quantize_stream, clip_report
 
-# 🔹 Đọc dữ liệu
-df = pd.read_csv(input_path)
-
-print("📊 Kiểu dữ liệu các cột:")
-print(df.dtypes)
+parser = argparse.ArgumentParser(description='Lượng tử hóa min-max các feature đã chọn')
+parser.add_argument('--bits', type=int, choices=SUPPORTED_BITS, default=32,
+                    help='Số bit mỗi giá trị (rf_inference.h dùng ap_int<16>: --bits 16 --signed)')
+parser.add_argument('--signed', action='store_true', help='Xuất số có dấu (dịch -2**(bits-1))')
+parser.add_argument('--csv', action='store_true', help='Xuất thêm bản CSV bên cạnh bảng cột nhị phân')
+parser.add_argument('--scales', default=None,
+                    help='Chỉ transform bằng bảng scale đã lưu (không fit lại min / max; bỏ qua --bits / --signed)')
+parser.add_argument('--input', default=None, help='Bảng feature đầu vào (.cols / .csv)')
+parser.add_argument('--output', default=None, help='Bảng lượng tử đầu ra')
+parser.add_argument('--batch-size', type=int, default=10_000, help='Số dòng mỗi batch khi chỉ transform')
+args = parser.parse_args()
+EXPORT_CSV = args.csv
 
-# 🔹 Tách label ra riêng (không quantize)
+# 🔹 Đường dẫn file (đọc thẳng từ thư mục của bước trước, không cần copy)
+input_path = args.input or os.path.join("..", "data", "elephant_6features_cleaned")
+output_quantized_path = args.output or ("Quantized_Inference_Features" if args.scales else "Quantized_Combined_Features")
+output_scale_table_path = "quantization_scales.csv"
 label_col = "is_outside"
-labels = df[label_col]
-features_df = df.drop(columns=[label_col])
 
-quantized_data = pd.DataFrame()
-scale_table = []
+# 🔹 Chế độ inference: dùng lại scale của lúc train, dữ liệu mới ngoài khoảng bị cắt và đếm
+if args.scales:
+    quantizer = Quantizer.load(args.scales)
+    print(f"📏 Scale từ {args.scales} ({quantizer.bits} bit, {'có' if quantizer.signed else 'không'} dấu)")
+    clipped, stats = {}, {}
+    batches = list(quantize_stream(quantizer, iter_table(input_path, args.batch_size), clipped, stats))
+    quantized_data = pd.concat(batches, ignore_index=True)
 
-# 🔹 Hàm lượng tử hóa sang uint32
-def quantize_column_to_uint32(series):
-    series = series.replace([np.inf, -np.inf], np.nan)
+    write_table(quantized_data, output_quantized_path, csv=EXPORT_CSV,
+                metadata={"label": label_col if label_col in quantized_data else None,
+                          "bits": quantizer.bits, "signed": quantizer.signed, "scales": args.scales})
 
-    if series.isnull().all():
-        return pd.Series([0]*len(series), dtype='uint32'), 1.0, 0.0, 0.0
+    print("\n📊 Giá trị bị cắt / thiếu theo feature:")
+    print(clip_report(clipped).to_string(index=False))
+    rate = stats['rows'] / stats['seconds'] if stats.get('seconds') else float('inf')
+    print(f"\n✅ Transform hoàn tất! {stats.get('rows', 0)} dòng, {len(batches)} batch, {rate:,.0f} dòng/s")
+    print("• Data:", output_quantized_path + ".cols" + (" (+ .csv)" if EXPORT_CSV else ""))
+    sys.exit(0)
 
-    min_val = series.min()
-    max_val = series.max()
-
-    scale = (max_val - min_val) / (2**32 - 1) if max_val != min_val else 1.0
-    series_filled = series.fillna(min_val)
+# 🔹 Đọc dữ liệu
+df = read_table(input_path)
 
-    quantized = ((series_filled - min_val) / scale).round().astype('uint32')
-    return quantized, scale, min_val, max_val
+print("📊 Kiểu dữ liệu các cột:")
+print(df.dtypes)
 
-# 🔹 Quantize từng feature
-for col in features_df.columns:
-    q_col, scale, min_val, max_val = quantize_column_to_uint32(features_df[col])
-    quantized_data[col] = q_col
+# 🔹 Tách label ra riêng (không quantize)
+labels = df[label_col]
+features_df = df.drop(columns=[label_col])
 
-    scale_table.append({
-        "feature": col,
-        "scale": scale,
-        "min": min_val,
-        "max": max_val
-    })
+# 🔹 Fit scale trên toàn bộ feature rồi lượng tử hóa cả ma trận một lần
+quantizer = Quantizer(bits=args.bits, signed=args.signed)
+quantized_data = quantizer.fit_transform(features_df)
 
 # 🔹 Gắn label lại
 quantized_data[label_col] = labels
 
 # 🔹 Lưu file
-quantized_data.to_csv(output_quantized_path1, index=False)
-quantized_data.to_csv(output_quantized_path2, index=False)
-pd.DataFrame(scale_table).to_csv(output_scale_table_path, index=False)
+# (giữ nguyên dtype lượng tử trong bảng .cols; bảng scale dùng lại cho inference qua --scales)
+write_table(quantized_data, output_quantized_path, csv=EXPORT_CSV,
+            metadata={"label": label_col, "bits": args.bits, "signed": args.signed})
+quantizer.save(output_scale_table_path)
 
-print("\n✅ Quantization hoàn tất!")
-print("• Data:", output_quantized_path1, output_quantized_path2)
+print(f"\n✅ Quantization hoàn tất! ({args.bits} bit, {'có' if args.signed else 'không'} dấu, dtype {quantizer.dtype})")
+print("• Data:", output_quantized_path + ".cols" + (" (+ .csv)" if EXPORT_CSV else ""))
 print("• Scale table:", output_scale_table_path)
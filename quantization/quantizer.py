@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# 🔹 Lượng tử hóa min-max cho cả ma trận feature
+# fit: min / max / scale của từng cột trên tập train (lưu ra quantization_scales.csv)
+# transform: (x - min) / scale làm tròn, cắt về [0, 2**bits - 1] (dịch -2**(bits-1) nếu signed),
+#            ép về dtype NumPy nhỏ nhất đủ chứa; dùng lại cho dữ liệu mới khi inference.
+# Inference: Quantizer.load(bảng scale) rồi quantize_stream theo từng batch (không fit lại).
+
+SUPPORTED_BITS = (8, 10, 12, 16, 32)
+
+
+def quantized_dtype(bits, signed=False):
+    """dtype NumPy nhỏ nhất chứa được số nguyên `bits` bit"""
+    for width in (8, 16, 32):
+        if bits <= width:
+            return np.dtype(f"{'int' if signed else 'uint'}{width}")
+    raise ValueError(f"❌ Unsupported bit width: {bits}")
+
+
+class Quantizer:
+    """
+    bits: 8 / 10 / 12 / 16 / 32 (rf_inference.h nhận ap_int<16> -> bits=16, signed=True).
+    signed=False: giá trị trong [0, 2**bits - 1]; signed=True: [-2**(bits-1), 2**(bits-1) - 1].
+    """
+
+    def __init__(self, bits=32, signed=False):
+        if bits not in SUPPORTED_BITS:
+            raise ValueError(f"❌ Unsupported bit width: {bits} (chọn trong {SUPPORTED_BITS})")
+        self.bits = bits
+        self.signed = signed
+
+    @property
+    def levels(self):
+        return 2 ** self.bits - 1
+
+    @property
+    def offset(self):
+        return 2 ** (self.bits - 1) if self.signed else 0
+
+    @property
+    def dtype(self):
+        return quantized_dtype(self.bits, self.signed)
+
+    @staticmethod
+    def _matrix(df, features):
+        X = df[features].to_numpy(dtype=np.float64)
+        X[np.isinf(X)] = np.nan
+        return X
+
+    def fit(self, df):
+        """Tính min / max / scale cho mọi cột của df (bỏ qua NaN / vô cực)"""
+        self.features_ = list(df.columns)
+        X = self._matrix(df, self.features_)
+        empty = np.isnan(X).all(axis=0)
+        with np.errstate(invalid='ignore'):
+            min_ = np.where(empty, 0.0, np.nanmin(np.where(empty, 0.0, X), axis=0))
+            max_ = np.where(empty, 0.0, np.nanmax(np.where(empty, 0.0, X), axis=0))
+        self.min_ = min_
+        self.max_ = max_
+        self.scale_ = np.where(max_ != min_, (max_ - min_) / self.levels, 1.0)
+        return self
+
+    def transform(self, df, clipped=None):
+        """
+        Lượng tử hóa cả ma trận một lần; NaN / vô cực -> min, ngoài khoảng fit bị cắt.
+        clipped (dict): cộng dồn số giá trị [dưới min, trên max, NaN / vô cực] của từng feature.
+        """
+        X = self._matrix(df, self.features_)
+        missing = np.isnan(X)
+        X = np.where(missing, self.min_, X)
+        q = np.rint((X - self.min_) / self.scale_)
+        if clipped is not None:
+            counts = np.stack([(q < 0).sum(axis=0), (q > self.levels).sum(axis=0), missing.sum(axis=0)], axis=1)
+            for feature, row in zip(self.features_, counts):
+                clipped[feature] = clipped.get(feature, 0) + row
+        q = np.clip(q, 0, self.levels)
+        q = (q - self.offset).astype(self.dtype)
+        return pd.DataFrame(q, columns=self.features_, index=df.index)
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def inverse_transform(self, q):
+        """Giá trị thực xấp xỉ từ giá trị lượng tử"""
+        Q = np.asarray(q[self.features_] if isinstance(q, pd.DataFrame) else q, dtype=np.float64)
+        return pd.DataFrame((Q + self.offset) * self.scale_ + self.min_, columns=self.features_)
+
+    def scale_table(self):
+        return pd.DataFrame({'feature': self.features_, 'scale': self.scale_, 'min': self.min_,
+                             'max': self.max_, 'bits': self.bits, 'signed': self.signed})
+
+    def save(self, path):
+        """Lưu bảng scale (feature, scale, min, max, bits, signed)"""
+        self.scale_table().to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        """Đọc bảng scale đã lưu (file cũ không có bits / signed -> 32 bit không dấu)"""
+        table = pd.read_csv(path)
+        bits = int(table['bits'].iloc[0]) if 'bits' in table else 32
+        signed = bool(table['signed'].iloc[0]) if 'signed' in table else False
+        quantizer = cls(bits=bits, signed=signed)
+        quantizer.features_ = list(table['feature'])
+        quantizer.min_ = table['min'].to_numpy(dtype=np.float64)
+        quantizer.max_ = table['max'].to_numpy(dtype=np.float64)
+        quantizer.scale_ = table['scale'].to_numpy(dtype=np.float64)
+        return quantizer
+
+
+def quantize_stream(quantizer, batches, clipped=None, stats=None):
+    """
+    Lượng tử hóa từng batch bằng scale đã fit (transform-only), giữ nguyên các cột khác
+    (ví dụ nhãn). stats (dict): cộng dồn 'rows' và 'seconds' (chỉ thời gian transform).
+    """
+    for batch in batches:
+        t0 = time.perf_counter()
+        quantized = quantizer.transform(batch, clipped=clipped)
+        if stats is not None:
+            stats['seconds'] = stats.get('seconds', 0.0) + time.perf_counter() - t0
+            stats['rows'] = stats.get('rows', 0) + len(batch)
+        for col in batch.columns:
+            if col not in quantizer.features_:
+                quantized[col] = batch[col].to_numpy()
+        yield quantized
+
+
+def clip_report(clipped):
+    """Bảng số giá trị bị cắt / thiếu theo feature"""
+    return pd.DataFrame([(feature, *map(int, counts)) for feature, counts in clipped.items()],
+                        columns=['feature', 'below_min', 'above_max', 'nan_or_inf'])